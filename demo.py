@@ -42,8 +42,16 @@ with col4:
         st.session_state["page_url"] = st.text_input(label="Enter a valid web-page url")
         submit_button = st.form_submit_button(label="Submit")
         components.iframe(st.session_state.page_url, height=600, scrolling=True)
+
+
+@st.cache_resource
+def get_pipeline():
+    # built once, reused by every query
+    return CypherWebPipeline()
+
+
 if "match" in query.lower():
-    pipe = CypherWebPipeline()
+    pipe = get_pipeline()
     results = pipe.run(query)
     st.session_state.page_url = results["_start"]["page_url"]
 # print(query)
@@ -67,7 +75,7 @@ with col2:
         element_id = st.text_input(label="Enter element ID")
         submit_button = st.form_submit_button(label="Submit")
     element_id = element_id.replace('"', "").strip()
-    graph = pipe.graph._graph
+    graph = results["graph_process_pipe"]["graph"]._graph
     try:
         str_agg = render_element_from_root(graph, element_id, depth=0, str_agg=str_agg)
         print("to be written", str_agg)
@@ -1,4 +1,5 @@
 from cypherweb.core.graph import Graph  # noqa
+from cypherweb.core.tree import TreeGraph  # noqa
 
 from cypherweb.core.node import Node  # noqa
 from cypherweb.core.pipeline import GraphProcessPipeline, NodeSearchPipeline  # noqa
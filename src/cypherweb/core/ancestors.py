@@ -0,0 +1,168 @@
+class AncestorIndex:
+    """Constant time lowest common ancestor, ancestor and depth queries on a forest.
+
+    Built in O(n log n) from an Euler tour of the graph: the lowest common
+    ancestor of two nodes is the shallowest node visited between their first
+    visits, found with a sparse table of range minimums.
+
+    The index also lays the nodes out in pre-order (children in successor
+    order): the subtree of a node is the slice from its entry number to its
+    exit number, which answers ancestor tests and subtree extraction.
+
+    Only defined on forests (no node with several parents), see ``build``.
+
+    Attributes
+    ----------
+    nodes: list
+        Node IDs, by position.
+    positions: dict
+        Position of each node ID.
+    depths: list
+        Depth of each node, roots at 0.
+
+    """
+
+    def __init__(self, nodes, positions, parents, children) -> None:
+        self.nodes = nodes
+        self.positions = positions
+        size = len(nodes)
+        self.depths = [0] * size
+        self._roots = [0] * size
+        self._entry = [0] * size
+        self._exit = [0] * size
+        self._first = [0] * size
+        # positions in pre-order
+        self._preorder = []
+        # (depth * size + position) of each step of the tour, so that the
+        # smallest key of a range is its shallowest node
+        tour = []
+        counter = 0
+        for root in range(size):
+            if parents[root] != -1:
+                continue
+            stack = [(root, iter(children[root]))]
+            self._roots[root] = root
+            self._entry[root] = counter
+            self._preorder.append(root)
+            counter += 1
+            self._first[root] = len(tour)
+            tour.append(root)
+            while stack:
+                position, remaining = stack[-1]
+                child = next(remaining, None)
+                if child is None:
+                    stack.pop()
+                    self._exit[position] = counter
+                    if stack:
+                        parent = stack[-1][0]
+                        tour.append(self.depths[parent] * size + parent)
+                    continue
+                self.depths[child] = self.depths[position] + 1
+                self._roots[child] = root
+                self._entry[child] = counter
+                self._preorder.append(child)
+                counter += 1
+                self._first[child] = len(tour)
+                tour.append(self.depths[child] * size + child)
+                stack.append((child, iter(children[child])))
+        self._size = size
+        self._table = [tour]
+        span = 1
+        while 2 * span <= len(tour):
+            previous = self._table[-1]
+            self._table.append(list(map(min, previous, previous[span:])))
+            span *= 2
+
+    @classmethod
+    def build(cls, graph):
+        """
+        Build the index of a graph.
+
+        Args:
+            graph (nx.DiGraph | TreeGraph): The graph, children in successor order.
+
+        Returns:
+            AncestorIndex: The index, None if a node has several parents.
+        """
+        nodes = list(graph.nodes)
+        positions = {node: position for position, node in enumerate(nodes)}
+        parents = [-1] * len(nodes)
+        children = []
+        for position, node in enumerate(nodes):
+            node_children = [positions[child] for child in graph.successors(node)]
+            for child in node_children:
+                if parents[child] != -1:
+                    return None
+                parents[child] = position
+            children.append(node_children)
+        index = cls(nodes, positions, parents, children)
+        if len(index._table[0]) != 2 * len(nodes) - parents.count(-1):
+            # nodes on a cycle are never reached from a root
+            return None
+        return index
+
+    def __contains__(self, node) -> bool:
+        return node in self.positions
+
+    def depth(self, node) -> int:
+        return self.depths[self.positions[node]]
+
+    def is_ancestor(self, ancestor, node) -> bool:
+        """Whether ``ancestor`` is ``node`` or one of its ancestors."""
+        ancestor, node = self.positions[ancestor], self.positions[node]
+        return self._entry[ancestor] <= self._entry[node] < self._exit[ancestor]
+
+    def subtree_range(self, node):
+        """Get the (start, end) slice of the subtree of ``node`` in the pre-order layout."""
+        position = self.positions[node]
+        return self._entry[position], self._exit[position]
+
+    def subtree(self, node):
+        """Get ``node`` and its descendants, in pre-order."""
+        start, end = self.subtree_range(node)
+        nodes = self.nodes
+        return [nodes[position] for position in self._preorder[start:end]]
+
+    def remove_nested(self, nodes):
+        """
+        Drop the nodes within the subtree of another one.
+
+        Args:
+            nodes (Iterable): Node IDs.
+
+        Returns:
+            list: The outermost nodes, in their original order.
+        """
+        nodes = list(nodes)
+        ranges = sorted(
+            (self._entry[self.positions[node]], -self._exit[self.positions[node]], n)
+            for n, node in enumerate(nodes)
+        )
+        kept = set()
+        end = -1
+        for start, negative_end, n in ranges:
+            if start < end:
+                # the slice of an outer node holds it
+                continue
+            kept.add(n)
+            end = -negative_end
+        return [node for n, node in enumerate(nodes) if n in kept]
+
+    def lowest_common_ancestor(self, node_ref, node):
+        """Get the lowest common ancestor of two nodes, None if they are in different trees."""
+        left, right = self.positions[node_ref], self.positions[node]
+        if self._roots[left] != self._roots[right]:
+            return None
+        left, right = self._first[left], self._first[right]
+        if left > right:
+            left, right = right, left
+        level = (right - left + 1).bit_length() - 1
+        row = self._table[level]
+        key = min(row[left], row[right - (1 << level) + 1])
+        return self.nodes[key % self._size]
+
+    def distance(self, node_down, node_up) -> int:
+        """Number of edges from ``node_down`` up to its ancestor ``node_up``."""
+        if not self.is_ancestor(node_up, node_down):
+            raise ValueError(f"{node_up} is not an ancestor of {node_down}")
+        return self.depth(node_down) - self.depth(node_up)
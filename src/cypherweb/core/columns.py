@@ -0,0 +1,489 @@
+from array import array
+from collections.abc import MutableMapping
+
+# node attributes set by ``HtmlToGraph``, in the order they are set
+COLUMNS = (
+    "element_type",
+    "all_element_types",
+    "element_name",
+    "item_index",
+    "class",
+    "payload",
+    "is_root",
+    "type",
+    "subtree_hash",
+)
+PAYLOAD_KEYS = ("href", "text", "alt", "src")
+# interned values: element types, lists of element types and classes
+INTERNED_COLUMNS = ("element_type", "all_element_types", "class")
+COLUMN_BITS = {key: 1 << i for i, key in enumerate(COLUMNS)}
+MAX_TYPES = 64
+# the columns of (start, end) offsets in the text arena
+SPAN_COLUMNS = ("_name_spans", "_hash_spans", "_payload_spans")
+# texts released before the arena is compacted, see ``AttributeColumns.compact``
+MIN_RELEASED = 2**16
+
+
+class InternTable:
+    """Codes of hashable values, each value is stored once."""
+
+    def __init__(self) -> None:
+        self.values = []
+        self._codes = {}
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def code(self, value) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def get_code(self, value) -> int:
+        """Get the code of ``value``, -1 if it was never interned."""
+        return self._codes.get(value, -1)
+
+
+class TextArena:
+    """Strings stored end to end in one buffer, referenced by (start, end) offsets.
+
+    Strings are only appended: the ones replaced stay in the buffer until
+    it is compacted (see ``AttributeColumns.compact``).
+
+    """
+
+    def __init__(self) -> None:
+        self._buffer = ""
+        self._pending = []
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, text: str):
+        """Append ``text``, return its (start, end) offsets."""
+        start = self._size
+        self._pending.append(text)
+        self._size += len(text)
+        return start, self._size
+
+    def flush(self) -> None:
+        """Append the texts added since the last read to the buffer."""
+        if self._pending:
+            self._buffer += "".join(self._pending)
+            self._pending = []
+
+    def get(self, start: int, end: int) -> str:
+        if end > len(self._buffer):
+            self.flush()
+        return self._buffer[start:end]
+
+    @property
+    def buffer(self) -> str:
+        """The whole buffer."""
+        self.flush()
+        return self._buffer
+
+
+def is_str_list(value) -> bool:
+    return type(value) is list and all(type(item) is str for item in value)
+
+
+class AttributeColumns:
+    """Column store of the node attributes of a ``TreeGraph``.
+
+    Element types and classes are interned codes, ``is_root`` is a packed
+    bit set, ``type`` a bit mask over the type names, and element names,
+    subtree hashes and payload fields are (start, end) offsets in one text
+    arena. Values the columns cannot hold as is (eg. a payload with other
+    keys, a type listed twice) and other attributes are kept per node in
+    ``extra``.
+
+    Reading an attribute decodes a fresh value: lists and payloads have to
+    be set again to be changed, like the classifiers do. Setting a text
+    again keeps its span when it did not change, a new text is appended to
+    the arena: the arena is compacted once the texts replaced make up half
+    of it, and when the columns are frozen.
+
+    Attributes
+    ----------
+    interned: InternTable
+        Element types, lists of element types and classes.
+    type_names: InternTable
+        Type names, the code of a name is its bit in the ``type`` masks.
+    arena: TextArena
+        Element names, subtree hashes and payload fields.
+    extra: dict
+        By node number, the attributes stored as is.
+
+    """
+
+    def __init__(self) -> None:
+        self.interned = InternTable()
+        self.type_names = InternTable()
+        self.arena = TextArena()
+        self.extra = {}
+        # bit i set when the attribute COLUMNS[i] is held by the columns
+        self._present = array("H")
+        self._codes = {key: array("l") for key in INTERNED_COLUMNS}
+        self._item_index = array("q")
+        # (start, end) of the element name and of the subtree hash
+        self._name_spans = array("q")
+        self._hash_spans = array("q")
+        # (start, end) per payload key, -1 for None, -2 for a None payload
+        self._payload_spans = array("q")
+        self._is_root = bytearray()
+        self._type_masks = array("Q")
+        self._size = 0
+        # size of the texts of the arena no node refers to anymore
+        self._released = 0
+        self._encoders = {key: getattr(self, f"_set_{key}") for key in COLUMNS}
+        self.frozen = False
+
+    def __len__(self) -> int:
+        return self._size
+
+    def freeze(self) -> None:
+        """Make the columns read only, see ``Graph.freeze``."""
+        if self._released:
+            self.compact()
+        # texts are joined on the first read, not by concurrent readers
+        self.arena.flush()
+        self.frozen = True
+
+    def _check_not_frozen(self) -> None:
+        if self.frozen:
+            raise TypeError("frozen graph can't be modified")
+
+    def add_node(self) -> int:
+        self._check_not_frozen()
+        index = self._size
+        self._size += 1
+        self._present.append(0)
+        for codes in self._codes.values():
+            codes.append(-1)
+        self._item_index.append(0)
+        self._name_spans.extend((-1, -1))
+        self._hash_spans.extend((-1, -1))
+        self._payload_spans.extend((-2, -2) * len(PAYLOAD_KEYS))
+        if index % 8 == 0:
+            self._is_root.append(0)
+        self._type_masks.append(0)
+        return index
+
+    def _set_text(self, spans, offset, text, empty=-1) -> None:
+        # store a text at spans[offset], keeping the span of an unchanged one
+        start, end = spans[offset], spans[offset + 1]
+        if text is None:
+            new_span = (empty, empty)
+        elif start >= 0 and end - start == len(text) and self.arena.get(start, end) == text:
+            return
+        else:
+            new_span = self.arena.add(text)
+        if start >= 0:
+            self._released += end - start
+        spans[offset], spans[offset + 1] = new_span
+
+    def _release_texts(self, index, key) -> None:
+        # the texts of an attribute removed from the columns
+        if key == "element_name":
+            self._set_text(self._name_spans, 2 * index, None)
+        elif key == "subtree_hash":
+            self._set_text(self._hash_spans, 2 * index, None)
+        elif key == "payload":
+            start = 2 * len(PAYLOAD_KEYS) * index
+            for offset in range(start, start + 2 * len(PAYLOAD_KEYS), 2):
+                self._set_text(self._payload_spans, offset, None, -2)
+
+    def copy_texts(self, arena: TextArena) -> dict:
+        """
+        Copy the texts the nodes refer to into another arena.
+
+        Args:
+            arena (TextArena): The arena, eg. an empty one.
+
+        Returns:
+            dict: The spans of the texts in ``arena``, by span column (see ``SPAN_COLUMNS``).
+        """
+        spans = {}
+        for name in SPAN_COLUMNS:
+            old_spans = getattr(self, name)
+            new_spans = array("q", old_spans)
+            for i in range(0, len(old_spans), 2):
+                if old_spans[i] >= 0:
+                    new_spans[i], new_spans[i + 1] = arena.add(
+                        self.arena.get(old_spans[i], old_spans[i + 1])
+                    )
+            spans[name] = new_spans
+        return spans
+
+    def compact(self) -> None:
+        """Drop the texts no node refers to anymore from the arena."""
+        self._check_not_frozen()
+        arena = type(self.arena)()
+        for name, spans in self.copy_texts(arena).items():
+            setattr(self, name, spans)
+        self.arena = arena
+        self._released = 0
+
+    # encoders: store a value in its column, False if the column cannot hold it
+
+    def _set_element_type(self, index, value) -> bool:
+        if type(value) is not str:
+            return False
+        self._codes["element_type"][index] = self.interned.code(value)
+        return True
+
+    def _set_all_element_types(self, index, value) -> bool:
+        if not is_str_list(value):
+            return False
+        self._codes["all_element_types"][index] = self.interned.code(tuple(value))
+        return True
+
+    def _set_class(self, index, value) -> bool:
+        if type(value) is str:
+            # roots store their class joined
+            self._codes["class"][index] = self.interned.code(value)
+        elif is_str_list(value):
+            self._codes["class"][index] = self.interned.code(tuple(value))
+        else:
+            return False
+        return True
+
+    def _set_element_name(self, index, value) -> bool:
+        if type(value) is not str:
+            return False
+        self._set_text(self._name_spans, 2 * index, value)
+        return True
+
+    def _set_subtree_hash(self, index, value) -> bool:
+        if type(value) is not str:
+            return False
+        self._set_text(self._hash_spans, 2 * index, value)
+        return True
+
+    def _set_item_index(self, index, value) -> bool:
+        if type(value) is not int:
+            return False
+        self._item_index[index] = value
+        return True
+
+    def _set_payload(self, index, value) -> bool:
+        spans = self._payload_spans
+        start = 2 * len(PAYLOAD_KEYS) * index
+        if value is None:
+            self._release_texts(index, "payload")
+            return True
+        if type(value) is not dict or tuple(value) != PAYLOAD_KEYS:
+            return False
+        fields = list(value.values())
+        if not all(field is None or type(field) is str for field in fields):
+            return False
+        for field in fields:
+            self._set_text(spans, start, field)
+            start += 2
+        return True
+
+    def _set_is_root(self, index, value) -> bool:
+        if type(value) is not bool:
+            return False
+        if value:
+            self._is_root[index >> 3] |= 1 << (index & 7)
+        else:
+            self._is_root[index >> 3] &= ~(1 << (index & 7)) & 0xFF
+        return True
+
+    def _set_type(self, index, value) -> bool:
+        if not is_str_list(value):
+            return False
+        mask = 0
+        previous = MAX_TYPES
+        for name in value:
+            code = self.type_names.code(name)
+            # names are read back from the last registered one, the order
+            # classifiers prepend them in
+            if code >= previous:
+                return False
+            mask |= 1 << code
+            previous = code
+        self._type_masks[index] = mask
+        return True
+
+    def _decode(self, index, key):
+        if key in INTERNED_COLUMNS:
+            value = self.interned.values[self._codes[key][index]]
+            return list(value) if type(value) is tuple else value
+        if key == "element_name":
+            return self.arena.get(self._name_spans[2 * index], self._name_spans[2 * index + 1])
+        if key == "item_index":
+            return self._item_index[index]
+        if key == "subtree_hash":
+            return self.arena.get(self._hash_spans[2 * index], self._hash_spans[2 * index + 1])
+        if key == "payload":
+            start = 2 * len(PAYLOAD_KEYS) * index
+            spans = self._payload_spans[start : start + 2 * len(PAYLOAD_KEYS)]
+            if spans[0] == -2:
+                return None
+            return {
+                field: None if spans[2 * i] == -1 else self.arena.get(spans[2 * i], spans[2 * i + 1])
+                for i, field in enumerate(PAYLOAD_KEYS)
+            }
+        if key == "is_root":
+            return bool(self._is_root[index >> 3] >> (index & 7) & 1)
+        # type
+        mask = self._type_masks[index]
+        names = self.type_names.values
+        return [names[code] for code in range(mask.bit_length() - 1, -1, -1) if mask >> code & 1]
+
+    def set(self, index: int, key, value) -> None:
+        self._check_not_frozen()
+        encoder = self._encoders.get(key)
+        if encoder is not None and encoder(index, value):
+            self._present[index] |= COLUMN_BITS[key]
+            if index in self.extra:
+                self.extra[index].pop(key, None)
+            if self._released >= MIN_RELEASED and 2 * self._released > len(self.arena):
+                self.compact()
+            return
+        if key in COLUMN_BITS:
+            self._release_texts(index, key)
+            self._present[index] &= ~COLUMN_BITS[key] & 0xFFFF
+        self.extra.setdefault(index, {})[key] = value
+
+    def get(self, index: int, key):
+        bit = COLUMN_BITS.get(key)
+        if bit is not None and self._present[index] & bit:
+            return self._decode(index, key)
+        return self.extra.get(index, {})[key]
+
+    def delete(self, index: int, key) -> None:
+        self._check_not_frozen()
+        bit = COLUMN_BITS.get(key)
+        if bit is not None and self._present[index] & bit:
+            self._release_texts(index, key)
+            self._present[index] &= ~bit & 0xFFFF
+            return
+        del self.extra.get(index, {})[key]
+
+    def keys(self, index: int):
+        present = self._present[index]
+        keys = [key for i, key in enumerate(COLUMNS) if present >> i & 1]
+        keys.extend(self.extra.get(index, ()))
+        return keys
+
+    def clear(self, index: int) -> None:
+        """Drop the attributes of a removed node."""
+        self._check_not_frozen()
+        for key in ("element_name", "subtree_hash", "payload"):
+            self._release_texts(index, key)
+        self._present[index] = 0
+        self.extra.pop(index, None)
+
+    def get_column(self, key, indices):
+        """
+        Get the values of an attribute for many nodes at once.
+
+        Args:
+            key (str): The attribute.
+            indices (Iterable[int]): The node numbers.
+
+        Returns:
+            list: The values, None for the nodes without the attribute.
+        """
+        bit = COLUMN_BITS.get(key, 0)
+        present = self._present
+        extra = self.extra
+        if key in INTERNED_COLUMNS:
+            codes = self._codes[key]
+            values = [
+                list(value) if type(value) is tuple else value for value in self.interned.values
+            ]
+            return [
+                values[codes[index]] if present[index] & bit else extra.get(index, {}).get(key)
+                for index in indices
+            ]
+        return [
+            self._decode(index, key) if present[index] & bit else extra.get(index, {}).get(key)
+            for index in indices
+        ]
+
+    def get_presence(self, key, indices) -> bytearray:
+        """
+        Get whether many nodes have a value (not None) for an attribute, without decoding it.
+
+        Args:
+            key (str): The attribute.
+            indices (Iterable[int]): The node numbers.
+
+        Returns:
+            bytearray: 1 for the nodes with a value.
+        """
+        bit = COLUMN_BITS.get(key, 0)
+        present = self._present
+        extra = self.extra
+        if key == "payload":
+            spans = self._payload_spans
+            stride = 2 * len(PAYLOAD_KEYS)
+            return bytearray(
+                spans[stride * index] != -2
+                if present[index] & bit
+                else extra.get(index, {}).get(key) is not None
+                for index in indices
+            )
+        return bytearray(
+            self._decode(index, key) is not None
+            if present[index] & bit
+            else extra.get(index, {}).get(key) is not None
+            for index in indices
+        )
+
+    def get_codes(self, key):
+        """
+        Get a whole column as codes, for batch processing.
+
+        Args:
+            key (str): An interned column, or "type".
+
+        Returns:
+            tuple: The codes by node number (-1 when not set) and the values
+            of the codes. For "type", the bit masks and the type names.
+        """
+        if key == "type":
+            return self._type_masks, self.type_names.values
+        return self._codes[key], self.interned.values
+
+
+class NodeAttributes(MutableMapping):
+    """Attribute dict look-alike of a node of an ``AttributeColumns``."""
+
+    __slots__ = ("_columns", "_index")
+
+    def __init__(self, columns: AttributeColumns, index: int) -> None:
+        self._columns = columns
+        self._index = index
+
+    def __getitem__(self, key):
+        try:
+            return self._columns.get(self._index, key)
+        except KeyError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value) -> None:
+        self._columns.set(self._index, key, value)
+
+    def __delitem__(self, key) -> None:
+        try:
+            self._columns.delete(self._index, key)
+        except KeyError:
+            raise KeyError(key) from None
+
+    def __iter__(self):
+        return iter(self._columns.keys(self._index))
+
+    def __len__(self) -> int:
+        return len(self._columns.keys(self._index))
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
@@ -1,6 +1,23 @@
 import networkx as nx
 from typing import Union
 
+from cypherweb.core.ancestors import AncestorIndex
+from cypherweb.core.indexes import INDEXED_KEYS, KEY_ALIASES, SOURCE_KEYS, NodeIndex
+from cypherweb.core.shared import attach_snapshot, publish_snapshot
+from cypherweb.core.snapshot import read_snapshot, write_snapshot
+from cypherweb.core.texts import TextColumn
+from cypherweb.core.tree import (
+    TreeGraph,
+    tree_get_neighbors,
+    tree_get_predecessors,
+    tree_get_shortest_path,
+    tree_all_pairs_lowest_common_ancestor,
+    tree_lowest_common_ancestor,
+    tree_set_node_attributes,
+    tree_get_column,
+    tree_get_presence,
+)
+
 
 def nx_get_neighbors(graph, node):
     return [{"id": node_id} for node_id in graph.neighbors(node)]
@@ -26,6 +43,14 @@ def nx_lowest_common_ancestor(graph, node_ref, node):
     return nx.lowest_common_ancestor(graph, node_ref, node)
 
 
+def nx_get_column(graph, key):
+    return [attributes.get(key) for _, attributes in graph.nodes(data=True)]
+
+
+def nx_get_presence(graph, key):
+    return bytearray(attributes.get(key) is not None for _, attributes in graph.nodes(data=True))
+
+
 BACKEND_MAP = {
     "networkx": {
         "get_neighbors": nx_get_neighbors,
@@ -34,7 +59,19 @@ BACKEND_MAP = {
         "all_pairs_lowest_common_ancestor": nx_all_pairs_lowest_common_ancestor,
         "lowest_common_ancestor": nx_lowest_common_ancestor,
         "set_node_attributes": nx_set_node_attributes,
-    }
+        "get_column": nx_get_column,
+        "get_presence": nx_get_presence,
+    },
+    "tree": {
+        "get_neighbors": tree_get_neighbors,
+        "get_predecessors": tree_get_predecessors,
+        "get_shortest_path": tree_get_shortest_path,
+        "all_pairs_lowest_common_ancestor": tree_all_pairs_lowest_common_ancestor,
+        "lowest_common_ancestor": tree_lowest_common_ancestor,
+        "set_node_attributes": tree_set_node_attributes,
+        "get_column": tree_get_column,
+        "get_presence": tree_get_presence,
+    },
 }
 
 
@@ -42,18 +79,299 @@ class Graph:
     """Graph data structure.
     it is abstracted here so whenever we want to migrate from networkx it is easy
 
+    Backends: "networkx" (a ``nx.DiGraph``) or "tree" (a ``TreeGraph``, array
+    backed with integer node IDs and columnar node attributes, for the DOM
+    graphs built by ``HtmlToGraph``).
+
     """
 
     def __init__(self, page_url: str, backend="networkx") -> None:
         self.page_url = page_url
         self.html_payload = None
+        # the page parsed while it downloaded (see ``StreamingCrawler``), in place
+        # of ``html_payload``: ``HtmlToGraph`` builds the graph from these records
+        self.dom_records = None
+        # sha256 of the fetched body, lets later stages reuse work done on the same content
+        self.content_hash = None
+        # what the pipeline nodes did to the page, by node (eg. pruned boilerplate)
+        self.reports = {}
+        # set on a rebuild (see ``GraphProcessPipeline.rebuild``): the graph of the
+        # previous crawl, then the nodes the classifiers have to label again
+        self.previous = None
+        self.changed_nodes = None
+        # node types the classifiers added so far, and the classifier computing
+        # the others on demand (see ``ensure_labels``)
+        self.labels = set()
+        self.classifier = None
+        # cached AncestorIndex and the topology it was built for
+        self._ancestor_index = None
+        self._ancestor_index_key = None
+        # cached NodeIndex, kept up to date by ``set_node_attributes``
+        self._node_index = None
+        self._node_index_key = None
+        # cached TextColumn, dropped by ``set_node_attributes`` when payloads change
+        self._text_column = None
+        self._text_column_key = None
+        # how to open the graph again, for the read only graphs of a snapshot:
+        # they are pickled as a reference to it
+        self._reopen = None
+        self._version = 0
+        # read only, see ``freeze``
+        self.frozen = False
         self.backend = backend
         if self.backend == "networkx":
             self._graph = nx.DiGraph()
             # self.nodes = self._graph.nodes
+        elif self.backend == "tree":
+            self._graph = TreeGraph()
         else:
             raise NotImplementedError
 
+    def save(self, path: str) -> None:
+        """
+        Write the graph to a snapshot file, eg. to query it later without crawling and classifying it again.
+
+        Parameters:
+            path (str): The file to write, see ``cypherweb.core.snapshot``.
+
+        Returns:
+            None
+        """
+        self.ensure_labels()
+        write_snapshot(self, path)
+
+    @classmethod
+    def load(cls, path: str, use_mmap: bool = True) -> "Graph":
+        """
+        Open a snapshot written by ``save``.
+
+        Parameters:
+            path (str): The snapshot file.
+            use_mmap (bool): Memory map the file: it opens at once and the
+                parts queries touch are paged in, but the graph is read
+                only. Defaults to True.
+
+        Returns:
+            Graph: The graph, with the tree backend.
+        """
+        graph = cls._from_snapshot(*read_snapshot(path, use_mmap))
+        if use_mmap:
+            graph._reopen = (cls.load, (path,))
+        return graph
+
+    @classmethod
+    def _from_snapshot(cls, metadata, tree) -> "Graph":
+        graph = cls(metadata["page_url"], "tree")
+        graph._graph = tree
+        graph.content_hash = metadata["content_hash"]
+        graph.reports = metadata["reports"]
+        graph.labels = set(metadata.get("labels", ()))
+        return graph
+
+    def publish(self, name: str = None):
+        """
+        Copy the graph into shared memory, for other processes to ``attach`` to it.
+
+        Parameters:
+            name (str, optional): The name of the segment. Defaults to a random one.
+
+        Returns:
+            SharedMemory: The segment, its ``name`` is the one to attach to.
+            ``close`` and ``unlink`` it once the graph is not served anymore.
+        """
+        self.ensure_labels()
+        return publish_snapshot(self, name)
+
+    @classmethod
+    def attach(cls, name: str) -> "Graph":
+        """
+        Open a graph published to shared memory, without copying it.
+
+        The graph is read only. Pickling it (eg. to hand it to a pool
+        worker) only pickles the name of its segment.
+
+        Parameters:
+            name (str): The name of the segment, see ``publish``.
+
+        Returns:
+            Graph: The graph, with the tree backend.
+        """
+        graph = cls._from_snapshot(*attach_snapshot(name))
+        graph._reopen = (cls.attach, (name,))
+        return graph
+
+    def __reduce_ex__(self, protocol):
+        if self._reopen is not None:
+            return self._reopen
+        return super().__reduce_ex__(protocol)
+
+    def freeze(self) -> "Graph":
+        """
+        Make the graph read only, eg. once classified, for threads to query it concurrently.
+
+        The labels and the indexes computed on first use are computed at
+        once (see ``ensure_labels``), then the graph
+        methods modifying it, like ``set_node_attributes``, raise a
+        TypeError. So does modifying the tree backend directly; the
+        networkx backend is frozen with ``nx.freeze``, which leaves its
+        attribute dicts writable.
+
+        Returns:
+            Graph: The graph itself.
+        """
+        if self.frozen:
+            return self
+        self.ensure_labels()
+        self.get_ancestor_index()
+        self.get_node_index()
+        self.get_text_column()
+        if self.backend == "networkx":
+            nx.freeze(self._graph)
+        else:
+            self._graph.freeze()
+        self.frozen = True
+        return self
+
+    def _check_not_frozen(self) -> None:
+        if self.frozen:
+            raise TypeError("frozen graph can't be modified")
+
+    def ensure_labels(self, labels=None) -> None:
+        """
+        Classify the graph for the node types a query needs, if not done yet.
+
+        Graphs processed by a lazy classifier (see ``FusedClassifier``) are
+        classified on demand: the first lookup of a type runs the
+        classifiers producing it, later ones find it on the nodes.
+        ``get_nodes_by_type`` calls it, pipelines call it with all the
+        types of a query to classify them in one pass.
+
+        Parameters:
+            labels (Iterable, optional): The node types, eg. ``["grid", "title"]``.
+                Defaults to all the ones the classifier produces.
+
+        Returns:
+            None
+        """
+        if self.classifier is None:
+            return
+        if labels is not None and self.labels.issuperset(labels):
+            return
+        self.classifier.classify(self, labels)
+
+    def invalidate(self) -> None:
+        """Drop the cached indexes, to call after adding or removing nodes or edges of ``_graph``."""
+        self._check_not_frozen()
+        self._version += 1
+
+    def _get_topology_key(self):
+        return (self._version, len(self._graph), getattr(self._graph, "version", None))
+
+    def get_ancestor_index(self):
+        """
+        Get the ancestor index of the graph, built on first use and cached until the graph changes.
+
+        Returns:
+            AncestorIndex: The index, None if the graph is not a forest.
+        """
+        key = self._get_topology_key()
+        if self._ancestor_index_key != key:
+            self._ancestor_index = AncestorIndex.build(self._graph)
+            self._ancestor_index_key = key
+        return self._ancestor_index
+
+    def get_node_index(self):
+        """
+        Get the inverted indexes of the node types, element types, classes and link hosts.
+
+        Built on first use, then kept up to date by ``set_node_attributes``
+        until nodes are added or removed. Attributes changed directly on
+        ``_graph`` are not seen: call ``invalidate`` after such changes.
+
+        Returns:
+            NodeIndex: The index.
+        """
+        key = self._get_topology_key()
+        if self._node_index_key != key:
+            self._node_index = NodeIndex.build(self)
+            self._node_index_key = key
+        return self._node_index
+
+    def get_text_column(self):
+        """
+        Get the texts of the payloads of the graph, to match strings in one scan (see ``BaseStrRetriever``).
+
+        Built on first use, cached until nodes are added or removed or
+        ``set_node_attributes`` sets payloads. Payloads changed directly on
+        ``_graph`` are not seen: call ``invalidate`` after such changes.
+
+        Returns:
+            TextColumn: The column.
+        """
+        key = self._get_topology_key()
+        if self._text_column_key != key:
+            self._text_column = TextColumn.build(self)
+            self._text_column_key = key
+        return self._text_column
+
+    def get_distance(self, node_down, node_up) -> int:
+        """
+        Get the number of edges from a node up to one of its ancestors.
+
+        Parameters:
+            node_down (any): The node.
+            node_up (any): The ancestor.
+
+        Returns:
+            int: The distance, 0 if both nodes are the same.
+        """
+        index = self.get_ancestor_index()
+        if index is not None:
+            return index.distance(node_down, node_up)
+        distance = 0
+        while node_down != node_up:
+            node_down = self.get_predecessors(node_down)[0]["id"]
+            distance += 1
+        return distance
+
+    def get_subtree(self, node):
+        """
+        Get a node and all its descendants.
+
+        Parameters:
+            node (any): The root of the subtree.
+
+        Returns:
+            list: The node IDs in pre-order, ``node`` first.
+        """
+        index = self.get_ancestor_index()
+        if index is not None:
+            return index.subtree(node)
+        return list(nx.dfs_preorder_nodes(self._graph, node))
+
+    def remove_nested(self, nodes):
+        """
+        Drop the nodes that are in the subtree of another one of ``nodes``.
+
+        Parameters:
+            nodes (list): Node IDs.
+
+        Returns:
+            list: The outermost nodes, in their original order.
+        """
+        index = self.get_ancestor_index()
+        if index is not None:
+            return index.remove_nested(nodes)
+        nodes = list(nodes)
+        return [
+            node
+            for node in nodes
+            if not any(
+                other != node and self.parent_has_child(child_cand=node, parent=other)
+                for other in nodes
+            )
+        ]
+
     def get_neighbors(self, node):
         """
         Get the neighbors of a given node.
@@ -103,6 +421,15 @@ class Graph:
         :return: A list of lowest common ancestors corresponding to each pair of nodes.
         :rtype: list
         """
+        index = self.get_ancestor_index()
+        if index is not None:
+            return (
+                ((node_ref, node), ancestor)
+                for (node_ref, node), ancestor in (
+                    (pair, index.lowest_common_ancestor(*pair)) for pair in dict.fromkeys(pairs)
+                )
+                if ancestor is not None
+            )
         return BACKEND_MAP[self.backend]["all_pairs_lowest_common_ancestor"](
             self._graph, pairs
         )
@@ -118,6 +445,9 @@ class Graph:
         Returns:
             The lowest common ancestor of the two nodes.
         """
+        index = self.get_ancestor_index()
+        if index is not None:
+            return index.lowest_common_ancestor(node_ref, node)
         return BACKEND_MAP[self.backend]["lowest_common_ancestor"](
             self._graph, node_ref, node
         )
@@ -132,7 +462,40 @@ class Graph:
         Returns:
             None
         """
+        self._check_not_frozen()
         BACKEND_MAP[self.backend]["set_node_attributes"](self._graph, attrs)
+        if self._text_column_key is not None and any("payload" in node_attrs for node_attrs in attrs.values()):
+            self._text_column_key = None
+        if self._node_index is not None and self._node_index_key == self._get_topology_key():
+            sources = set(SOURCE_KEYS.values())
+            for node, node_attrs in attrs.items():
+                if node in self._graph and not sources.isdisjoint(node_attrs):
+                    self._node_index.update(node, self._graph.nodes[node])
+
+    def get_column(self, key):
+        """
+        Get the values of a node attribute for all the nodes at once.
+
+        Parameters:
+            key (str): The attribute, eg. "element_type".
+
+        Returns:
+            list: The values in node order (same order as ``self._graph.nodes``),
+            None for the nodes without the attribute.
+        """
+        return BACKEND_MAP[self.backend]["get_column"](self._graph, key)
+
+    def get_presence(self, key) -> bytearray:
+        """
+        Get whether each node has a value for an attribute, cheaper than ``get_column`` when the values are not needed.
+
+        Parameters:
+            key (str): The attribute, eg. "payload".
+
+        Returns:
+            bytearray: 1 for the nodes with a value (not None), in node order.
+        """
+        return BACKEND_MAP[self.backend]["get_presence"](self._graph, key)
 
     def parent_has_child(self, child_cand, parent):
         """
@@ -145,14 +508,82 @@ class Graph:
         Returns:
             True if the parent node has the child node, False otherwise.
         """
+        index = self.get_ancestor_index()
+        if index is not None:
+            return index.is_ancestor(parent, child_cand)
         return self.lowest_common_ancestor(parent, child_cand) == parent
 
-    def get_nodes_by_type(self, node_type: Union[str, list]):
+    def get_changed_nodes(self):
+        """
+        Get the nodes to classify: all of them, or only the changed ones on a rebuild.
+
+        Returns:
+            list: The node IDs.
+        """
+        if self.changed_nodes is None:
+            return list(self._graph.nodes)
+        return [node for node in self._graph.nodes if node in self.changed_nodes]
+
+    def get_nodes_by_attributes(self, attributes: dict, nodes=None):
+        """
+        Get the nodes matching property constraints, eg. ``{"class": "card"}``.
+
+        Types, element types (or ``tag``), classes and link hosts (``host``)
+        are looked up in the node index: a node matches a type or a class
+        when it has it (space separated classes must all be there) and a
+        host when its payload links to it. Other keys are compared to the
+        node attribute, or else to the payload field, of that name.
+
+        Args:
+            attributes (dict): The constraints, all of them must hold.
+            nodes (Iterable, optional): Only keep these nodes. Defaults to all.
+
+        Returns:
+            list: The matching node IDs, in graph order.
+        """
+        if "type" in attributes:
+            self.ensure_labels([attributes["type"]])
+        index = self.get_node_index()
+        candidates = None if nodes is None else set(nodes)
+        others = {}
+        for key, value in attributes.items():
+            key = KEY_ALIASES.get(key, key)
+            if key not in INDEXED_KEYS:
+                others[key] = value
+                continue
+            if key == "class" and isinstance(value, str):
+                values = value.split()
+            elif key == "host" and isinstance(value, str):
+                values = [value.lower()[4:] if value.lower().startswith("www.") else value.lower()]
+            else:
+                values = [value]
+            for value in values:
+                matched = index.get(key, value)
+                candidates = set(matched) if candidates is None else candidates & matched
+        if candidates is None:
+            candidates = self._graph.nodes
+
+        def match_others(node):
+            node_attributes = self._graph.nodes[node]
+            payload = node_attributes.get("payload") or {}
+            for key, value in others.items():
+                if key in node_attributes:
+                    if node_attributes[key] != value:
+                        return False
+                elif payload.get(key) != value:
+                    return False
+            return True
+
+        return index.sort(node for node in candidates if match_others(node))
+
+    def get_nodes_by_type(self, node_type: Union[str, list], attributes: dict = None):
         """
         Get nodes from the graph that match the specified node type(s).
 
         Args:
             node_type (Union[str, list]): The type(s) of nodes to retrieve.
+            attributes (dict, optional): Property constraints the nodes must
+                match too, see ``get_nodes_by_attributes``.
 
         Returns:
             list: A list of dictionaries representing the matching nodes. Each dictionary
@@ -160,18 +591,24 @@ class Graph:
         """
         if type(node_type) == str:
             node_type = [node_type]
-
-        def intersection(lst1, lst2):
+        self.ensure_labels(node_type if len(node_type) > 0 else None)
+        index = self.get_node_index()
+        if len(node_type) == 0:
             # when types are not defined return all
-            if len(lst1) == 0:
-                return lst2
-            return list(set(lst1) & set(lst2))
-
-        return [
-            {
-                "id": node,
-                "type": intersection(node_type, self._graph.nodes[node]["type"])[0],
-            }
-            for node in self._graph.nodes
-            if len(intersection(node_type, self._graph.nodes[node]["type"])) > 0
-        ]
+            nodes = set().union(*index.postings["type"].values())
+        else:
+            nodes = set().union(*(index.get("type", t) for t in node_type))
+        if attributes:
+            nodes = self.get_nodes_by_attributes(attributes, nodes)
+        output = []
+        for node in index.sort(nodes):
+            node_types = index.values(node, "type")
+            output.append(
+                {
+                    "id": node,
+                    "type": node_types[0]
+                    if len(node_type) == 0
+                    else next(t for t in node_type if t in node_types),
+                }
+            )
+        return output
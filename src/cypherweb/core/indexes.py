@@ -0,0 +1,150 @@
+from urllib.parse import urljoin, urlsplit
+
+# attributes with an inverted index, "host" is the host of the payload href
+INDEXED_KEYS = ("type", "element_type", "class", "host")
+# node attributes the indexed values are read from
+SOURCE_KEYS = {
+    "type": "type",
+    "element_type": "element_type",
+    "class": "class",
+    "host": "payload",
+}
+KEY_ALIASES = {"tag": "element_type"}
+
+
+def get_host(href, page_url: str = None) -> str:
+    """Get the host of a link, relative links are resolved against ``page_url``; ``www.`` is ignored."""
+    try:
+        host = urlsplit(urljoin(page_url or "", href)).hostname or ""
+    except ValueError:
+        return ""
+    host = host.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def get_indexed_values(key, value, page_url: str = None) -> tuple:
+    """
+    Get the values a node is indexed under, from one of its attributes.
+
+    Args:
+        key (str): One of ``INDEXED_KEYS``.
+        value: The node attribute ``SOURCE_KEYS[key]``.
+        page_url (str): The URL of the page, for relative links.
+
+    Returns:
+        tuple: The values, empty if there is nothing to index.
+    """
+    if value is None:
+        return ()
+    if key == "element_type":
+        return (value,)
+    if key == "class":
+        # roots store their class joined
+        if isinstance(value, str):
+            return tuple(name for name in value.split("_CLASSJOIN_") if name)
+        return tuple(value)
+    if key == "host":
+        href = value.get("href") if isinstance(value, dict) else None
+        host = get_host(href, page_url) if href else ""
+        return (host,) if host else ()
+    # type
+    return tuple(value)
+
+
+class NodeIndex:
+    """Inverted indexes of the node attributes of a graph.
+
+    Maps each value of the ``INDEXED_KEYS`` (a type, an element type, a CSS
+    class, the host of a link) to the nodes that have it, so that looking
+    up nodes does not scan the whole graph. Kept by ``Graph``, see
+    ``Graph.get_node_index``.
+
+    Attributes
+    ----------
+    page_url: str
+        The URL of the page, to resolve relative links.
+    postings: dict
+        By indexed key, the set of nodes of each value.
+    order: dict
+        Position of each node in the graph, the order lookups return nodes in.
+
+    """
+
+    def __init__(self, page_url: str = None) -> None:
+        self.page_url = page_url
+        self.postings = {key: {} for key in INDEXED_KEYS}
+        self.order = {}
+        # indexed values of each node, to unindex it
+        self._values = {}
+        # host of each href seen, links to the same pages are frequent
+        self._hosts = {}
+
+    @classmethod
+    def build(cls, graph) -> "NodeIndex":
+        """
+        Index all the nodes of a graph.
+
+        Args:
+            graph (Graph): The graph, its attributes are read a column at a time.
+
+        Returns:
+            NodeIndex: The index.
+        """
+        index = cls(graph.page_url)
+        nodes = list(graph._graph.nodes)
+        columns = {key: graph.get_column(source) for key, source in SOURCE_KEYS.items()}
+        for position, node in enumerate(nodes):
+            index.order[node] = position
+            index._add(node, {key: column[position] for key, column in columns.items()})
+        return index
+
+    def _add(self, node, sources) -> None:
+        values = {}
+        for key, source in sources.items():
+            if key == "host" and isinstance(source, dict) and source.get("href"):
+                href = source["href"]
+                node_values = self._hosts.get(href)
+                if node_values is None:
+                    node_values = self._hosts[href] = get_indexed_values(key, source, self.page_url)
+            else:
+                node_values = get_indexed_values(key, source, self.page_url)
+            postings = self.postings[key]
+            for value in node_values:
+                postings.setdefault(value, set()).add(node)
+            values[key] = node_values
+        self._values[node] = values
+
+    def _remove(self, node) -> None:
+        for key, node_values in self._values.pop(node, {}).items():
+            postings = self.postings[key]
+            for value in node_values:
+                nodes = postings.get(value)
+                if nodes is not None:
+                    nodes.discard(node)
+                    if not nodes:
+                        del postings[value]
+
+    def update(self, node, attributes) -> None:
+        """
+        Index a node again after its attributes changed.
+
+        Args:
+            node: The node ID.
+            attributes (Mapping): All the attributes of the node.
+        """
+        self._remove(node)
+        if node not in self.order:
+            self.order[node] = len(self.order)
+        self._add(node, {key: attributes.get(source) for key, source in SOURCE_KEYS.items()})
+
+    def get(self, key, value) -> set:
+        """Get the nodes of a value, eg. ``get("class", "card")``; do not modify the set."""
+        return self.postings[KEY_ALIASES.get(key, key)].get(value, set())
+
+    def values(self, node, key) -> tuple:
+        """Get the values a node is indexed under for ``key``."""
+        return self._values.get(node, {}).get(KEY_ALIASES.get(key, key), ())
+
+    def sort(self, nodes) -> list:
+        """Sort nodes in graph order."""
+        return sorted(nodes, key=self.order.__getitem__)
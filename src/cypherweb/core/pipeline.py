@@ -1,10 +1,17 @@
-from typing import Dict, Union
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Tuple, Union
 
 from cypherweb.core.node import Node
 from cypherweb.core.graph import Graph
 from cypherweb.core.url import Url
+from cypherweb.utils.graph_diff import reuse_graph
 import time
 
+# name of the graph building step of a search pipeline, whose output the search nodes read
+GRAPH_PROCESS_PIPE = "graph_process_pipe"
+# name of the node parsing cypher queries into node parameters
+CYPHER_API = "cypher_api"
+
 
 class GraphProcessPipeline:
     """Pipeline class to define the way of enriching documents.
@@ -47,6 +54,30 @@ class GraphProcessPipeline:
         for node in self.dict_nodes.values():
             node(graph)
 
+    def __call__(self, inputs: Union[dict, Graph], params: dict = None):
+        """Run the pipeline as a node: on a graph, or as the graph building step of a search pipeline."""
+        if isinstance(inputs, Graph):
+            self.process(inputs)
+            return None
+        return self.run(inputs, params)
+
+    def run(self, payload: dict, params: dict = None) -> dict:
+        """Build the graph of the page a search is on.
+
+        payload: dict
+            The outputs of the search pipeline so far, the page is
+            ``payload["_start"]["page_url"]`` (the USE clause of a cypher query)
+            and the node types to classify ``payload["_start"]["labels"]``.
+
+        """
+        page_url = payload["_start"]["page_url"]
+        if page_url is None:
+            raise ValueError("no page to search: give a graph or a USE clause")
+        graph = self.build(Url(page_url, 0))
+        # with a lazy classifier, only the types the query matches are classified
+        graph.ensure_labels(payload["_start"].get("labels", ()))
+        return {"page_url": page_url, "graph": graph, "reports": graph.reports}
+
     def build(self, url: Url) -> None:
         """Run the pipeline on graph.
 
@@ -61,6 +92,172 @@ class GraphProcessPipeline:
             node(graph)
         return graph
 
+    def rebuild(self, previous: Graph) -> Graph:
+        """Run the pipeline on a new crawl of the page of a previous graph.
+
+        When the crawler finds the same body as before (``content_hash``),
+        the nodes after it are skipped and the previous graph is copied.
+        Otherwise, with ``HtmlToGraph(stable_ids=True)``, the subtrees
+        unchanged since ``previous`` keep what the enrichers found on them
+        and the classifiers only run on the changed nodes. Both are
+        reported in ``graph.reports["rebuild"]``. Otherwise the page is
+        built from scratch.
+
+        previous: instance of Graph
+            The graph of the previous crawl, left untouched.
+
+        """
+        graph = Graph(previous.page_url, previous.backend)
+        graph.previous = previous
+        try:
+            for node in self.dict_nodes.values():
+                node(graph)
+                if graph.content_hash is not None and graph.content_hash == previous.content_hash:
+                    reuse_graph(previous, graph)
+                    graph.reports["rebuild"] = {"changed_nodes": 0, "reused_nodes": len(graph._graph)}
+                    break
+        finally:
+            graph.previous = None
+            graph.changed_nodes = None
+        return graph
+
+    def build_many(self, urls: List[Url]) -> Iterator[Graph]:
+        """Run the pipeline on several urls.
+
+        When the first node can stream pages (eg. ``AsyncCrawler``) pages are
+        fetched concurrently and each one is handed to the remaining nodes as
+        soon as it arrives, otherwise urls are built one after the other.
+
+        urls: list of Url
+            Pages to build.
+
+        """
+        nodes = list(self.dict_nodes.values())
+        if len(nodes) == 0 or not hasattr(nodes[0], "stream"):
+            for url in urls:
+                yield self.build(url)
+            return
+        for graph in nodes[0].stream([url.page_url for url in urls]):
+            if graph.html_payload is None:
+                # fetch failed, the connector already reported it
+                continue
+            for node in nodes[1:]:
+                node(graph)
+            yield graph
+
+    def crawl(self, url: Url) -> Iterator[Graph]:
+        """Run the pipeline on url and on the pages it links to.
+
+        When ``url.enrich_inner_urls`` is set and the first node can crawl
+        (eg. ``SiteCrawler``), links found by the classifiers are followed up
+        to ``url.depth`` hops, otherwise only url is built.
+
+        url: instance of Url
+            Start page.
+
+        """
+        nodes = list(self.dict_nodes.values())
+        if not url.enrich_inner_urls or len(nodes) == 0 or not hasattr(nodes[0], "crawl"):
+            yield self.build(url)
+            return
+        yield from nodes[0].crawl(url, nodes[1:])
+
+
+@dataclass
+class ExecutionContext:
+    """State of one execution of a search pipeline.
+
+    Attributes
+    ----------
+    graph: Graph
+        The graph searched, built by the pipeline when not given.
+    params: dict
+        The parameters of the nodes, by node name.
+    outputs: dict
+        The output of each node by name, passed to the next nodes.
+        ``outputs["_start"]`` holds the page, the parameters and the node
+        types (labels) of the query.
+
+    """
+
+    graph: Graph = None
+    params: dict = field(default_factory=dict)
+    outputs: dict = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class CompiledSearchPipeline:
+    """Immutable form of a ``NodeSearchPipeline``, see ``NodeSearchPipeline.compile``.
+
+    It keeps nothing between executions, each one has its own
+    ``ExecutionContext``: one instance serves any number of queries, from
+    any number of threads as long as its nodes keep no per query state
+    (the nodes of this package do not) and the graphs shared between
+    threads are frozen (see ``Graph.freeze``).
+
+    Attributes
+    ----------
+    nodes: Tuple[Tuple[str, Node], ...]
+        The nodes and their names, in order.
+    parser: Node
+        The node parsing cypher queries, if any.
+
+    """
+
+    nodes: Tuple[Tuple[str, Node], ...]
+    parser: Node = None
+
+    def execute(self, graph: Graph, query: Union[dict, str]) -> ExecutionContext:
+        """Run the pipeline.
+
+        graph: instance of Graph
+            The graph to search, None to build the one of the page the
+            query is on.
+
+        query: str or dict
+            A cypher query, or the parameters of the nodes already parsed
+            (``{"params": ..., "page_url": ..., "labels": ...}``).
+
+        """
+        if type(query) == str:
+            if self.parser is None:
+                raise ValueError(f"cypher queries need a {CYPHER_API} node")
+            query = self.parser(inputs=query, params={})
+        params = query["params"]
+        context = ExecutionContext(graph=graph, params=params)
+        labels = query.get("labels", [])
+        context.outputs["_start"] = {
+            "page_url": query.get("page_url"),
+            "params": params,
+            "labels": labels,
+        }
+        if graph is not None:
+            graph.ensure_labels(labels)
+            context.outputs[GRAPH_PROCESS_PIPE] = {
+                "page_url": graph.page_url,
+                "graph": graph,
+                "reports": graph.reports,
+            }
+        for node_key, node in self.nodes:
+            if node_key in context.outputs:
+                # eg. the graph was given
+                continue
+            # compute time for each node
+            start_time = time.time()
+            output = node(inputs=context.outputs, params=params.get(node_key, {}))
+            end_time = time.time()
+            delta_time = end_time - start_time
+            delta_time = str(round(delta_time * 1000, 2)) + "ms"
+            output["run_time"] = delta_time
+            context.outputs[node_key] = output
+        if context.graph is None and GRAPH_PROCESS_PIPE in context.outputs:
+            context.graph = context.outputs[GRAPH_PROCESS_PIPE]["graph"]
+        return context
+
+    def run(self, graph: Graph, query: Union[dict, str]) -> dict:
+        """Run the pipeline, return the output of each node by name (see ``execute``)."""
+        return self.execute(graph, query).outputs
+
 
 class NodeSearchPipeline:
     """pipeline defines sequential way of enriching/consuming the graph.
@@ -76,7 +273,6 @@ class NodeSearchPipeline:
 
     def __init__(self) -> None:
         self.dict_nodes: Dict[str, Node] = {}
-        self.passing_input = None
 
     def add_node(self, enricher: Node, name: str) -> None:
         """Append ``enricher`` to the pipeline.
@@ -90,37 +286,17 @@ class NodeSearchPipeline:
         """
         self.dict_nodes[name] = {"func": enricher}
 
-    def run(self, graph, query: Union[dict, str]) -> None:
+    def compile(self) -> CompiledSearchPipeline:
+        """Freeze the nodes added so far into a reusable pipeline."""
+        return CompiledSearchPipeline(
+            nodes=tuple(
+                (name, node["func"])
+                for name, node in self.dict_nodes.items()
+                if name != CYPHER_API
+            ),
+            parser=self.dict_nodes[CYPHER_API]["func"] if CYPHER_API in self.dict_nodes else None,
+        )
+
+    def run(self, graph, query: Union[dict, str]) -> dict:
         """Run the pipeline on document"""
-
-        if type(query) == str and "cypher_api" in self.dict_nodes:
-            output = self.dict_nodes["cypher_api"]["func"](
-                inputs=query, params={})
-            # prepare page_url , params
-            # page_url = output["page_url"]
-            params = output["params"]
-            # remove "cypher_api"
-            self.dict_nodes = {
-                k: v for k, v in self.dict_nodes.items() if k != "cypher_api"
-            }
-
-            pass
-        if type(query) == dict:
-            # page_url = query["page_url"]
-            params = query["params"]
-
-        self.graph = graph
-        self.passing_input = {"graph_process_pipe": {
-            "page_url": None, "graph": self.graph}}
-        for node_key, node_val in self.dict_nodes.items():
-            # compute time for each node
-            start_time = time.time()
-            _params = params.get(node_key, {})
-            node = node_val["func"]
-            output = node(inputs=self.passing_input, params=_params)
-            end_time = time.time()
-            delta_time = end_time - start_time
-            delta_time = str(round(delta_time * 1000, 2)) + "ms"
-            output["run_time"] = delta_time
-            self.passing_input[node_key] = output
-        return self.passing_input
+        return self.compile().run(graph, query)
@@ -0,0 +1,64 @@
+"""
+Graphs in shared memory, see ``Graph.publish`` and ``Graph.attach``.
+
+A published graph is a snapshot (see ``cypherweb.core.snapshot``) in a
+``multiprocessing.shared_memory`` segment: the processes attaching to it
+query views of the segment, one copy of the graph serves them all.
+"""
+import os
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+from cypherweb.core.snapshot import decode_snapshot, encode_snapshot
+
+# names of the segments published by this process
+_published = set()
+# segments attached by this process by name, mapped until it exits: the
+# trees attached keep views of them
+_attached = {}
+
+
+def publish_snapshot(graph, name: str = None) -> SharedMemory:
+    """
+    Copy a graph into a new shared memory segment.
+
+    Args:
+        graph (Graph): The graph.
+        name (str, optional): The name of the segment. Defaults to a random one.
+
+    Returns:
+        SharedMemory: The segment, to ``close`` and ``unlink`` once the
+        graph is not served anymore.
+    """
+    parts = encode_snapshot(graph)
+    segment = SharedMemory(name=name, create=True, size=sum(len(part) for part in parts))
+    offset = 0
+    for part in parts:
+        segment.buf[offset : offset + len(part)] = part
+        offset += len(part)
+    _published.add(segment.name)
+    return segment
+
+
+def attach_snapshot(name: str):
+    """
+    Decode the graph of a shared memory segment, without copying it.
+
+    Args:
+        name (str): The name of the segment, see ``publish_snapshot``.
+
+    Returns:
+        tuple: The metadata (dict) and the read only tree (TreeGraph).
+    """
+    segment = _attached.get(name)
+    if segment is None:
+        try:
+            segment = SharedMemory(name=name, track=False)
+        except TypeError:
+            # before Python 3.13, attaching registers the segment to be
+            # unlinked when the process exits, which is up to the publisher
+            segment = SharedMemory(name=name)
+            if os.name == "posix" and name not in _published:
+                resource_tracker.unregister(segment._name, "shared_memory")
+        _attached[name] = segment
+    return decode_snapshot(segment.buf.toreadonly(), use_views=True)
@@ -0,0 +1,300 @@
+"""
+Graph snapshots: a built (and classified) graph in one file, see ``Graph.save`` and ``Graph.load``.
+
+Layout, little or big endian as written down in the metadata:
+
+- header: magic, format version, size of the metadata
+- metadata: JSON, the graph fields (page url, reports...) and the offset,
+  size and type of each section, relative to the first section
+- sections, 8 bytes aligned: the ``TreeGraph`` arrays (topology and
+  attribute columns), the text arena as UTF-8 (spans are byte offsets),
+  then the small tables (interned values, node keys...) as JSON
+
+Snapshots are always in the layout of the tree backend, whatever the
+backend of the graph saved.
+"""
+import json
+import mmap
+import struct
+import sys
+from array import array
+
+from cypherweb.core.columns import INTERNED_COLUMNS, TextArena
+from cypherweb.core.tree import TreeGraph
+
+MAGIC = b"CWGRAPH\0"
+VERSION = 1
+# magic, format version, metadata size
+HEADER = struct.Struct("<8sII")
+ALIGNMENT = 8
+
+
+def align(size: int) -> int:
+    return -(-size // ALIGNMENT) * ALIGNMENT
+
+
+class Utf8Arena(TextArena):
+    """``TextArena`` over UTF-8 bytes, offsets are in bytes.
+
+    The bytes of a snapshot are read as is (a memory map pages in only the
+    texts read); texts added later are appended after a copy of them.
+
+    """
+
+    def __init__(self, data=b"") -> None:
+        super().__init__()
+        self._data = data
+        self._size = len(data)
+
+    def add(self, text: str):
+        encoded = text.encode("utf-8")
+        start = self._size
+        self._pending.append(encoded)
+        self._size += len(encoded)
+        return start, self._size
+
+    def flush(self) -> None:
+        if self._pending:
+            self._data = bytes(self._data) + b"".join(self._pending)
+            self._pending = []
+
+    def get(self, start: int, end: int) -> str:
+        if end > len(self._data):
+            self.flush()
+        return str(self._data[start:end], "utf-8")
+
+    @property
+    def buffer(self) -> bytes:
+        """The whole buffer, as UTF-8."""
+        self.flush()
+        return bytes(self._data)
+
+
+def to_tree_graph(_graph) -> TreeGraph:
+    """
+    Copy a ``nx.DiGraph`` into a ``TreeGraph``, children in successor order.
+
+    Args:
+        _graph (nx.DiGraph | TreeGraph): The graph, a forest.
+
+    Returns:
+        TreeGraph: The copy, ``_graph`` itself if it already is a TreeGraph.
+
+    Raises:
+        ValueError: If a node has several parents.
+    """
+    if isinstance(_graph, TreeGraph):
+        return _graph
+    tree = TreeGraph()
+    for node, attributes in _graph.nodes(data=True):
+        tree.add_node(node)
+        tree.nodes[node].update(attributes)
+    for node in _graph.nodes:
+        for child in _graph.successors(node):
+            tree.add_edge(node, child)
+    return tree
+
+
+def encode_snapshot(graph):
+    """
+    Encode a graph in the snapshot format.
+
+    Node attributes outside of the columns (see ``AttributeColumns``) and
+    the reports must be JSON serializable. The HTML payload is not saved.
+
+    Args:
+        graph (Graph): The graph.
+
+    Returns:
+        list: The parts of the snapshot (bytes-like), to write end to end.
+    """
+    tree = to_tree_graph(graph._graph)
+    columns = tree.attributes
+    if tree._offsets is None or tree._changes:
+        tree._build_children()
+    # texts again, in UTF-8
+    arena = Utf8Arena()
+    spans = columns.copy_texts(arena)
+    sections = [
+        ("alive", "B", bytes(tree._alive)),
+        ("parents", "q", array("q", tree._parents)),
+        ("edge_children", "q", array("q", tree._edge_children)),
+        ("offsets", "q", array("q", tree._offsets)),
+        ("children", "q", array("q", tree._children)),
+        ("present", "H", array("H", columns._present)),
+    ]
+    sections += [
+        (f"codes.{key}", "q", array("q", columns._codes[key])) for key in INTERNED_COLUMNS
+    ]
+    sections += [
+        ("item_index", "q", array("q", columns._item_index)),
+        ("name_spans", "q", spans["_name_spans"]),
+        ("hash_spans", "q", spans["_hash_spans"]),
+        ("payload_spans", "q", spans["_payload_spans"]),
+        ("is_root", "B", bytes(columns._is_root)),
+        ("type_masks", "Q", array("Q", columns._type_masks)),
+        ("arena", "B", arena.buffer),
+        ("interned", "json", columns.interned.values),
+        ("type_names", "json", columns.type_names.values),
+        ("extra", "json", {str(index): values for index, values in columns.extra.items()}),
+    ]
+    if not tree.integer_ids:
+        sections.append(("keys", "json", tree._keys))
+    blobs = []
+    table = {}
+    offset = 0
+    for name, typecode, value in sections:
+        if typecode == "json":
+            blob = json.dumps(value).encode("utf-8")
+        elif isinstance(value, array):
+            blob = value.tobytes()
+        else:
+            blob = value
+        table[name] = [offset, len(blob), typecode]
+        blobs.append(blob)
+        blobs.append(b"\0" * (align(len(blob)) - len(blob)))
+        offset = align(offset + len(blob))
+    metadata = json.dumps(
+        {
+            "byteorder": sys.byteorder,
+            "page_url": graph.page_url,
+            "backend": graph.backend,
+            "content_hash": graph.content_hash,
+            "reports": graph.reports,
+            "labels": sorted(graph.labels),
+            "node_count": len(tree._keys),
+            "size": len(tree),
+            "sections": table,
+        }
+    ).encode("utf-8")
+    header_size = HEADER.size + len(metadata)
+    return [
+        HEADER.pack(MAGIC, VERSION, len(metadata)),
+        metadata,
+        b"\0" * (align(header_size) - header_size),
+    ] + blobs
+
+
+def write_snapshot(graph, path: str) -> None:
+    """
+    Write a graph to a snapshot file, see ``encode_snapshot``.
+
+    Args:
+        graph (Graph): The graph.
+        path (str): The file to write.
+    """
+    with open(path, "wb") as f:
+        for part in encode_snapshot(graph):
+            f.write(part)
+
+
+def decode_snapshot(data: memoryview, use_views: bool = True):
+    """
+    Decode a snapshot.
+
+    With ``use_views`` nothing but the small tables is read: the arrays of
+    the tree are views of ``data`` (eg. a memory map, paged in as queries
+    touch them). Such a tree is read only when ``data`` is, modifying it
+    raises a TypeError. Otherwise the arrays are copied.
+
+    Args:
+        data (memoryview): The snapshot.
+        use_views (bool): Use views of ``data`` instead of copies. Defaults to True.
+
+    Returns:
+        tuple: The metadata (dict) and the tree (TreeGraph).
+
+    Raises:
+        ValueError: If ``data`` is not a snapshot this version can read.
+    """
+    if len(data) < HEADER.size:
+        raise ValueError("not a graph snapshot")
+    magic, version, metadata_size = HEADER.unpack(data[: HEADER.size])
+    if magic != MAGIC:
+        raise ValueError("not a graph snapshot")
+    if version != VERSION:
+        raise ValueError(f"unsupported graph snapshot version {version} (expected {VERSION})")
+    metadata = json.loads(bytes(data[HEADER.size : HEADER.size + metadata_size]))
+    if metadata["byteorder"] != sys.byteorder:
+        raise ValueError(f"graph snapshot written on a {metadata['byteorder']} endian machine")
+    start = align(HEADER.size + metadata_size)
+
+    def read(name, typecode=None):
+        offset, size, section_typecode = metadata["sections"][name]
+        view = data[start + offset : start + offset + size]
+        if section_typecode == "json":
+            return json.loads(bytes(view))
+        if use_views:
+            return view if section_typecode == "B" else view.cast(section_typecode)
+        if section_typecode == "B":
+            return bytearray(view)
+        values = array(section_typecode)
+        values.frombytes(view)
+        # eg. the codes, "q" in the file and "l" in memory
+        return values if typecode is None else array(typecode, values)
+
+    node_count = metadata["node_count"]
+    tree = TreeGraph()
+    if "keys" in metadata["sections"]:
+        tree._keys = read("keys")
+        tree._alive = read("alive")
+        tree._index = {key: i for i, key in enumerate(tree._keys) if tree._alive[i]}
+    else:
+        tree._keys = range(node_count) if use_views else list(range(node_count))
+        tree._alive = read("alive")
+    tree._parents = read("parents")
+    tree._edge_children = read("edge_children")
+    tree._offsets = read("offsets")
+    tree._children = read("children")
+    tree._size = metadata["size"]
+    columns = tree.attributes
+    columns.interned.values = [
+        tuple(value) if type(value) is list else value for value in read("interned")
+    ]
+    columns.interned._codes = {value: code for code, value in enumerate(columns.interned.values)}
+    columns.type_names.values = read("type_names")
+    columns.type_names._codes = {
+        value: code for code, value in enumerate(columns.type_names.values)
+    }
+    columns.arena = Utf8Arena(read("arena"))
+    columns.extra = {int(index): values for index, values in read("extra").items()}
+    columns._present = read("present")
+    columns._codes = {key: read(f"codes.{key}", "l") for key in INTERNED_COLUMNS}
+    columns._item_index = read("item_index")
+    columns._name_spans = read("name_spans")
+    columns._hash_spans = read("hash_spans")
+    columns._payload_spans = read("payload_spans")
+    columns._is_root = read("is_root")
+    columns._type_masks = read("type_masks")
+    columns._size = node_count
+    return metadata, tree
+
+
+def read_snapshot(path: str, use_mmap: bool = True):
+    """
+    Read a snapshot file, see ``decode_snapshot``.
+
+    Args:
+        path (str): The snapshot file.
+        use_mmap (bool): Memory map the file (read only, shared by the
+            processes mapping it) instead of reading it into regular
+            arrays. Defaults to True.
+
+    Returns:
+        tuple: The metadata (dict) and the tree (TreeGraph).
+
+    Raises:
+        ValueError: If the file is not a snapshot this version can read.
+    """
+    with open(path, "rb") as f:
+        if len(f.read(HEADER.size)) < HEADER.size:
+            raise ValueError(f"{path} is not a graph snapshot")
+        if use_mmap:
+            data = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        else:
+            f.seek(0)
+            data = memoryview(f.read())
+    try:
+        return decode_snapshot(data, use_views=use_mmap)
+    except ValueError as e:
+        raise ValueError(f"{path}: {e}") from None
@@ -0,0 +1,178 @@
+import re
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
+from itertools import accumulate
+
+# between the texts of the buffers, texts are built without newlines (see format_text)
+SEPARATOR = "\n"
+# string match types of ``TextColumn.search``
+MATCH_TYPES = ("exact", "contains", "regex")
+
+
+@lru_cache(maxsize=256)
+def compile_pattern(pattern: str, flags: int = 0):
+    """Compile a regex, queries of a pattern are compiled once."""
+    return re.compile(pattern, flags)
+
+
+class TextBuffer:
+    """Texts concatenated in one string, with the offset of each of them."""
+
+    def __init__(self, texts) -> None:
+        self.lengths = array("q", [len(text) for text in texts])
+        # texts start after a separator, the buffer ends with one
+        self.starts = array("q", accumulate((length + 1 for length in self.lengths), initial=1))
+        self.buffer = SEPARATOR + SEPARATOR.join(texts) + SEPARATOR
+
+    def locate(self, offset: int) -> int:
+        """Get the text holding an offset of the buffer."""
+        return bisect_right(self.starts, offset) - 1
+
+    def get(self, n: int) -> str:
+        start = self.starts[n]
+        return self.buffer[start : start + self.lengths[n]]
+
+    def find_all(self, query: str) -> list:
+        """Get the texts containing ``query``, with the offset of its first occurrence in each."""
+        buffer, starts, lengths = self.buffer, self.starts, self.lengths
+        hits = []
+        size = len(query)
+        offset = buffer.find(query)
+        while offset != -1:
+            n = self.locate(offset)
+            end = starts[n] + lengths[n]
+            if offset >= starts[n] and offset + size <= end:
+                hits.append((n, offset - starts[n]))
+                # next text
+                offset = buffer.find(query, end + 1)
+            else:
+                # across a separator
+                offset = buffer.find(query, offset + 1)
+        return hits
+
+    def find_equal(self, query: str) -> list:
+        """Get the texts equal to ``query``."""
+        buffer, starts, lengths = self.buffer, self.starts, self.lengths
+        hits = []
+        size = len(query)
+        delimited = SEPARATOR + query + SEPARATOR
+        offset = buffer.find(delimited)
+        while offset != -1:
+            n = self.locate(offset + 1)
+            if starts[n] == offset + 1 and lengths[n] == size:
+                hits.append((n, 0))
+            # the closing separator opens the next text
+            offset = buffer.find(delimited, offset + 1)
+        return hits
+
+    def find_regex(self, pattern: str, flags: int = 0) -> list:
+        """Get the texts ``pattern`` fully matches."""
+        starts, lengths = self.starts, self.lengths
+        try:
+            # each text is a line of the buffer
+            compiled = compile_pattern(f"^(?:{pattern})$", flags | re.MULTILINE)
+        except re.error:
+            # eg. global flags in the pattern
+            compiled = None
+        if compiled is not None:
+            hits = []
+            for match in compiled.finditer(self.buffer):
+                start, end = match.span()
+                if start == end and (start < starts[0] or start >= starts[-1]):
+                    # the empty lines around the texts
+                    continue
+                n = self.locate(start)
+                if n < 0 or start != starts[n] or end != starts[n] + lengths[n]:
+                    # the pattern matched across a separator, check text by text
+                    break
+                hits.append((n, 0))
+            else:
+                return hits
+        compiled = compile_pattern(pattern, flags)
+        return [(n, 0) for n in range(len(lengths)) if compiled.fullmatch(self.get(n))]
+
+
+class TextColumn:
+    """The payload texts of a graph in one buffer, to match strings in one scan.
+
+    Kept by ``Graph``, see ``Graph.get_text_column``. Texts are stored as
+    is and lowercased (the buffer of case insensitive matches), each
+    buffer is built on first use.
+
+    Attributes
+    ----------
+    nodes: list
+        Node IDs with a text, in graph order.
+
+    """
+
+    def __init__(self, nodes, texts) -> None:
+        self.nodes = nodes
+        self._texts = texts
+        self._buffers = {}
+
+    @classmethod
+    def build(cls, graph) -> "TextColumn":
+        """
+        Collect the texts of the payloads of a graph.
+
+        Args:
+            graph (Graph): The graph.
+
+        Returns:
+            TextColumn: The column.
+        """
+        nodes = []
+        texts = []
+        for node, payload in zip(graph._graph.nodes, graph.get_column("payload")):
+            if payload and type(payload.get("text")) is str:
+                nodes.append(node)
+                texts.append(payload["text"])
+        return cls(nodes, texts)
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def get_buffer(self, lower: bool = False) -> TextBuffer:
+        """Get the buffer of the texts, lowercased with ``lower``."""
+        buffer = self._buffers.get(lower)
+        if buffer is None:
+            texts = [text.lower() for text in self._texts] if lower else self._texts
+            buffer = self._buffers[lower] = TextBuffer(texts)
+        return buffer
+
+    def search(self, query: str, match_type: str = "exact", lower: bool = False) -> list:
+        """
+        Find the texts matching a query.
+
+        Args:
+            query (str): The string, or the regex for "regex".
+            match_type (str): "exact" (the text is the query), "contains"
+                (the text contains it) or "regex" (the regex matches the
+                whole text). Defaults to "exact".
+            lower (bool): Match case insensitively, on the lowercased texts
+                (and query). Defaults to False.
+
+        Returns:
+            list: (text number, offset of the match in the text), in graph
+            order. The node of a text number is ``nodes[n]``, its text
+            ``get_buffer(lower).get(n)``.
+
+        Raises:
+            ValueError: If ``match_type`` is unknown.
+        """
+        if match_type not in MATCH_TYPES:
+            raise ValueError(f"unknown string match type {match_type!r}, expected one of {MATCH_TYPES}")
+        if not self.nodes:
+            return []
+        buffer = self.get_buffer(lower)
+        if match_type == "regex":
+            return buffer.find_regex(query, re.IGNORECASE if lower else 0)
+        if lower:
+            query = query.lower()
+        if match_type == "exact":
+            return buffer.find_equal(query)
+        if not query:
+            return [(n, 0) for n in range(len(self))]
+        return buffer.find_all(query)
@@ -0,0 +1,346 @@
+import itertools
+from array import array
+
+import networkx as nx
+
+from cypherweb.core.columns import AttributeColumns, NodeAttributes
+
+
+class TreeNodeView:
+    """``nx.DiGraph.nodes`` look-alike of a ``TreeGraph``."""
+
+    def __init__(self, tree) -> None:
+        self._tree = tree
+
+    def __getitem__(self, key) -> NodeAttributes:
+        return NodeAttributes(self._tree.attributes, self._tree.index(key))
+
+    def __contains__(self, key) -> bool:
+        return key in self._tree
+
+    def __iter__(self):
+        return iter(self._tree)
+
+    def __len__(self) -> int:
+        return len(self._tree)
+
+    def __call__(self, data=False):
+        if not data:
+            return iter(self._tree)
+        tree = self._tree
+        return (
+            (tree._keys[i], NodeAttributes(tree.attributes, i)) for i in tree._alive_indices()
+        )
+
+
+class TreeGraph:
+    """Array backed DOM tree with the subset of the ``nx.DiGraph`` API the pipeline uses.
+
+    Nodes are numbered in creation order. Each node has at most one parent,
+    kept in a parent array, and the children are stored as CSR arrays
+    (offsets + flat child indices, in edge insertion order). Edits after
+    the CSR arrays are built go through the parent array and a side table
+    of the edges added since, the arrays are rebuilt once the edits
+    outnumber the nodes: removing nodes one at a time stays linear. Node
+    keys live in a side table: while the keys are the node numbers
+    themselves (see ``emit_nodes(integer_ids=True)``) no key dict is kept
+    at all.
+
+    Attributes
+    ----------
+    attributes: AttributeColumns
+        The node attributes, by node number.
+    integer_ids: bool
+        Whether the node keys are the node numbers.
+    version: int
+        Incremented whenever nodes or edges are added or removed.
+    frozen: bool
+        Whether the tree is read only, see ``freeze``.
+
+    """
+
+    def __init__(self) -> None:
+        self._keys = []
+        # key -> node number, only once a key is not its node number
+        self._index = None
+        self.attributes = AttributeColumns()
+        self._alive = bytearray()
+        self._parents = array("q")
+        # children in edge insertion order, the CSR arrays are built from it
+        self._edge_children = array("q")
+        self._offsets = None
+        self._children = None
+        # since the CSR arrays were built: children added by parent, number of edits
+        self._extra_children = {}
+        self._changes = 0
+        self._size = 0
+        self._node_view = TreeNodeView(self)
+        self.version = 0
+        self.frozen = False
+
+    @property
+    def integer_ids(self) -> bool:
+        return self._index is None
+
+    @property
+    def nodes(self) -> TreeNodeView:
+        return self._node_view
+
+    def index(self, key) -> int:
+        """Get the node number of ``key``, raise KeyError if it is not in the tree."""
+        if self._index is None:
+            if type(key) is int and 0 <= key < len(self._keys) and self._alive[key]:
+                return key
+            raise KeyError(key)
+        index = self._index[key]
+        if not self._alive[index]:
+            raise KeyError(key)
+        return index
+
+    def __contains__(self, key) -> bool:
+        try:
+            self.index(key)
+        except (KeyError, TypeError):
+            return False
+        return True
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _alive_indices(self):
+        return (i for i, alive in enumerate(self._alive) if alive)
+
+    def __iter__(self):
+        keys = self._keys
+        return (keys[i] for i in self._alive_indices())
+
+    def freeze(self) -> None:
+        """Make the tree read only: modifying it raises a TypeError."""
+        if self._offsets is None or self._changes:
+            self._build_children()
+        self.attributes.freeze()
+        self.frozen = True
+
+    def _check_not_frozen(self) -> None:
+        if self.frozen:
+            raise TypeError("frozen graph can't be modified")
+
+    def add_node(self, key, **attr) -> None:
+        self._check_not_frozen()
+        if key in self:
+            self.nodes[key].update(attr)
+            return
+        index = len(self._keys)
+        if self._index is None and key != index:
+            self._index = {node_key: i for i, node_key in enumerate(self._keys)}
+        if self._index is not None:
+            self._index[key] = index
+        self._keys.append(key)
+        self._alive.append(1)
+        self.attributes.add_node()
+        node_attributes = NodeAttributes(self.attributes, index)
+        for name, value in attr.items():
+            node_attributes[name] = value
+        self._parents.append(-1)
+        self._size += 1
+        self.version += 1
+        if self._offsets is not None:
+            # past the end of the CSR arrays
+            self._changes += 1
+
+    def add_edge(self, u, v) -> None:
+        self._check_not_frozen()
+        for key in (u, v):
+            if key not in self:
+                self.add_node(key)
+        parent, child = self.index(u), self.index(v)
+        if self._parents[child] == parent:
+            return
+        if self._parents[child] != -1:
+            raise ValueError(f"tree backend: {v} already has a parent")
+        self._parents[child] = parent
+        self._edge_children.append(child)
+        if self._offsets is not None:
+            self._extra_children.setdefault(parent, []).append(child)
+            self._changes += 1
+        self.version += 1
+
+    def add_edges_from(self, edges) -> None:
+        for u, v in edges:
+            self.add_edge(u, v)
+
+    def _build_children(self) -> None:
+        parents = self._parents
+        if self._changes:
+            # drop the edges of removed nodes; a child attached again after
+            # its parent was removed is logged twice, the last edge holds
+            seen = bytearray(len(self._keys))
+            edge_children = []
+            for child in reversed(self._edge_children):
+                if parents[child] != -1 and not seen[child]:
+                    seen[child] = 1
+                    edge_children.append(child)
+            edge_children.reverse()
+            self._edge_children = array("q", edge_children)
+        # counting sort of the edges by parent, insertion order is kept
+        offsets = array("q", [0]) * (len(self._keys) + 1)
+        edge_children = self._edge_children
+        for child in edge_children:
+            offsets[parents[child] + 1] += 1
+        for i in range(len(self._keys)):
+            offsets[i + 1] += offsets[i]
+        positions = array("q", offsets)
+        children = array("q", [0]) * len(edge_children)
+        for child in edge_children:
+            parent = parents[child]
+            children[positions[parent]] = child
+            positions[parent] += 1
+        self._offsets = offsets
+        self._children = children
+        self._extra_children = {}
+        self._changes = 0
+
+    def child_indices(self, index: int):
+        """Get the node numbers of the children of node number ``index``."""
+        if self._offsets is None or self._changes > len(self._keys):
+            self._build_children()
+        if not self._changes:
+            return self._children[self._offsets[index] : self._offsets[index + 1]]
+        # skip the children removed or attached elsewhere since the build
+        parents = self._parents
+        built = (
+            self._children[self._offsets[index] : self._offsets[index + 1]]
+            if index + 1 < len(self._offsets)
+            else ()
+        )
+        return [
+            child
+            for child in itertools.chain(built, self._extra_children.get(index, ()))
+            if parents[child] == index
+        ]
+
+    def parent_index(self, index: int) -> int:
+        """Get the node number of the parent of node number ``index``, -1 for roots."""
+        return self._parents[index]
+
+    def successors(self, key):
+        children = self.child_indices(self.index(key))
+        if self._index is None:
+            return iter(children)
+        keys = self._keys
+        return iter([keys[i] for i in children])
+
+    neighbors = successors
+
+    def predecessors(self, key):
+        parent = self._parents[self.index(key)]
+        return iter([] if parent == -1 else [self._keys[parent]])
+
+    def out_degree(self, key) -> int:
+        index = self.index(key)
+        if self._offsets is None or self._changes:
+            return len(self.child_indices(index))
+        return self._offsets[index + 1] - self._offsets[index]
+
+    def in_degree(self, key) -> int:
+        return 0 if self._parents[self.index(key)] == -1 else 1
+
+    @property
+    def edges(self):
+        if self._changes:
+            self._build_children()
+        keys = self._keys
+        return [
+            (keys[self._parents[child]], keys[child])
+            for child in self._edge_children
+        ]
+
+    def remove_node(self, key) -> None:
+        self.index(key)
+        self.remove_nodes_from([key])
+
+    def remove_nodes_from(self, keys) -> None:
+        self._check_not_frozen()
+        indices = set()
+        for key in keys:
+            if key in self:
+                indices.add(self.index(key))
+        # the edges of the removed nodes are dropped from the parent array
+        # only, the CSR arrays skip them until they are rebuilt
+        for index in indices:
+            for child in self.child_indices(index):
+                self._parents[child] = -1
+        for index in indices:
+            self._parents[index] = -1
+            if self._index is not None:
+                del self._index[self._keys[index]]
+            self._alive[index] = 0
+            self.attributes.clear(index)
+        self._size -= len(indices)
+        self.version += 1
+        if self._offsets is not None:
+            self._changes += len(indices)
+
+    def get_column(self, key):
+        """Get the values of a node attribute in node order, None for the nodes without it."""
+        return self.attributes.get_column(key, self._alive_indices())
+
+    def get_presence(self, key) -> bytearray:
+        """Get whether each node has a value (not None) for an attribute, in node order."""
+        return self.attributes.get_presence(key, self._alive_indices())
+
+    def ancestor_indices(self, key):
+        """Get the node numbers from ``key`` (included) up to its root."""
+        index = self.index(key)
+        path = []
+        while index != -1:
+            path.append(index)
+            index = self._parents[index]
+        return path
+
+
+def tree_get_neighbors(graph, node):
+    return [{"id": node_id} for node_id in graph.successors(node)]
+
+
+def tree_get_predecessors(graph, node):
+    return [{"id": node_id} for node_id in graph.predecessors(node)]
+
+
+def tree_get_shortest_path(graph, source, target):
+    # the only path of a tree goes up from target to source
+    path = graph.ancestor_indices(target)
+    source_index = graph.index(source)
+    if source_index not in path:
+        raise nx.NetworkXNoPath(f"No path between {source} and {target}.")
+    return [graph._keys[index] for index in reversed(path[: path.index(source_index) + 1])]
+
+
+def tree_lowest_common_ancestor(graph, node_ref, node):
+    ancestors = set(graph.ancestor_indices(node_ref))
+    for index in graph.ancestor_indices(node):
+        if index in ancestors:
+            return graph._keys[index]
+    return None
+
+
+def tree_all_pairs_lowest_common_ancestor(graph, pairs):
+    # same output as networkx: pairs without a common ancestor are skipped
+    for node_ref, node in dict.fromkeys(pairs):
+        ancestor = tree_lowest_common_ancestor(graph, node_ref, node)
+        if ancestor is not None:
+            yield (node_ref, node), ancestor
+
+
+def tree_get_column(graph, key):
+    return graph.get_column(key)
+
+
+def tree_get_presence(graph, key):
+    return graph.get_presence(key)
+
+
+def tree_set_node_attributes(graph, attrs):
+    for node, node_attrs in attrs.items():
+        if node in graph:
+            graph.nodes[node].update(node_attrs)
@@ -2,3 +2,6 @@ from .grids import GridClassifier
 from .link_list import LinkListClassifier
 from .title import TitleClassifier
 from .link import LinkClassifier
+from .features import FeatureTable
+from .fused import FusedClassifier
+from .templates import TemplateCache
@@ -0,0 +1,245 @@
+from array import array
+import re
+
+from cypherweb.core.indexes import get_indexed_values
+
+HEADING_PATTERN = re.compile(r"^h[1-6]$")
+# first child signature of a node, until a child is seen
+NO_SIGNATURE = object()
+
+
+def is_heading(element_type) -> bool:
+    return type(element_type) is str and HEADING_PATTERN.match(element_type.lower()) is not None
+
+
+def get_first_class(element_class):
+    # the pseudo class of a node, from its class attribute
+    try:
+        return element_class[0]
+    except Exception:
+        return None
+
+
+class FeatureTable:
+    """Per node features of a graph, computed once and shared by the classifiers.
+
+    Nodes are numbered in graph order (``positions``), each feature is a
+    column indexed by node number, so that classifiers select nodes with
+    one pass over a few columns instead of walking the graph. Built from
+    the attribute columns of the graph (see ``Graph.get_column``) and one
+    traversal of the graph from its roots.
+
+    Columns are computed on first use, a group at a time (see
+    ``_COLUMNS``): classifiers run on their own, eg. on demand (see
+    ``FusedClassifier``), only pay for the columns they read.
+
+    Attributes
+    ----------
+    graph: Graph
+        The graph.
+    nodes: list
+        Node IDs, by node number.
+    positions: dict
+        Node number of each node ID.
+    tags: list
+        Element types, by tag code.
+    tag: array
+        Tag code of each node.
+    pseudo_class: list
+        First class of each node, None if it has none.
+    classes: list
+        Classes of each node, a tuple.
+    parent: array
+        Node number of the parent of each node, -1 for roots.
+    depth: array
+        Depth of each node, roots at 0.
+    order: array
+        Node numbers in pre-order.
+    children: list
+        Node numbers of the children of each node, in order.
+    child_count: array
+        Number of children of each node.
+    link_child_count: array
+        Number of children of each node that are links.
+    heading: bytearray
+        Whether the element type of each node, or one of the element types
+        it was merged with, is a heading (h1 to h6).
+    has_payload: bytearray
+        Whether each node has a payload.
+    text_length: array
+        Length of the text of the payload of each node.
+    changed: bytearray
+        Whether each node has to be classified, see ``Graph.get_changed_nodes``.
+
+    """
+
+    # the method computing each column
+    _COLUMNS = {
+        "tags": "_build_tags",
+        "tag": "_build_tags",
+        "pseudo_class": "_build_classes",
+        "classes": "_build_classes",
+        "has_payload": "_build_has_payload",
+        "text_length": "_build_text_lengths",
+        "heading": "_build_headings",
+        "changed": "_build_changed",
+        "parent": "_build_topology",
+        "depth": "_build_topology",
+        "order": "_build_topology",
+        "children": "_build_topology",
+        "child_count": "_build_topology",
+        "link_child_count": "_build_topology",
+    }
+
+    def __init__(self, graph) -> None:
+        self.graph = graph
+        self.nodes = list(graph._graph.nodes)
+        self.positions = {node: position for position, node in enumerate(self.nodes)}
+
+    def __getattr__(self, name):
+        builder = FeatureTable._COLUMNS.get(name)
+        if builder is None:
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+        getattr(self, builder)()
+        return self.__dict__[name]
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def _build_tags(self) -> None:
+        codes = {}
+        self.tag = array("l", [codes.setdefault(tag, len(codes)) for tag in self.graph.get_column("element_type")])
+        self.tags = list(codes)
+
+    def _build_classes(self) -> None:
+        values = self.graph.get_column("class")
+        self.pseudo_class = [get_first_class(value) for value in values]
+        self.classes = [get_indexed_values("class", value) for value in values]
+
+    def _build_has_payload(self) -> None:
+        self.has_payload = self.graph.get_presence("payload")
+
+    def _build_text_lengths(self) -> None:
+        payloads = self.graph.get_column("payload")
+        self.text_length = array(
+            "q",
+            [
+                len(payload["text"])
+                if type(payload) is dict and type(payload.get("text")) is str
+                else 0
+                for payload in payloads
+            ],
+        )
+
+    def _build_headings(self) -> None:
+        # headings by distinct value, most nodes share a few of them
+        headings = {}
+        tag = self.tag
+        tag_headings = [is_heading(element_type) for element_type in self.tags]
+        self.heading = heading = bytearray(len(self))
+        for position, element_types in enumerate(self.graph.get_column("all_element_types")):
+            if tag_headings[tag[position]]:
+                heading[position] = 1
+                continue
+            key = tuple(element_types or ())
+            if key not in headings:
+                headings[key] = any(is_heading(element_type) for element_type in key)
+            heading[position] = headings[key]
+
+    def _build_changed(self) -> None:
+        changed_nodes = self.graph.changed_nodes
+        if changed_nodes is None:
+            self.changed = bytearray(b"\x01") * len(self)
+        else:
+            self.changed = bytearray(node in changed_nodes for node in self.nodes)
+
+    def _build_topology(self) -> None:
+        _graph = self.graph._graph
+        nodes, positions, size = self.nodes, self.positions, len(self)
+        self.parent = parent = array("q", [-1]) * size
+        self.depth = depth = array("q", [0]) * size
+        self.child_count = array("q", [0]) * size
+        self.link_child_count = array("q", [0]) * size
+        self.order = array("q")
+        self.children = [()] * size
+        tag = self.tag
+        link_code = self.get_tag_code("a")
+        for root in range(size):
+            if _graph.in_degree(nodes[root]) != 0:
+                continue
+            stack = [root]
+            while stack:
+                position = stack.pop()
+                self.order.append(position)
+                children = [positions[child] for child in _graph.successors(nodes[position])]
+                self.children[position] = children
+                self.child_count[position] = len(children)
+                for child in children:
+                    parent[child] = position
+                    depth[child] = depth[position] + 1
+                    if tag[child] == link_code:
+                        self.link_child_count[position] += 1
+                stack.extend(reversed(children))
+
+    def get_tag_code(self, tag) -> int:
+        """Get the code of an element type, -1 if no node has it."""
+        try:
+            return self.tags.index(tag)
+        except ValueError:
+            return -1
+
+
+def annotate(
+    graph, classifiers, table: FeatureTable = None, order: list = None, selections: dict = None
+) -> dict:
+    """
+    Run classifiers over one feature table and write what they found at once.
+
+    The result is the one of running the classifiers one after the other:
+    each one prepends its ``label`` to the types of the nodes it selects
+    (see their ``select``), which only depends on the graph before any of
+    them ran. The labels are then added to ``graph.labels``.
+
+    Args:
+        graph (Graph): The graph to classify.
+        classifiers (list): The classifiers, in order.
+        table (FeatureTable, optional): The features of ``graph``. Defaults
+            to computing them.
+        order (list, optional): The labels of all the classifiers of the
+            graph, in the order they run. When classifiers run a few at a
+            time (see ``FusedClassifier``), the labels of a node are kept
+            in the order running them all at once gives.
+        selections (dict, optional): What some of the classifiers select,
+            by label, known beforehand (see ``TemplateCache``): they are
+            not run.
+
+    Returns:
+        dict: What each classifier selected, by label.
+    """
+    selections = dict(selections or {})
+    labels = {}
+    attrs = {}
+    for classifier in classifiers:
+        selected = selections.get(classifier.label)
+        if selected is None:
+            if table is None:
+                table = FeatureTable(graph)
+            selected = selections[classifier.label] = classifier.select(graph, table)
+        for node, node_attrs in selected.items():
+            labels.setdefault(node, []).insert(0, classifier.label)
+            attrs.setdefault(node, {}).update(node_attrs)
+    nodes = graph._graph.nodes
+    rank = {label: position for position, label in enumerate(order or ())}
+    for node, node_labels in labels.items():
+        types = nodes[node]["type"]
+        if rank:
+            # the labels found before lead the types too
+            count = 0
+            while count < len(types) and types[count] in rank:
+                count += 1
+            node_labels = sorted(node_labels + types[:count], key=rank.__getitem__, reverse=True)
+            types = types[count:]
+        attrs[node]["type"] = node_labels + types
+    graph.set_node_attributes(attrs)
+    graph.labels.update(classifier.label for classifier in classifiers)
+    return selections
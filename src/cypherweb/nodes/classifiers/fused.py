@@ -0,0 +1,147 @@
+from typing import List
+
+from cypherweb.core.node import Node
+from cypherweb.core.graph import Graph
+from cypherweb.nodes.classifiers.features import FeatureTable, annotate
+from cypherweb.nodes.classifiers.grids import GridClassifier
+from cypherweb.nodes.classifiers.link import LinkClassifier
+from cypherweb.nodes.classifiers.link_list import LinkListClassifier
+from cypherweb.nodes.classifiers.templates import TemplateCache, get_template_fingerprint
+from cypherweb.nodes.classifiers.title import TitleClassifier
+
+
+class FusedClassifier(Node):
+    """Run several classifiers in one pass over a shared ``FeatureTable``.
+
+    Same result as running the classifiers one after the other, with the
+    features computed once and a single ``set_node_attributes``.
+
+    Each classifier declares the node types it adds (``produces``) and the
+    ones it reads (``requires``). A lazy instance classifies nothing when
+    it processes a graph: it is kept on the graph, which runs the
+    classifiers a query needs when it first asks for their types (see
+    ``Graph.ensure_labels``). The classifiers of the types required are
+    run first.
+
+    With a ``TemplateCache``, what the classifiers select on a page is
+    kept for its template: on the next pages of the same template their
+    selection is projected instead of computed, only the attributes
+    depending on the texts (see ``TitleClassifier.get_attributes``) are.
+
+    Attributes
+    ----------
+    classifiers: List[Node]
+        The classifiers, in the order they would run. Defaults to grids,
+        link lists, titles and links.
+    lazy: bool
+        Classify on demand instead of when processing the graph.
+    cache: TemplateCache
+        The selections of the classifiers by page template, None to
+        always run them.
+
+    """
+
+    def __init__(
+        self, classifiers: List[Node] = None, lazy: bool = False, cache: TemplateCache = None
+    ) -> None:
+        if classifiers is None:
+            classifiers = [
+                GridClassifier(),
+                LinkListClassifier(),
+                TitleClassifier(),
+                LinkClassifier(),
+            ]
+        self.classifiers = classifiers
+        self.lazy = lazy
+        self.cache = cache
+
+    @property
+    def labels(self) -> List[str]:
+        """The labels of the classifiers, in the order they run."""
+        return [classifier.label for classifier in self.classifiers]
+
+    def classify(self, graph: Graph, labels=None) -> None:
+        """
+        Run the classifiers producing the labels the graph does not have yet.
+
+        Args:
+            graph (Graph): The graph to classify.
+            labels (Iterable, optional): The node types needed, the ones no
+                classifier produces are ignored. Defaults to all.
+
+        Returns:
+            None
+        """
+        if labels is None:
+            labels = self.labels
+        missing = set(labels) - graph.labels
+        classifiers = [
+            classifier
+            for classifier in self.classifiers
+            if not missing.isdisjoint(classifier.produces)
+            and not graph.labels.issuperset(classifier.produces)
+        ]
+        if classifiers:
+            required = {label for classifier in classifiers for label in classifier.requires}
+            if required:
+                # written before the classifiers reading them select anything
+                self.classify(graph, required)
+            self._annotate(graph, classifiers)
+        if graph.classifier is self and graph.labels.issuperset(self.labels):
+            graph.classifier = None
+
+    def _annotate(self, graph: Graph, classifiers: List[Node]) -> None:
+        table = FeatureTable(graph)
+        if self.cache is None or graph.changed_nodes is not None:
+            # on a rebuild only the changed nodes are classified, nothing to share
+            annotate(graph, classifiers, table, self.labels)
+            return
+        fingerprint = get_template_fingerprint(table)
+        cached = self.cache.get(fingerprint, [classifier.label for classifier in classifiers])
+        selections = {}
+        for classifier in classifiers:
+            positions = cached.get(classifier.label)
+            if positions is None:
+                continue
+            nodes = [table.nodes[position] for position in positions]
+            if hasattr(classifier, "get_attributes"):
+                selections[classifier.label] = classifier.get_attributes(graph, nodes)
+            else:
+                selections[classifier.label] = {node: {} for node in nodes}
+        selections = annotate(graph, classifiers, table, self.labels, selections)
+        for classifier in classifiers:
+            if classifier.label not in cached:
+                positions = [table.positions[node] for node in selections[classifier.label]]
+                self.cache.put(fingerprint, classifier.label, positions)
+
+    def process(self, graph: Graph) -> None:
+        """
+        Process the given graph by annotating the vertices with the types of all the classifiers.
+
+        Lazy, only attach the classifiers to the graph. On a rebuild, the
+        unchanged nodes kept the labels of the previous graph: the changed
+        ones are classified for them now, and for the other labels all the
+        nodes are.
+
+        Args:
+            graph (Graph): The graph to be processed.
+
+        Returns:
+            None
+        """
+        if graph.previous is None or graph.changed_nodes is None:
+            if self.lazy:
+                graph.classifier = self
+            else:
+                self._annotate(graph, self.classifiers)
+            return
+        self.classify(graph, graph.previous.labels)
+        if self.lazy:
+            if not graph.labels.issuperset(self.labels):
+                graph.classifier = self
+            return
+        changed_nodes, graph.changed_nodes = graph.changed_nodes, None
+        try:
+            self.classify(graph)
+        finally:
+            graph.changed_nodes = changed_nodes
@@ -1,84 +1,205 @@
 from collections import Counter
-import itertools
+
 from cypherweb.core.node import Node
 from cypherweb.core.graph import Graph
+from cypherweb.nodes.classifiers.features import NO_SIGNATURE, FeatureTable, annotate
+from cypherweb.utils.minhash import MinHash, get_band_rows, group_near_duplicates
+
+# levels below a child its shape covers, see get_shape_shingles
+SHAPE_DEPTH = 2
+
+
+def get_shape_shingles(table: FeatureTable, position: int, depth: int = SHAPE_DEPTH) -> frozenset:
+    """
+    Describe the shape of a subtree as a set of strings, to compare siblings.
 
+    Args:
+        table (FeatureTable): The features of the graph.
+        position (int): The node number of the root of the subtree.
+        depth (int): The levels below the root covered. Defaults to SHAPE_DEPTH.
+
+    Returns:
+        frozenset: The element type and the classes of each node, and the
+        element types of each pair of consecutive children, with their
+        depth below the root.
+    """
+    tags, tag, classes, children = table.tags, table.tag, table.classes, table.children
+    shingles = set()
+    level = [position]
+    for relative_depth in range(depth + 1):
+        next_level = []
+        for node in level:
+            element_type = tags[tag[node]]
+            shingles.add(f"{relative_depth}:{element_type}")
+            for name in classes[node]:
+                shingles.add(f"{relative_depth}:{element_type}.{name}")
+            node_children = children[node]
+            for left, right in zip(node_children, node_children[1:]):
+                shingles.add(f"{relative_depth}:{tags[tag[left]]}+{tags[tag[right]]}")
+            next_level.extend(node_children)
+        level = next_level
+    return frozenset(shingles)
+
+
+def get_near_duplicate_grids(
+    table: FeatureTable, positions, similarity: float, min_share: float = 0.8, num_perm: int = 32
+) -> list:
+    """
+    Keep the nodes whose children are mostly near duplicates of each other.
 
-def get_pseudo_class(graph, node):
-    try:
-        return graph._graph.nodes[node]["class"][0]
-    except Exception as e:
-        # print("get_pseudo_class", e)
-        return None
+    The shapes of the children (see ``get_shape_shingles``) are sketched
+    with MinHash and grouped with locality sensitive hashing (see
+    ``group_near_duplicates``): no pair of siblings is compared unless
+    their sketches share a band.
 
+    Args:
+        table (FeatureTable): The features of the graph.
+        positions (list): The node numbers to test.
+        similarity (float): The smallest Jaccard similarity of the shapes of near duplicates.
+        min_share (float): The smallest share of the children the largest
+            group of near duplicates must hold. Defaults to 0.8.
+        num_perm (int): The length of the sketches. Defaults to 32.
 
-def get_grid_candidates(raw_graph):
+    Returns:
+        list: The node numbers kept.
+    """
+    minhash = MinHash(num_perm)
+    rows = get_band_rows(similarity, num_perm)
+    children = table.children
+    grids = []
+    for position in positions:
+        sketches = [minhash.sketch(get_shape_shingles(table, child)) for child in children[position]]
+        if len(sketches) < 2:
+            continue
+        largest = max(Counter(group_near_duplicates(sketches, similarity, rows)).values())
+        if largest >= 2 and largest >= min_share * len(sketches):
+            grids.append(position)
+    return grids
+
+
+def get_grid_candidates(
+    raw_graph,
+    table: FeatureTable = None,
+    similarity: float = None,
+    min_share: float = 0.8,
+    num_perm: int = 32,
+):
     """
     Generates the grid candidates based on the raw graph.
 
     Args:
         raw_graph (Graph): The raw graph object.
+        table (FeatureTable, optional): The features of the graph. Defaults to computing them.
+        similarity (float, optional): Also accept the nodes whose children
+            are mostly near duplicates, at least this similar (see
+            ``get_near_duplicate_grids``). Defaults to None, children must
+            have zero entropy.
+        min_share (float): The share of the children near duplicates must make up. Defaults to 0.8.
+        num_perm (int): The length of the MinHash sketches. Defaults to 32.
 
     Returns:
         dict: A dictionary containing the grid candidates and their counts.
 
     Notes:
-        How grids are detected (refer to readme).
+        How grids are detected (refer to readme): a grid is the lowest common
+        ancestor of nodes with a payload at the same depth, whose children
+        all share the same element type and pseudo class (zero entropy).
+        The ancestors of such pairs are the nodes with payloads at the same
+        depth under two of their children: they are found in one bottom-up
+        pass, each node merging the payload depths of its children (small
+        sets into large ones) instead of computing the lowest common
+        ancestor of every pair. With a ``similarity``, the children of a
+        node may differ by a badge or a modifier class: the node is a grid
+        when most of them have near duplicate shapes. On a rebuild, only
+        the changed nodes are candidates.
     """
-    # step 1 : get leaf nodes
-    nodes_with_payload = [
-        node
-        for node in raw_graph._graph.nodes
-        if raw_graph._graph.nodes[node].get("payload") is not None
-    ]
-    # step 2 : get dist from root and cluster nodes based on dist_to_root
-    clusters = {}
-    root_node = [
-        node
-        for node in raw_graph._graph.nodes
-        if raw_graph._graph.nodes[node].get("is_root")
-    ][0]
-    for node in nodes_with_payload:
-        path = raw_graph.get_shortest_path(source=root_node, target=node)
-        # print(path)
-        dist_to_root = len(path)
-        if f"dist_{dist_to_root}" not in clusters:
-            clusters[f"dist_{dist_to_root}"] = [node]
-        else:
-            clusters[f"dist_{dist_to_root}"].append(node)
-
-    # # step3 : get common ancestor for each cluster
-    incestors_scores = Counter()
-    for nodes in clusters.values():
-        # get all pairs
-        pairs = list(itertools.combinations(nodes, 2))
-        incestors = dict(raw_graph.all_pairs_lowest_common_ancestor(pairs))
-        for inc in incestors.values():
-            incestors_scores[inc] += 1
-    # rprint(incestors_scores)
-    # step 4 : filter candidates with 0 entropy (same child type)
-    grid_cands = {}
-    for inc in incestors_scores:
-        inc_neighbors = raw_graph.get_neighbors(inc)
-        zero_entropy = (
-            len(set([node["id"].split("_")[0] for node in inc_neighbors])) == 1
-            and len(
-                set([get_pseudo_class(raw_graph, node["id"]) for node in inc_neighbors])
-            )
-            == 1
+    if table is None:
+        table = FeatureTable(raw_graph)
+    size = len(table)
+    tag, pseudo_class = table.tag, table.pseudo_class
+    parent, depth, has_payload = table.parent, table.depth, table.has_payload
+    # payload depths of the subtrees visited, until merged into their parent
+    depth_sets = [None] * size
+    is_shared = bytearray(size)
+    # (element type, pseudo class) of the first child, then whether the others differ
+    first_signatures = [NO_SIGNATURE] * size
+    is_mixed = bytearray(size)
+    # children before their parent
+    for position in reversed(table.order):
+        depths = depth_sets[position]
+        depth_sets[position] = None
+        if has_payload[position]:
+            if depths is None:
+                depths = set()
+            depths.add(depth[position])
+        parent_position = parent[position]
+        if parent_position == -1:
+            continue
+        signature = (tag[position], pseudo_class[position])
+        if first_signatures[parent_position] is NO_SIGNATURE:
+            first_signatures[parent_position] = signature
+        elif signature != first_signatures[parent_position]:
+            is_mixed[parent_position] = 1
+        if not depths:
+            continue
+        merged = depth_sets[parent_position]
+        if merged is None:
+            depth_sets[parent_position] = depths
+            continue
+        if len(depths) > len(merged):
+            merged, depths = depths, merged
+            depth_sets[parent_position] = merged
+        if not is_shared[parent_position] and not merged.isdisjoint(depths):
+            is_shared[parent_position] = 1
+        merged |= depths
+    child_count, changed, nodes = table.child_count, table.changed, table.nodes
+    # the other changed nodes kept what was found on them in the previous graph
+    candidates = [position for position in range(size) if is_shared[position] and changed[position]]
+    grids = [position for position in candidates if not is_mixed[position]]
+    if similarity is not None:
+        grids += get_near_duplicate_grids(
+            table,
+            [position for position in candidates if is_mixed[position]],
+            similarity,
+            min_share,
+            num_perm,
         )
+        grids.sort()
+    return {nodes[position]: child_count[position] for position in grids}
 
-        if zero_entropy:
-            grid_cands[inc] = len(inc_neighbors)
-    return grid_cands
 
+class GridClassifier(Node):
+    """Type ``grid`` the nodes holding repeated items, eg. a list of cards.
+
+    Attributes
+    ----------
+    similarity: float
+        Also detect grids whose children are near duplicates, at least this
+        similar (Jaccard similarity of their shapes, eg. 0.7). None by
+        default: the children of a grid must share their element type and
+        pseudo class.
+    min_share: float
+        Share of the children the near duplicates must make up.
+    num_perm: int
+        Length of the MinHash sketches of the shapes.
 
-from rich import print as rprint
+    """
 
+    label = "grid"
+    produces = ("grid",)
+    requires = ()
 
-class GridClassifier(Node):
-    def __init__(self) -> None:
-        pass
+    def __init__(self, similarity: float = None, min_share: float = 0.8, num_perm: int = 32) -> None:
+        self.similarity = similarity
+        self.min_share = min_share
+        self.num_perm = num_perm
+
+    def select(self, graph: Graph, table: FeatureTable) -> dict:
+        """Select the grids, see ``annotate``."""
+        candidates = get_grid_candidates(
+            graph, table, self.similarity, self.min_share, self.num_perm
+        )
+        return {node: {} for node in candidates}
 
     def process(self, graph: Graph) -> None:
         """
@@ -90,11 +211,4 @@ class GridClassifier(Node):
         Returns:
             None
         """
-        grid_candidates = get_grid_candidates(graph)
-        # annotate vertices
-        attrs = {
-            node: {"type": ["grid"] + graph._graph.nodes[node]["type"]}
-            for node in grid_candidates
-        }
-
-        graph.set_node_attributes(attrs)
+        annotate(graph, [self])
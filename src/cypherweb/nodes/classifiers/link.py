@@ -1,28 +1,38 @@
 from cypherweb.core.node import Node
 from cypherweb.core.graph import Graph
+from cypherweb.nodes.classifiers.features import FeatureTable, annotate
 
 
-def node_is_link(graph, node_id):
-    return graph._graph.nodes[node_id]["element_type"] == "a"
-
-
-def get_link_list_candidates(graph):
+def get_link_list_candidates(graph, table: FeatureTable = None):
     """
     Generate a list of candidates for link nodes in the given graph.
 
     Parameters:
         graph (Graph): The graph from which to generate the candidates.
+        table (FeatureTable, optional): The features of the graph. Defaults to computing them.
 
     Returns:
         list: A list of nodes that are candidates for link nodes.
     """
-    return [node for node in graph._graph.nodes if node_is_link(graph, node)]
+    if table is None:
+        table = FeatureTable(graph)
+    link_code = table.get_tag_code("a")
+    tag, changed, nodes = table.tag, table.changed, table.nodes
+    return [nodes[position] for position in range(len(table)) if tag[position] == link_code and changed[position]]
 
 
 class LinkClassifier(Node):
+    label = "link"
+    produces = ("link",)
+    requires = ()
+
     def __init__(self) -> None:
         pass
 
+    def select(self, graph: Graph, table: FeatureTable) -> dict:
+        """Select the links, see ``annotate``."""
+        return {node: {} for node in get_link_list_candidates(graph, table)}
+
     def process(self, graph: Graph) -> None:
         """
         Process the given graph by annotating the vertices with specific attributes.
@@ -33,11 +43,4 @@ class LinkClassifier(Node):
         Returns:
             None
         """
-        grid_candidates = get_link_list_candidates(graph)
-        # annotate vertices
-        attrs = {
-            node: {"type": ["link"] + graph._graph.nodes[node]["type"]}
-            for node in grid_candidates
-        }
-
-        graph.set_node_attributes(attrs)
+        annotate(graph, [self])
@@ -0,0 +1,110 @@
+import hashlib
+import threading
+from array import array
+from collections import OrderedDict
+
+from cypherweb.nodes.classifiers.features import FeatureTable
+
+
+def get_template_fingerprint(table: FeatureTable) -> str:
+    """
+    Get a structural fingerprint of a graph, the same for the pages of a template.
+
+    It covers the skeleton of the graph, texts and links ignored: the
+    element types, classes and children of the nodes in graph order and
+    whether they have a payload. Classifiers select the same node
+    numbers on two graphs of the same fingerprint.
+
+    Args:
+        table (FeatureTable): The features of the graph, for its node numbers.
+
+    Returns:
+        str: The fingerprint, hexadecimal.
+    """
+    graph, positions = table.graph, table.positions
+    _graph = graph._graph
+    digest = hashlib.blake2b(digest_size=16)
+    for key in ("element_type", "all_element_types", "class"):
+        digest.update(repr(graph.get_column(key)).encode("utf-8"))
+    digest.update(table.has_payload)
+    # children of each node, in order, after their count
+    children = array("q")
+    for node in table.nodes:
+        node_children = [positions[child] for child in _graph.successors(node)]
+        children.append(len(node_children))
+        children.extend(node_children)
+    digest.update(children.tobytes())
+    return digest.hexdigest()
+
+
+class TemplateCache:
+    """Least recently used cache of what classifiers select on page templates.
+
+    Pages of a site built from the same template have the same structural
+    fingerprint (see ``get_template_fingerprint``): the node numbers the
+    classifiers selected on one of them are projected on the others,
+    instead of running the classifiers again (see ``FusedClassifier``).
+    Shared by the threads of a pipeline. A cache serves classifiers of one
+    configuration, eg. one grid similarity.
+
+    Attributes
+    ----------
+    max_size: int
+        Number of templates kept, the least recently used are dropped first.
+    hits: int
+        Number of labels projected from the cache.
+    misses: int
+        Number of labels computed by the classifiers.
+
+    """
+
+    def __init__(self, max_size: int = 1024) -> None:
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        # node numbers selected by label, by fingerprint
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, fingerprint: str, labels) -> dict:
+        """
+        Get the node numbers selected on a template.
+
+        Args:
+            fingerprint (str): The fingerprint of the template.
+            labels (Iterable[str]): The labels of the classifiers.
+
+        Returns:
+            dict: The node numbers (array) by label, for the labels cached.
+        """
+        labels = list(labels)
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is not None:
+                self._entries.move_to_end(fingerprint)
+            found = {label: entry[label] for label in labels if entry is not None and label in entry}
+            self.hits += len(found)
+            self.misses += len(labels) - len(found)
+        return found
+
+    def put(self, fingerprint: str, label: str, positions) -> None:
+        """
+        Record the node numbers a classifier selected on a template.
+
+        Args:
+            fingerprint (str): The fingerprint of the template.
+            label (str): The label of the classifier.
+            positions (Iterable[int]): The node numbers selected.
+        """
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is None:
+                entry = self._entries[fingerprint] = {}
+            else:
+                self._entries.move_to_end(fingerprint)
+            entry[label] = array("q", positions)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
@@ -1,6 +1,6 @@
 from cypherweb.core.node import Node
 from cypherweb.core.graph import Graph
-import re
+from cypherweb.nodes.classifiers.features import HEADING_PATTERN, FeatureTable, annotate
 
 
 def is_elem_heading(string):
@@ -13,58 +13,45 @@ def is_elem_heading(string):
     Returns:
         bool: True if the string is a heading element, False otherwise.
     """
-    string = string.lower()
-    # Define a regular expression pattern to match h1 to h6 headings
-    heading_pattern = r"^h[1-6]$"
+    # h1 to h6 headings, see HEADING_PATTERN
+    return bool(HEADING_PATTERN.match(string.lower()))
 
-    # Use re.match to check if the entire string matches the pattern
-    return bool(re.match(heading_pattern, string))
 
-
-def get_title_candidates(graph):
+def get_title_candidates(graph, table: FeatureTable = None):
     """
     Returns a list of title candidates from the given graph.
 
     Args:
         graph (Graph): The graph object containing the nodes.
+        table (FeatureTable, optional): The features of the graph. Defaults to computing them.
 
     Returns:
         list: A list of nodes that are considered title candidates.
     """
     # TODO : add more heuritics to detect titles (token count + 0 links within element as proxy ?)
-    return [
-        node
-        for node in graph._graph.nodes
-        if is_elem_heading(graph._graph.nodes[node].get("element_type")) or
-        any([is_elem_heading(elem_type)
-            for elem_type in graph._graph.nodes[node].get("all_element_types")])
-    ]
+    if table is None:
+        table = FeatureTable(graph)
+    heading, changed, nodes = table.heading, table.changed, table.nodes
+    return [nodes[position] for position in range(len(table)) if heading[position] and changed[position]]
 
 
 class TitleClassifier(Node):
+    label = "title"
+    produces = ("title",)
+    requires = ()
+
     def __init__(self) -> None:
         pass
 
-    def process(self, graph: Graph) -> None:
-        """
-        Process the given graph by annotating the vertices with title attributes.
+    def select(self, graph: Graph, table: FeatureTable) -> dict:
+        """Select the titles, with the payload of the title wrappers, see ``annotate``."""
+        return self.get_attributes(graph, get_title_candidates(graph, table))
 
-        Args:
-            graph (Graph): The graph to be processed.
-
-        Returns:
-            None
-        """
-        title_candidates = get_title_candidates(graph)
-        # annotate vertices
-        # attrs = {
-        #     node: {"type": ["title"] + graph._graph.nodes[node]["type"]}
-        #     for node in title_candidates
-        # }
+    def get_attributes(self, graph: Graph, nodes) -> dict:
+        """Get the attributes to set on titles: the payload of the title wrappers, from their texts."""
         attrs = {}
-        for node in title_candidates:
-            attrs[node] = {"type": ["title"] +
-                           graph._graph.nodes[node]["type"]}
+        for node in nodes:
+            attrs[node] = {}
             if not graph._graph.nodes[node].get("payload"):
                 # handle title wrapper
                 # get all childs
@@ -79,5 +66,16 @@ class TitleClassifier(Node):
                     "href": None,
                     "alt": None,
                 }
+        return attrs
 
-        graph.set_node_attributes(attrs)
+    def process(self, graph: Graph) -> None:
+        """
+        Process the given graph by annotating the vertices with title attributes.
+
+        Args:
+            graph (Graph): The graph to be processed.
+
+        Returns:
+            None
+        """
+        annotate(graph, [self])
@@ -1 +1,6 @@
 from .basic_crawler import BasicCrawler
+from .async_crawler import AsyncCrawler
+from .http_cache import HttpCache
+from .site_crawler import SiteCrawler
+from .streaming_crawler import StreamingCrawler
+from .corpus import CorpusConnector
@@ -0,0 +1,158 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cypherweb.core.node import Node
+from cypherweb.core.graph import Graph
+from cypherweb.nodes.connectors.basic_crawler import HEADERS, fetch_page
+
+
+class AsyncCrawler(Node):
+    """Concurrent drop-in replacement for ``BasicCrawler``.
+
+    Pages are fetched on a background asyncio loop. Concurrency is bounded
+    globally and per host, and connections are kept alive in per-host pools
+    so consecutive pages of a site reuse the same sockets.
+
+    Attributes
+    ----------
+    max_connections: int
+        Maximum number of requests in flight.
+    max_connections_per_host: int
+        Maximum number of requests in flight against a single host.
+    timeout: tuple
+        (connect timeout, read timeout) in seconds.
+    cache: HttpCache
+        Optional on-disk cache shared with ``BasicCrawler``.
+
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 64,
+        max_connections_per_host: int = 8,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 20.0,
+        headers: dict = None,
+        cache=None,
+    ) -> None:
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.timeout = (connect_timeout, read_timeout)
+        self.headers = headers or HEADERS
+        self.cache = cache
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=max_connections, pool_maxsize=max_connections_per_host
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max_connections)
+
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        # semaphores are bound to the background loop, they are created from it
+        self._semaphore = None
+        self._host_semaphores = {}
+
+    def _get_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, daemon=True
+                )
+                self._thread.start()
+            return self._loop
+
+    def _get_page(self, page_url):
+        return fetch_page(
+            page_url, self.session, self.cache, self.timeout, self.headers
+        )
+
+    async def fetch(self, page_url: str, delay: float = 0.0):
+        """
+        Fetch a page once a global and a per host slot are available.
+
+        Args:
+            page_url (str): The url of the page.
+            delay (float): Seconds to wait before queuing the request.
+
+        Returns:
+            tuple: The decoded page, the sha256 of its body and its url after
+            redirects, (None, None, None) if the request failed.
+        """
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_connections)
+        host = urlsplit(page_url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(
+                self.max_connections_per_host
+            )
+        async with self._semaphore, self._host_semaphores[host]:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._get_page, page_url)
+
+    def submit(self, page_url: str, delay: float = 0.0):
+        """
+        Schedule a fetch on the background loop.
+
+        Args:
+            page_url (str): The url of the page.
+            delay (float): Seconds to wait before queuing the request.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the decoded page, its sha256 and its url after redirects.
+        """
+        return asyncio.run_coroutine_threadsafe(
+            self.fetch(page_url, delay), self._get_loop()
+        )
+
+    def stream(self, page_urls):
+        """
+        Fetch pages concurrently and yield them as soon as they arrive.
+
+        Args:
+            page_urls (Iterable[str]): The urls to fetch.
+
+        Yields:
+            Graph: A graph per url with its ``html_payload`` set, in completion order.
+        """
+        futures = {self.submit(page_url): page_url for page_url in page_urls}
+        for future in as_completed(futures):
+            graph = Graph(futures[future])
+            graph.html_payload, graph.content_hash, _ = future.result()
+            yield graph
+
+    def close(self) -> None:
+        """Stop the background loop and release pooled connections."""
+        with self._lock:
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._thread.join()
+                self._loop.close()
+                self._loop = None
+                self._semaphore = None
+                self._host_semaphores = {}
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+    def process(self, graph: Graph) -> None:
+        """
+        Process the given graph by retrieving the HTML payload of the page URL.
+
+        Args:
+            graph (Graph): The graph object representing the web page.
+
+        Returns:
+            None
+        """
+        graph.html_payload, graph.content_hash, _ = self.submit(graph.page_url).result()
@@ -1,26 +1,145 @@
 from cypherweb.core.node import Node
 from cypherweb.core.graph import Graph
+import codecs
+import hashlib
+import re
 import requests
+from requests.compat import chardet
 
+HEADERS = {
+    "User-Agent": "Mozilla/5.0",
+}
+# (connect timeout, read timeout) in seconds
+TIMEOUT = (5.0, 20.0)
 
-def get_page(page_url):
+HEADER_CHARSET = re.compile(r"charset\s*=\s*[\"']?([\w.:-]+)", re.I)
+META_CHARSET = re.compile(rb"<meta[^>]+charset\s*=\s*[\"']?\s*([\w.:-]+)", re.I)
+
+
+def lookup_charset(charset):
+    if isinstance(charset, bytes):
+        charset = charset.decode("ascii", errors="ignore")
+    try:
+        return codecs.lookup(charset).name
+    except LookupError:
+        return None
+
+
+def decode_payload(content, headers):
     """
-    Retrieve the text content of a webpage.
+    Decode a response body.
+
+    The charset declared in the ``Content-Type`` header wins, then the one of a
+    ``<meta>`` tag in the head of the document, then utf-8. Charset detection
+    is only used when none of them applies since it scans the whole body.
+
+    Args:
+        content (bytes): The raw response body.
+        headers (Mapping): The response headers.
+
+    Returns:
+        str: The decoded body.
+    """
+    match = HEADER_CHARSET.search(headers.get("Content-Type", ""))
+    charset = lookup_charset(match.group(1)) if match else None
+    if charset is None:
+        match = META_CHARSET.search(content[:4096])
+        charset = lookup_charset(match.group(1)) if match else None
+    if charset is not None:
+        return content.decode(charset, errors="replace")
+    try:
+        return content.decode("utf-8")
+    except UnicodeDecodeError:
+        charset = lookup_charset(chardet.detect(content)["encoding"] or "utf-8")
+        return content.decode(charset or "utf-8", errors="replace")
+
+
+def read_cached_page(cache, page_url, entry):
+    """
+    Read a page from the cache.
+
+    Returns:
+        tuple: The decoded page, the sha256 of its body and its url after
+        redirects, None if the body was evicted meanwhile.
+    """
+    try:
+        content = cache.read(page_url, entry)
+    except OSError:
+        return None
+    headers = {"Content-Type": entry["content_type"] or ""}
+    return decode_payload(content, headers), entry["body_hash"], entry["response_url"] or page_url
+
+
+def fetch_page(page_url, session=None, cache=None, timeout=TIMEOUT, headers=None):
+    """
+    Retrieve the text content of a webpage, going through ``cache`` when given.
+
+    A fresh cache hit skips the network, a stale one is revalidated with a
+    conditional request and a ``304`` answer skips the transfer.
+
+    Args:
+        page_url (str): The url of the page.
+        session (requests.Session): Session to send the request with, defaults to ``requests``.
+        cache (HttpCache): Optional on-disk cache.
+        timeout (tuple): (connect timeout, read timeout) in seconds.
+        headers (dict): Request headers, defaults to ``HEADERS``.
+
+    Returns:
+        tuple: The decoded page, the sha256 of its body and its url after
+        redirects (the url relative links are resolved against),
+        (None, None, None) if the request failed.
     """
-    headers = {
-        "User-Agent": "Mozilla/5.0",
-    }
+    session = session or requests
+    headers = headers or HEADERS
+    request_headers = dict(headers)
+    entry = cache.lookup(page_url) if cache is not None else None
+    if entry is not None and cache.is_fresh(entry):
+        cached = read_cached_page(cache, page_url, entry)
+        if cached is not None:
+            return cached
+    if entry is not None:
+        request_headers.update(cache.validators(entry))
     try:
-        response = requests.get(page_url, headers=headers)
+        response = session.get(page_url, headers=request_headers, timeout=timeout)
+        if response.status_code == 304 and entry is not None:
+            cache.revalidate(page_url, response.headers)
+            cached = read_cached_page(cache, page_url, entry)
+            if cached is not None:
+                return cached
+            # evicted meanwhile, fetch it again without validators
+            response = session.get(page_url, headers=headers, timeout=timeout)
         response.raise_for_status()
-        return response.text
+        if cache is not None:
+            body_hash = cache.store(page_url, response.content, response.headers, response.url)
+        else:
+            body_hash = hashlib.sha256(response.content).hexdigest()
+        return decode_payload(response.content, response.headers), body_hash, response.url or page_url
     except requests.exceptions.RequestException as e:
         print(f"An error occurred: {e}")
+    return None, None, None
+
+
+def get_page(page_url, cache=None):
+    """
+    Retrieve the text content of a webpage.
+    """
+    html_payload, _, _ = fetch_page(page_url, cache=cache)
+    return html_payload
 
 
 class BasicCrawler(Node):
-    def __init__(self) -> None:
-        pass
+    """Fetch the page of the graph.
+
+    Attributes
+    ----------
+    cache: HttpCache
+        Optional on-disk cache, pages fetched again are revalidated instead
+        of downloaded.
+
+    """
+
+    def __init__(self, cache=None) -> None:
+        self.cache = cache
 
     def process(self, graph: Graph) -> None:
         """
@@ -33,5 +152,6 @@ class BasicCrawler(Node):
             None
         """
         page_url = graph.page_url
-        html_payload = get_page(page_url)
+        html_payload, content_hash, _ = fetch_page(page_url, cache=self.cache)
         graph.html_payload = html_payload
+        graph.content_hash = content_hash
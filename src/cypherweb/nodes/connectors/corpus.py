@@ -0,0 +1,327 @@
+import gzip
+import json
+import mmap
+import os
+import zlib
+from pathlib import Path
+
+from cypherweb.core.node import Node
+from cypherweb.core.graph import Graph
+from cypherweb.nodes.connectors.basic_crawler import decode_payload
+
+HTML_SUFFIXES = (".html", ".htm", ".html.gz", ".htm.gz")
+WARC_SUFFIXES = (".warc", ".warc.gz")
+WARC_RECORD_TYPES = (b"response", b"resource")
+INDEX_SUFFIX = ".cwidx"
+INDEX_VERSION = 1
+
+
+def parse_headers(block: bytes) -> dict:
+    """Parse ``Key: value`` header lines, keys are lowercased."""
+    headers = {}
+    for line in block.split(b"\r\n"):
+        key, sep, value = line.partition(b":")
+        if sep:
+            headers[key.strip().lower().decode("latin-1")] = value.strip()
+    return headers
+
+
+def dechunk(body: bytes) -> bytes:
+    """Decode a ``Transfer-Encoding: chunked`` body."""
+    parts = []
+    position = 0
+    while position < len(body):
+        line_end = body.find(b"\r\n", position)
+        if line_end < 0:
+            break
+        size = int(body[position:line_end].split(b";")[0] or b"0", 16)
+        if size == 0:
+            break
+        parts.append(body[line_end + 2 : line_end + 2 + size])
+        position = line_end + 2 + size + 2
+    return b"".join(parts)
+
+
+def read_http_response(block: bytes):
+    """
+    Split the HTTP response stored in a WARC record.
+
+    Args:
+        block (bytes): The record content (status line, headers and body).
+
+    Returns:
+        tuple: The response headers (with their original case) and the decoded body bytes.
+    """
+    head, _, body = block.partition(b"\r\n\r\n")
+    headers = {}
+    for line in head.split(b"\r\n")[1:]:
+        key, sep, value = line.partition(b":")
+        if sep:
+            headers[key.strip().decode("latin-1").title()] = value.strip().decode(
+                "latin-1"
+            )
+    if "chunked" in headers.get("Transfer-Encoding", "").lower():
+        body = dechunk(body)
+    if headers.get("Content-Encoding", "").lower() in ("gzip", "x-gzip"):
+        try:
+            body = gzip.decompress(body)
+        except (OSError, EOFError):
+            pass
+    return headers, body
+
+
+def iter_warc_records(data):
+    """
+    Iterate over the records of an uncompressed WARC buffer.
+
+    Args:
+        data (bytes | mmap.mmap): The buffer.
+
+    Yields:
+        tuple: (warc headers, content offset, content length).
+    """
+    position = 0
+    while True:
+        start = data.find(b"WARC/", position)
+        if start < 0:
+            return
+        header_end = data.find(b"\r\n\r\n", start)
+        if header_end < 0:
+            return
+        headers = parse_headers(data[start:header_end])
+        length = int(headers.get("content-length", b"0"))
+        content_offset = header_end + 4
+        yield headers, content_offset, length
+        position = content_offset + length
+
+
+def is_html_record(headers, block_head: bytes) -> bool:
+    if headers.get("warc-type") not in WARC_RECORD_TYPES:
+        return False
+    if headers.get("warc-type") == b"resource":
+        return b"html" in headers.get("content-type", b"")
+    http_head = block_head.partition(b"\r\n\r\n")[0].lower()
+    return b"content-type:" not in http_head or b"html" in http_head
+
+
+def index_warc(buffer):
+    """
+    Index the HTML response records of a plain WARC file.
+
+    Returns:
+        list: [url, content offset, content length, kind] entries.
+    """
+    entries = []
+    for headers, offset, length in iter_warc_records(buffer):
+        if is_html_record(headers, buffer[offset : offset + min(length, 8192)]):
+            url = headers.get("warc-target-uri", b"").decode("utf-8", "replace")
+            kind = "warc" if headers["warc-type"] == b"response" else "resource"
+            entries.append([url, offset, length, kind])
+    return entries
+
+
+def index_warc_gz(buffer):
+    """
+    Index the HTML response records of a WARC.gz file.
+
+    Records are expected in separate gzip members (the standard layout),
+    the offset and length of each member are stored so that a record can
+    be inflated on its own.
+
+    Returns:
+        list: [url, member offset, member length, kind] entries.
+    """
+    entries = []
+    position = 0
+    size = len(buffer)
+    while position < size:
+        decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+        parts = []
+        cursor = position
+        while not decompressor.eof and cursor < size:
+            chunk = buffer[cursor : cursor + (1 << 16)]
+            parts.append(decompressor.decompress(chunk))
+            cursor += len(chunk)
+        member_length = cursor - position - len(decompressor.unused_data)
+        if member_length <= 0:
+            break
+        record = b"".join(parts)
+        for headers, offset, length in iter_warc_records(record):
+            if is_html_record(headers, record[offset : offset + min(length, 8192)]):
+                url = headers.get("warc-target-uri", b"").decode("utf-8", "replace")
+                kind = "warc.gz" if headers["warc-type"] == b"response" else "resource.gz"
+                entries.append([url, position, member_length, kind])
+            # one record per member
+            break
+        position += member_length
+    return entries
+
+
+class CorpusConnector(Node):
+    """Read pages from archives on local disk instead of the network.
+
+    Supported inputs are WARC and WARC.gz files, gzip'd HTML files, plain
+    HTML files and directory trees of those. Files are memory mapped and an
+    offset index is kept next to each archive (``<archive>.cwidx``) so that
+    any record can be opened without scanning the archive again.
+
+    Attributes
+    ----------
+    path: str
+        The archive file or directory.
+    shard: int
+        Index of the shard iterated by ``iter_graphs``.
+    num_shards: int
+        Number of shards the records are split into, eg. one per worker process.
+
+    """
+
+    def __init__(self, path: str, shard: int = 0, num_shards: int = 1) -> None:
+        if not 0 <= shard < num_shards:
+            raise ValueError(f"shard {shard} out of range for {num_shards} shards")
+        self.path = path
+        self.shard = shard
+        self.num_shards = num_shards
+        self._maps = {}
+        # [file, url, offset, length, kind] per record
+        self.records = []
+        for file_path in self._list_files(Path(path)):
+            for url, offset, length, kind in self._load_index(file_path):
+                self.records.append([str(file_path), url, offset, length, kind])
+        self._url_index = {record[1]: n for n, record in enumerate(self.records)}
+
+    @staticmethod
+    def _list_files(path):
+        if path.is_file():
+            return [path]
+        return sorted(
+            file_path
+            for file_path in path.rglob("*")
+            if file_path.is_file()
+            and file_path.name.lower().endswith(HTML_SUFFIXES + WARC_SUFFIXES)
+        )
+
+    def _map(self, file_path):
+        if file_path not in self._maps:
+            with open(file_path, "rb") as f:
+                self._maps[file_path] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._maps[file_path]
+
+    def _load_index(self, file_path):
+        name = file_path.name.lower()
+        if not name.endswith(WARC_SUFFIXES):
+            kind = "html.gz" if name.endswith(".gz") else "html"
+            return [[file_path.resolve().as_uri(), 0, file_path.stat().st_size, kind]]
+        if file_path.stat().st_size == 0:
+            return []
+        stat = file_path.stat()
+        signature = [INDEX_VERSION, stat.st_size, stat.st_mtime_ns]
+        index_path = Path(str(file_path) + INDEX_SUFFIX)
+        try:
+            with open(index_path) as f:
+                index = json.load(f)
+            if index["signature"] == signature:
+                return index["entries"]
+        except (OSError, ValueError, KeyError):
+            pass
+        buffer = self._map(str(file_path))
+        entries = index_warc_gz(buffer) if name.endswith(".gz") else index_warc(buffer)
+        # written aside then renamed: the workers of other shards may be
+        # reading or writing the index of the same archive
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump({"signature": signature, "entries": entries}, f)
+            os.replace(tmp_path, index_path)
+        except OSError:
+            # read-only archive, the index only lives in memory
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        return entries
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def read(self, n: int) -> str:
+        """
+        Read the HTML of record ``n``.
+
+        Args:
+            n (int): The record number.
+
+        Returns:
+            str: The decoded page.
+        """
+        file_path, _, offset, length, kind = self.records[n]
+        if length == 0:
+            return ""
+        block = self._map(file_path)[offset : offset + length]
+        if kind.endswith(".gz"):
+            block = gzip.decompress(block)
+        if kind in ("warc.gz", "resource.gz"):
+            # the member holds the whole record, skip its WARC headers
+            _, offset, length = next(iter_warc_records(block))
+            block = block[offset : offset + length]
+        if kind.startswith("warc"):
+            headers, body = read_http_response(block)
+            return decode_payload(body, headers)
+        # html files and resource records hold the bare document
+        return decode_payload(block, {})
+
+    def get(self, n: int) -> Graph:
+        """Get the graph of record ``n`` with its ``html_payload`` set."""
+        graph = Graph(self.records[n][1])
+        graph.html_payload = self.read(n)
+        return graph
+
+    def shard_range(self):
+        """Get the contiguous range of record numbers of this shard."""
+        start = len(self.records) * self.shard // self.num_shards
+        end = len(self.records) * (self.shard + 1) // self.num_shards
+        return range(start, end)
+
+    def iter_graphs(self):
+        """
+        Iterate over the records of this shard.
+
+        Yields:
+            Graph: A graph per record with its ``html_payload`` set.
+        """
+        for n in self.shard_range():
+            yield self.get(n)
+
+    def stream(self, page_urls):
+        """
+        Read the records of the given urls, for ``GraphProcessPipeline.build_many``.
+
+        Yields:
+            Graph: A graph per known url with its ``html_payload`` set.
+        """
+        for page_url in page_urls:
+            graph = Graph(page_url)
+            self.process(graph)
+            yield graph
+
+    def close(self) -> None:
+        """Unmap the archives."""
+        for buffer in self._maps.values():
+            buffer.close()
+        self._maps = {}
+
+    def process(self, graph: Graph) -> None:
+        """
+        Process the given graph by reading the HTML payload of the page URL from the corpus.
+
+        Args:
+            graph (Graph): The graph object representing the web page.
+
+        Returns:
+            None
+        """
+        n = self._url_index.get(graph.page_url)
+        if n is None:
+            print(f"An error occurred: {graph.page_url} is not in {self.path}")
+            return
+        graph.html_payload = self.read(n)
@@ -0,0 +1,292 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+MAX_AGE = re.compile(r"max-age\s*=\s*(\d+)")
+
+
+def get_max_age(headers, default_max_age=0):
+    """
+    Get how long a response can be served without revalidation.
+
+    Args:
+        headers (Mapping): The response headers.
+        default_max_age (int): Used when the server sets neither ``max-age``
+            nor ``Expires``.
+
+    Returns:
+        int: The freshness lifetime in seconds, None if the response must not be stored.
+    """
+    cache_control = headers.get("Cache-Control", "").lower()
+    if "no-store" in cache_control:
+        return None
+    if "no-cache" in cache_control:
+        return 0
+    match = MAX_AGE.search(cache_control)
+    if match:
+        return int(match.group(1))
+    if "Expires" in headers:
+        return get_expires_max_age(headers)
+    return default_max_age
+
+
+def get_expires_max_age(headers):
+    """
+    Get the freshness lifetime set by the ``Expires`` header.
+
+    It is relative to the ``Date`` of the response when the server sent
+    one, to not depend on the clock of the crawler.
+
+    Args:
+        headers (Mapping): The response headers, with ``Expires``.
+
+    Returns:
+        int: The freshness lifetime in seconds, 0 for an invalid date (already expired).
+    """
+    try:
+        expires = parsedate_to_datetime(headers["Expires"]).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return 0
+    now = time.time()
+    if "Date" in headers:
+        try:
+            now = parsedate_to_datetime(headers["Date"]).timestamp()
+        except (TypeError, ValueError, IndexError):
+            pass
+    return max(int(expires - now), 0)
+
+
+class HttpCache:
+    """Persistent on-disk cache of fetched pages.
+
+    Bodies are content addressed: they are stored once under the sha256 of
+    their bytes, whatever the number of urls serving them. A small sqlite
+    index maps each url to its body and the validators (ETag, Last-Modified)
+    needed to revalidate it. A body is deleted once no url points to it,
+    eg. when the page changed, and the least recently used urls are
+    evicted once the bodies exceed ``max_size`` bytes.
+
+    Attributes
+    ----------
+    path: str
+        The cache directory.
+    max_size: int
+        Maximum total size of the stored bodies, in bytes.
+    default_max_age: int
+        Freshness lifetime of responses that set neither ``max-age`` nor
+        ``Expires``.
+
+    """
+
+    def __init__(
+        self, path: str, max_size: int = 512 * 2**20, default_max_age: int = 0
+    ) -> None:
+        self.path = path
+        self.max_size = max_size
+        self.default_max_age = default_max_age
+        os.makedirs(os.path.join(path, "bodies"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(path, "index.sqlite"), check_same_thread=False
+        )
+        with self._db:
+            self._db.execute(
+                """CREATE TABLE IF NOT EXISTS entries (
+                    url TEXT PRIMARY KEY,
+                    body_hash TEXT NOT NULL,
+                    content_type TEXT,
+                    etag TEXT,
+                    last_modified TEXT,
+                    fetched_at REAL NOT NULL,
+                    max_age INTEGER NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    response_url TEXT
+                )"""
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS bodies (hash TEXT PRIMARY KEY, size INTEGER)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS entries_lru ON entries (accessed_at)"
+            )
+
+    def _body_path(self, body_hash):
+        return os.path.join(self.path, "bodies", body_hash[:2], body_hash)
+
+    def lookup(self, url: str):
+        """
+        Get the cache entry of an url.
+
+        Args:
+            url (str): The url of the page.
+
+        Returns:
+            dict: The entry, None on a miss.
+        """
+        with self._lock:
+            row = self._db.execute(
+                """SELECT body_hash, content_type, etag, last_modified, fetched_at, max_age,
+                response_url FROM entries WHERE url = ?""",
+                (url,),
+            ).fetchone()
+        if row is None or not os.path.exists(self._body_path(row[0])):
+            return None
+        keys = ["body_hash", "content_type", "etag", "last_modified", "fetched_at"]
+        return dict(zip(keys + ["max_age", "response_url"], row))
+
+    def is_fresh(self, entry: dict) -> bool:
+        """Check if an entry can be served without asking the server."""
+        return time.time() - entry["fetched_at"] < entry["max_age"]
+
+    def validators(self, entry: dict) -> dict:
+        """Get the conditional request headers revalidating an entry."""
+        headers = {}
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def read(self, url: str, entry: dict) -> bytes:
+        """Read the body of an entry and mark it as recently used."""
+        with open(self._body_path(entry["body_hash"]), "rb") as f:
+            content = f.read()
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE entries SET accessed_at = ? WHERE url = ?", (time.time(), url)
+            )
+        return content
+
+    def revalidate(self, url: str, headers) -> None:
+        """
+        Refresh an entry after a ``304 Not Modified`` response.
+
+        Args:
+            url (str): The url of the page.
+            headers (Mapping): The headers of the 304 response.
+        """
+        max_age = get_max_age(headers, self.default_max_age) or 0
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                """UPDATE entries SET fetched_at = ?, accessed_at = ?, max_age = ?,
+                etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified)
+                WHERE url = ?""",
+                (
+                    now,
+                    now,
+                    max_age,
+                    headers.get("ETag"),
+                    headers.get("Last-Modified"),
+                    url,
+                ),
+            )
+
+    def store(self, url: str, content: bytes, headers, response_url: str = None) -> str:
+        """
+        Store a response.
+
+        A ``no-store`` response is not stored and drops the entry of the url,
+        its previous version must not be served anymore.
+
+        Args:
+            url (str): The url of the page.
+            content (bytes): The raw response body.
+            headers (Mapping): The response headers.
+            response_url (str): The url of the response after redirects,
+                if it is not ``url``.
+
+        Returns:
+            str: The sha256 of the body.
+        """
+        body_hash = hashlib.sha256(content).hexdigest()
+        max_age = get_max_age(headers, self.default_max_age)
+        if max_age is None:
+            self.delete(url)
+            return body_hash
+        body_path = self._body_path(body_hash)
+        if not os.path.exists(body_path):
+            os.makedirs(os.path.dirname(body_path), exist_ok=True)
+            tmp_path = f"{body_path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, body_path)
+        now = time.time()
+        with self._lock, self._db:
+            previous = self._db.execute(
+                "SELECT body_hash FROM entries WHERE url = ?", (url,)
+            ).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO bodies VALUES (?, ?)", (body_hash, len(content))
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    url,
+                    body_hash,
+                    headers.get("Content-Type"),
+                    headers.get("ETag"),
+                    headers.get("Last-Modified"),
+                    now,
+                    max_age,
+                    now,
+                    response_url if response_url != url else None,
+                ),
+            )
+            if previous is not None and previous[0] != body_hash:
+                # the page changed, its old body may not be served anymore
+                self._release(previous[0])
+            self._evict()
+        return body_hash
+
+    def delete(self, url: str) -> None:
+        """Drop the entry of an url, and its body if no other url serves it."""
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT body_hash FROM entries WHERE url = ?", (url,)
+            ).fetchone()
+            if row is not None:
+                self._db.execute("DELETE FROM entries WHERE url = ?", (url,))
+                self._release(row[0])
+
+    def _release(self, body_hash):
+        # called with the lock held, inside a transaction: delete a body no
+        # url points to anymore, returns the bytes freed
+        (refs,) = self._db.execute(
+            "SELECT COUNT(*) FROM entries WHERE body_hash = ?", (body_hash,)
+        ).fetchone()
+        if refs > 0:
+            return 0
+        row = self._db.execute("SELECT size FROM bodies WHERE hash = ?", (body_hash,)).fetchone()
+        self._db.execute("DELETE FROM bodies WHERE hash = ?", (body_hash,))
+        try:
+            os.remove(self._body_path(body_hash))
+        except FileNotFoundError:
+            pass
+        return 0 if row is None else row[0]
+
+    def _evict(self):
+        # called with the lock held, inside a transaction
+        (total,) = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM bodies").fetchone()
+        if total <= self.max_size:
+            return
+        # bodies left behind by pages that changed, before evicting live urls
+        orphans = self._db.execute(
+            "SELECT hash FROM bodies WHERE hash NOT IN (SELECT body_hash FROM entries)"
+        ).fetchall()
+        for (body_hash,) in orphans:
+            total -= self._release(body_hash)
+        if total <= self.max_size:
+            return
+        lru = self._db.execute(
+            "SELECT url, body_hash FROM entries ORDER BY accessed_at"
+        ).fetchall()
+        for url, body_hash in lru:
+            if total <= self.max_size:
+                break
+            self._db.execute("DELETE FROM entries WHERE url = ?", (url,))
+            total -= self._release(body_hash)
@@ -0,0 +1,251 @@
+import json
+import posixpath
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+from cypherweb.core.node import Node
+from cypherweb.core.graph import Graph
+from cypherweb.core.url import Url
+from cypherweb.nodes.connectors.async_crawler import AsyncCrawler
+from cypherweb.utils.bloom import BloomFilter
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def canonicalize_url(href, base_url=None):
+    """
+    Get the canonical form of an url so that equivalent urls are crawled once.
+
+    The url is resolved against ``base_url``, scheme and host are lowercased,
+    default ports, dot segments and fragments are removed.
+
+    Args:
+        href (str): The url, possibly relative.
+        base_url (str): The url of the page the href was found on.
+
+    Returns:
+        str: The canonical url, None if it is not an http(s) url.
+    """
+    if href is None:
+        return None
+    href = href.strip()
+    url = urljoin(base_url, href) if base_url else href
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parts.hostname:
+        return None
+    netloc = parts.hostname.lower()
+    if port is not None and port != DEFAULT_PORTS[scheme]:
+        netloc = f"{netloc}:{port}"
+    path = parts.path or "/"
+    if "." in path:
+        normalized = posixpath.normpath(path)
+        # normpath keeps a leading "//" and drops the trailing slash
+        path = "/" + normalized.lstrip("/") if normalized != "." else "/"
+        if parts.path.endswith("/") and path != "/":
+            path += "/"
+    return urlunsplit((scheme, netloc, path, parts.query, ""))
+
+
+class Frontier:
+    """FIFO of (url, depth) to crawl, bounded in memory.
+
+    Once ``max_in_memory`` entries are queued, newer entries are spilled to
+    a temporary file and read back in order when memory drains.
+
+    """
+
+    def __init__(self, max_in_memory: int = 10000) -> None:
+        self.max_in_memory = max_in_memory
+        self._memory = deque()
+        self._spill = None
+        self._spilled = 0
+        self._read_pos = 0
+
+    def __len__(self) -> int:
+        return len(self._memory) + self._spilled
+
+    def push(self, url: str, depth: int) -> None:
+        if self._spilled == 0 and len(self._memory) < self.max_in_memory:
+            self._memory.append((url, depth))
+            return
+        if self._spill is None:
+            self._spill = tempfile.TemporaryFile(mode="w+", encoding="utf-8")
+        self._spill.seek(0, 2)
+        self._spill.write(json.dumps([url, depth]) + "\n")
+        self._spilled += 1
+
+    def pop(self):
+        if len(self._memory) == 0 and self._spilled > 0:
+            self._refill()
+        return self._memory.popleft()
+
+    def _refill(self):
+        self._spill.seek(self._read_pos)
+        while self._spilled > 0 and len(self._memory) < self.max_in_memory:
+            url, depth = json.loads(self._spill.readline())
+            self._memory.append((url, depth))
+            self._spilled -= 1
+        self._read_pos = self._spill.tell()
+        if self._spilled == 0:
+            self._spill.close()
+            self._spill = None
+            self._read_pos = 0
+
+    def close(self) -> None:
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
+
+def get_inner_urls(graph: Graph):
+    """
+    Get the hrefs of the nodes classified as ``link`` or ``linklist``.
+
+    Args:
+        graph (Graph): A built and classified graph.
+
+    Returns:
+        list: The hrefs in graph order.
+    """
+    hrefs = []
+    for node in graph.get_nodes_by_type(["link", "linklist"]):
+        node_ids = [node["id"]]
+        if node["type"] == "linklist":
+            node_ids = [child["id"] for child in graph.get_neighbors(node["id"])]
+        for node_id in node_ids:
+            payload = graph._graph.nodes[node_id].get("payload") or {}
+            if payload.get("href"):
+                hrefs.append(payload["href"])
+    return hrefs
+
+
+class SiteCrawler(Node):
+    """Crawl a site from a start url following its links up to ``Url.depth``.
+
+    Fetches run concurrently while already fetched pages go through the
+    graph building nodes, so parsing overlaps the network.
+
+    Attributes
+    ----------
+    fetcher: AsyncCrawler
+        Connector used to fetch pages.
+    politeness_delay: float
+        Minimum number of seconds between two requests to the same host.
+    max_in_flight: int
+        Maximum number of pages fetched or waiting for their slot at once.
+    max_pages: int
+        Stop after this many pages, None to crawl until the frontier is empty.
+    same_host: bool
+        Only follow links to the host of the start url.
+    backend: str
+        Backend of the graphs built, see ``Graph``.
+
+    """
+
+    def __init__(
+        self,
+        fetcher: AsyncCrawler = None,
+        politeness_delay: float = 1.0,
+        max_in_flight: int = 16,
+        max_pages: int = None,
+        same_host: bool = True,
+        max_frontier_in_memory: int = 10000,
+        expected_urls: int = 1_000_000,
+        backend: str = "networkx",
+    ) -> None:
+        self.fetcher = fetcher or AsyncCrawler()
+        self.politeness_delay = politeness_delay
+        self.max_in_flight = max_in_flight
+        self.max_pages = max_pages
+        self.same_host = same_host
+        self.max_frontier_in_memory = max_frontier_in_memory
+        self.expected_urls = expected_urls
+        self.backend = backend
+
+    def crawl(self, url: Url, nodes=()):
+        """
+        Crawl the pages reachable from ``url`` within ``url.depth`` hops.
+
+        Args:
+            url (Url): The start url.
+            nodes (Iterable[Node]): Nodes run on each fetched page, they are
+                expected to build and classify the graph.
+
+        Yields:
+            Graph: A processed graph per crawled page, in completion order.
+        """
+        start_url = canonicalize_url(url.page_url) or url.page_url
+        start_host = urlsplit(start_url).netloc
+        seen = BloomFilter(self.expected_urls)
+        seen.add(start_url)
+        frontier = Frontier(self.max_frontier_in_memory)
+        frontier.push(start_url, 0)
+        next_slot = {}
+        in_flight = {}
+        crawled = 0
+        try:
+            while len(frontier) > 0 or len(in_flight) > 0:
+                while (
+                    len(frontier) > 0
+                    and len(in_flight) < self.max_in_flight
+                    and (self.max_pages is None or crawled + len(in_flight) < self.max_pages)
+                ):
+                    page_url, depth = frontier.pop()
+                    # politeness: requests to a host are spaced by politeness_delay
+                    host = urlsplit(page_url).netloc
+                    now = time.monotonic()
+                    slot = max(now, next_slot.get(host, now))
+                    next_slot[host] = slot + self.politeness_delay
+                    future = self.fetcher.submit(page_url, delay=slot - now)
+                    in_flight[future] = (page_url, depth)
+                if len(in_flight) == 0:
+                    break
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    page_url, depth = in_flight.pop(future)
+                    graph = Graph(page_url, self.backend)
+                    graph.html_payload, graph.content_hash, response_url = future.result()
+                    if graph.html_payload is None:
+                        continue
+                    # links are relative to the page redirected to
+                    response_url = canonicalize_url(response_url) or page_url
+                    seen.add(response_url)
+                    if depth == 0:
+                        start_host = urlsplit(response_url).netloc
+                    for node in nodes:
+                        node(graph)
+                    crawled += 1
+                    if depth < url.depth:
+                        for href in get_inner_urls(graph):
+                            inner_url = canonicalize_url(href, response_url)
+                            if inner_url is None:
+                                continue
+                            if self.same_host and urlsplit(inner_url).netloc != start_host:
+                                continue
+                            if seen.add(inner_url):
+                                frontier.push(inner_url, depth + 1)
+                    yield graph
+        finally:
+            frontier.close()
+            for future in in_flight:
+                future.cancel()
+
+    def process(self, graph: Graph) -> None:
+        """
+        Process the given graph by retrieving the HTML payload of the page URL.
+
+        Args:
+            graph (Graph): The graph object representing the web page.
+
+        Returns:
+            None
+        """
+        self.fetcher.process(graph)
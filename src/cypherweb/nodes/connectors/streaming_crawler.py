@@ -0,0 +1,153 @@
+import codecs
+import hashlib
+import time
+
+import requests
+
+from cypherweb.core.node import Node
+from cypherweb.core.graph import Graph
+from cypherweb.nodes.connectors.basic_crawler import (
+    HEADERS,
+    HEADER_CHARSET,
+    META_CHARSET,
+    TIMEOUT,
+    lookup_charset,
+)
+from cypherweb.utils.html_parser import DomRecordsParser
+
+# bytes buffered before choosing a charset, enough to reach a <meta charset>
+SNIFF_SIZE = 4096
+
+
+def stream_page(
+    page_url,
+    max_bytes=None,
+    max_parse_time=None,
+    chunk_size=64 * 1024,
+    session=None,
+    timeout=TIMEOUT,
+    headers=None,
+):
+    """
+    Fetch a webpage chunk by chunk and parse it while it downloads.
+
+    The body is never held in full: chunks are decoded incrementally and fed
+    to a ``DomRecordsParser``, which collapses the subtrees of non permitted
+    tags as it goes (see ``DomRecordsBuilder``). The records are the ones
+    ``HtmlToGraph`` would get from the whole page.
+
+    Args:
+        page_url (str): The url of the page.
+        max_bytes (int): Stop downloading past this many bytes, None for no limit.
+        max_parse_time (float): Stop after this many seconds spent downloading
+            and parsing, None for no limit.
+        chunk_size (int): Size of the chunks read from the socket.
+        session (requests.Session): Session to send the request with, defaults to ``requests``.
+        timeout (tuple): (connect timeout, read timeout) in seconds.
+        headers (dict): Request headers, defaults to ``HEADERS``.
+
+    Returns:
+        tuple: The records of the page and the sha256 of the bytes read,
+        (None, None) if the request failed.
+    """
+    session = session or requests
+    deadline = None if max_parse_time is None else time.perf_counter() + max_parse_time
+    parser = DomRecordsParser()
+    body_hash = hashlib.sha256()
+    truncated = False
+    try:
+        with session.get(
+            page_url, headers=headers or HEADERS, timeout=timeout, stream=True
+        ) as response:
+            response.raise_for_status()
+            match = HEADER_CHARSET.search(response.headers.get("Content-Type", ""))
+            charset = lookup_charset(match.group(1)) if match else None
+            decoder = None
+            head = b""
+            size = 0
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                if max_bytes is not None and size + len(chunk) > max_bytes:
+                    chunk = chunk[: max_bytes - size]
+                    truncated = True
+                size += len(chunk)
+                body_hash.update(chunk)
+                if decoder is None:
+                    # buffer the head of the page until its charset is known
+                    head += chunk
+                    if len(head) < SNIFF_SIZE and not truncated:
+                        continue
+                    decoder = get_decoder(charset, head)
+                    chunk, head = head, b""
+                parser.feed(decoder.decode(chunk))
+                if deadline is not None and time.perf_counter() > deadline:
+                    truncated = True
+                if truncated:
+                    break
+            if decoder is None:
+                decoder = get_decoder(charset, head)
+            parser.feed(decoder.decode(head, final=True))
+    except requests.exceptions.RequestException as e:
+        print(f"An error occurred: {e}")
+        return None, None
+    if truncated:
+        print(f"Page truncated (size or parse time limit reached): {page_url}")
+    return parser.close(), body_hash.hexdigest()
+
+
+def get_decoder(charset, head):
+    """Get an incremental decoder from the header charset or the <meta> one of ``head``."""
+    if charset is None:
+        match = META_CHARSET.search(head)
+        charset = lookup_charset(match.group(1)) if match else None
+    return codecs.getincrementaldecoder(charset or "utf-8")(errors="replace")
+
+
+class StreamingCrawler(Node):
+    """Fetch the page of the graph, parsing it while it downloads.
+
+    Drop-in replacement for ``BasicCrawler`` on large pages: instead of an
+    ``html_payload``, the graph gets the records of the page
+    (``dom_records``), which ``HtmlToGraph`` builds the graph from. The
+    raw page is never held, the content of ``NOT_PERMITED_TAGS`` is
+    dropped as it arrives and the download is bounded by ``max_bytes``.
+
+    Attributes
+    ----------
+    max_bytes: int
+        Maximum number of bytes downloaded per page, None for no limit.
+    max_parse_time: float
+        Maximum number of seconds spent downloading and parsing a page, None
+        for no limit.
+    chunk_size: int
+        Size of the chunks read from the socket and parsed at once.
+
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 10 * 2**20,
+        max_parse_time: float = None,
+        chunk_size: int = 64 * 1024,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.max_parse_time = max_parse_time
+        self.chunk_size = chunk_size
+        self.session = requests.Session()
+
+    def process(self, graph: Graph) -> None:
+        """
+        Process the given graph by parsing the page at its URL while it downloads.
+
+        Args:
+            graph (Graph): The graph object representing the web page.
+
+        Returns:
+            None
+        """
+        graph.dom_records, graph.content_hash = stream_page(
+            graph.page_url,
+            max_bytes=self.max_bytes,
+            max_parse_time=self.max_parse_time,
+            chunk_size=self.chunk_size,
+            session=self.session,
+        )
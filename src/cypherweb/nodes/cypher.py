@@ -26,8 +26,8 @@ _AitoCypher = Lark(
     """
 start               : query
 
-query               : many_match_clause where_clause return_clause
-                    | many_match_clause return_clause
+query               : use_clause? many_match_clause where_clause return_clause
+                    | use_clause? many_match_clause return_clause
 
 
 many_match_clause   : (match_clause)+
@@ -58,6 +58,7 @@ op                  : "==" -> op_eq
                     | "<="-> op_lte
                     | "is"i -> op_is
                     | "contains"i -> op_contains
+                    | "=~" -> op_regex
 
 
 
@@ -179,6 +180,9 @@ class TreeToJson(Transformer):
     def op_contains(self, _):
         return "contains"
 
+    def op_regex(self, _):
+        return "regex"
+
     def json_dict(self, tup):
         constraints = {}
         for key, value in tup:
@@ -322,6 +326,7 @@ class CypherApi(Node):
                 "top_k_anchors": 10000,
                 "top_k_neighbors": 10000,
                 "node_include": len(where_clause) > 0,
+                "node_attributes": node_match[0]["json_data"],
             }
             str_matcher = {
                 # "node_type": "title",
@@ -341,9 +346,11 @@ class CypherApi(Node):
             "top_k_anchors": 10000,
             "top_k_neighbors": 10000,
             "node_include": False,
+            "node_attributes": node_match[0]["json_data"],
         }
         str_matcher = {
             "node_type": [t.lower() for t in node_match[1]["node_type"]],
+            "node_attributes": node_match[1]["json_data"],
             "query": where_clause[0]["value"],  # should check on node type
             "str_lower": True,
             "str_match_type": where_clause[0]["operator"],
@@ -358,8 +365,12 @@ class CypherApi(Node):
         # pprint(tree)
         tree_payload = TreeToJson().transform(tree)
         # pprint(tree_payload)
-        # page_url = tree_payload["page_url"][0]
+        page_url = tree_payload["page_url"][0] if "page_url" in tree_payload else None
         _params = self.populate_params(tree_payload)
+        # node types of the pattern, the ones to classify the page for
+        labels = sorted(
+            {t.lower() for node in tree_payload["node_match"] for t in node["node_type"]}
+        )
         pprint(_params)
         # _params = {
         #     "str_matcher": {
@@ -375,4 +386,4 @@ class CypherApi(Node):
         #         "node_include": False,
         #     },
         # }
-        return {"params": _params}
+        return {"params": _params, "page_url": page_url, "labels": labels}
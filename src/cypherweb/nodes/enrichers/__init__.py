@@ -0,0 +1 @@
+from .boilerplate import BoilerplateIndex, BoilerplatePruner
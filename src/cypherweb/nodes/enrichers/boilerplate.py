@@ -0,0 +1,202 @@
+import json
+from collections import Counter
+from urllib.parse import urlsplit
+
+from cypherweb.core.node import Node
+from cypherweb.core.graph import Graph
+from cypherweb.utils.graph_diff import subtree_hashes
+
+
+def get_domain(page_url: str) -> str:
+    """Get the host boilerplate is shared across, ``www.`` is ignored."""
+    host = (urlsplit(page_url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+class BoilerplateIndex:
+    """Per domain count of the pages each subtree structure was seen on.
+
+    Only the subtrees found once on a page are counted: headers, footers and
+    menus appear once per page, while the items of a grid repeat within the
+    page and are never taken for boilerplate.
+
+    Attributes
+    ----------
+    domains: dict
+        By domain, the number of pages indexed and a Counter of the pages
+        each subtree hash was seen on.
+
+    """
+
+    def __init__(self) -> None:
+        self.domains = {}
+
+    def _get(self, domain: str):
+        if domain not in self.domains:
+            self.domains[domain] = {"pages": 0, "counts": Counter()}
+        return self.domains[domain]
+
+    def add(self, domain: str, hashes) -> None:
+        """
+        Index the subtree hashes of a page.
+
+        Args:
+            domain (str): The domain of the page, see ``get_domain``.
+            hashes (Iterable[str]): The hashes of the subtrees of the page.
+        """
+        entry = self._get(domain)
+        entry["pages"] += 1
+        entry["counts"].update(
+            subtree_hash for subtree_hash, count in Counter(hashes).items() if count == 1
+        )
+
+    def pages(self, domain: str) -> int:
+        """Number of pages indexed for ``domain``."""
+        entry = self.domains.get(domain)
+        return entry["pages"] if entry else 0
+
+    def frequency(self, domain: str, subtree_hash: str) -> float:
+        """Share of the pages of ``domain`` a subtree was seen on."""
+        entry = self.domains.get(domain)
+        if not entry or entry["pages"] == 0:
+            return 0.0
+        return entry["counts"][subtree_hash] / entry["pages"]
+
+    def save(self, path: str) -> None:
+        """Write the index as JSON, eg. to reuse it on the next crawl of the same sites."""
+        with open(path, "w") as f:
+            json.dump(
+                {
+                    domain: {"pages": entry["pages"], "counts": dict(entry["counts"])}
+                    for domain, entry in self.domains.items()
+                },
+                f,
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "BoilerplateIndex":
+        """Read an index written by ``save``."""
+        index = cls()
+        with open(path) as f:
+            for domain, entry in json.load(f).items():
+                index.domains[domain] = {
+                    "pages": entry["pages"],
+                    "counts": Counter(entry["counts"]),
+                }
+        return index
+
+
+class BoilerplatePruner(Node):
+    """Prune the subtrees repeated across the pages of a site (headers, footers, menus...).
+
+    Opt-in, it runs between ``HtmlToGraph`` and the classifiers: add it to
+    a ``GraphProcessPipeline`` after ``HtmlToGraph`` or pass one to
+    ``CypherWebPipeline(boilerplate=BoilerplatePruner())``. Each page is
+    added to the index, then the largest subtrees seen on at least
+    ``min_frequency`` of the pages of its domain are removed (or collapsed
+    into a single ``boilerplate`` node) once ``min_pages`` pages of the
+    domain are indexed. What was pruned is reported in
+    ``graph.reports["boilerplate"]``.
+
+    Attributes
+    ----------
+    index: BoilerplateIndex
+        The index, shared by the pages of a crawl. A new one by default.
+    min_pages: int
+        Pages of a domain to index before anything is pruned on it.
+    min_frequency: float
+        Share of the pages of a domain a subtree must be seen on.
+    min_size: int
+        Subtrees of fewer nodes are left alone.
+    collapse: bool
+        Keep the root of a pruned subtree as a leaf typed ``boilerplate``
+        instead of removing the whole subtree.
+    learn: bool
+        Add the pages processed to the index, disable it to prune with an
+        index built beforehand (eg. loaded from disk).
+
+    """
+
+    def __init__(
+        self,
+        index: BoilerplateIndex = None,
+        min_pages: int = 5,
+        min_frequency: float = 0.8,
+        min_size: int = 3,
+        collapse: bool = False,
+        learn: bool = True,
+    ) -> None:
+        self.index = index if index is not None else BoilerplateIndex()
+        self.min_pages = min_pages
+        self.min_frequency = min_frequency
+        self.min_size = min_size
+        self.collapse = collapse
+        self.learn = learn
+
+    def process(self, graph: Graph) -> None:
+        """
+        Process the given graph by pruning its boilerplate subtrees.
+
+        Args:
+            graph (Graph): The graph to be processed.
+
+        Returns:
+            None
+        """
+        _graph = graph._graph
+        domain = get_domain(graph.page_url)
+        # texts and links are left out: a menu keeps its hash when the current page changes
+        hashes = subtree_hashes(_graph, with_payload=False)
+        if self.learn:
+            self.index.add(
+                domain,
+                [subtree_hash for subtree_hash, size in hashes.values() if size >= self.min_size],
+            )
+        report = {"domain": domain, "pruned_subtrees": 0, "pruned_nodes": 0}
+        graph.reports["boilerplate"] = report
+        if self.index.pages(domain) < self.min_pages:
+            return
+
+        def is_boilerplate(node):
+            subtree_hash, size = hashes[node]
+            return (
+                size >= self.min_size
+                and self.index.frequency(domain, subtree_hash) >= self.min_frequency
+            )
+
+        # pre-order from the roots, roots themselves are never pruned
+        pruned = []
+        stack = [node for node in _graph.nodes if _graph.in_degree(node) == 0]
+        while stack:
+            node = stack.pop()
+            for child in _graph.successors(node):
+                if is_boilerplate(child):
+                    pruned.append(child)
+                else:
+                    stack.append(child)
+        to_remove = []
+        for node in pruned:
+            descendants = []
+            stack = list(_graph.successors(node))
+            while stack:
+                descendant = stack.pop()
+                descendants.append(descendant)
+                stack.extend(_graph.successors(descendant))
+            to_remove.extend(descendants)
+            if self.collapse:
+                _graph.nodes[node]["type"] = ["boilerplate"] + _graph.nodes[node]["type"]
+            else:
+                to_remove.append(node)
+        if graph.changed_nodes is not None:
+            # on a rebuild, the subtrees of the ancestors are not the ones of the previous graph anymore
+            stack = list(pruned)
+            while stack:
+                node = stack.pop()
+                for parent in _graph.predecessors(node):
+                    if parent not in graph.changed_nodes:
+                        graph.changed_nodes.add(parent)
+                        stack.append(parent)
+        _graph.remove_nodes_from(to_remove)
+        graph.invalidate()
+        report["pruned_subtrees"] = len(pruned)
+        report["pruned_nodes"] = len(to_remove)
@@ -1,19 +1,71 @@
 from cypherweb.core.node import Node
 from cypherweb.core.graph import Graph
 
-from cypherweb.utils.html_to_graph import traverse_html, clean_graph
+from cypherweb.utils.html_to_graph import traverse_html, prepare_nodes, emit_nodes
+from cypherweb.utils.html_parser import parse_records
+from cypherweb.utils.html_split import prepare_nodes_parallel
+from cypherweb.utils.graph_diff import subtree_hashes, reuse_unchanged
 from rich import print as rprint
 from bs4 import BeautifulSoup
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 
 
 class HtmlToGraph(Node):
-    def __init__(self) -> None:
-        pass
+    """Build the graph of the page from its HTML payload.
+
+    Attributes
+    ----------
+    parser: str
+        Parser backend: "html.parser" builds the graph from the standard
+        library parser events, "lxml" from the lxml ones (lxml must be
+        installed), "bs4" from a full BeautifulSoup tree.
+    release_payload: bool
+        Drop ``graph.html_payload`` once the graph is built so the raw page
+        does not outlive parsing.
+    workers: int
+        Opt-in: number of worker processes building the large subtrees of
+        big pages in parallel ("html.parser" backend only). Scripts using it
+        need an ``if __name__ == "__main__":`` guard.
+    min_parallel_size: int
+        Pages shorter than this many characters are built in this process.
+    stable_ids: bool
+        Name nodes from their path in the page (see ``emit_nodes``) and store
+        the hash of their subtree in ``subtree_hash``: a graph rebuilt from
+        a new crawl of the page (see ``GraphProcessPipeline.rebuild``) then
+        reuses the unchanged subtrees of the previous one.
+
+    """
+
+    def __init__(
+        self,
+        parser: str = "html.parser",
+        release_payload: bool = False,
+        workers: int = None,
+        min_parallel_size: int = 2**20,
+        stable_ids: bool = False,
+    ) -> None:
+        if parser not in ("html.parser", "lxml", "bs4"):
+            raise ValueError(f"unknown parser backend: {parser}")
+        if workers and parser != "html.parser":
+            raise ValueError("parallel building requires the html.parser backend")
+        self.parser = parser
+        self.release_payload = release_payload
+        self.workers = workers
+        self.min_parallel_size = min_parallel_size
+        self.stable_ids = stable_ids
+        self._executor = None
+
+    def close(self) -> None:
+        """Stop the worker processes."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
 
     def process(self, graph: Graph) -> None:
         """
-        Process the given graph by extracting information from the HTML payload.
+        Process the given graph by extracting information from the HTML payload,
+        or from the records of the page when it was parsed while it downloaded.
 
         Args:
             graph (Graph): The graph object to process.
@@ -22,10 +74,59 @@ class HtmlToGraph(Node):
             None
         """
         html_payload = graph.html_payload
-        soup = BeautifulSoup(html_payload, "html.parser")  # .body
-        # rprint(soup)
         _global_counter = 0
-        traverse_html(
-            soup, graph._graph, defaultdict(int), _global_counter, hash_ids=True
-        )
-        graph._graph = clean_graph(graph._graph)
+        if self.parser == "bs4" and graph.dom_records is None:
+            soup = BeautifulSoup(html_payload, "html.parser")  # .body
+            # rprint(soup)
+            traverse_html(
+                soup,
+                graph._graph,
+                defaultdict(int),
+                _global_counter,
+                hash_ids=True,
+                contract=True,
+                stable_ids=self.stable_ids,
+                integer_ids=graph.backend == "tree",
+            )
+        else:
+            if graph.dom_records is not None:
+                # parsed while it downloaded, whatever the parser
+                nodes, top_level_count = prepare_nodes(graph.dom_records)
+                graph.dom_records = None
+            elif self.workers and len(html_payload) >= self.min_parallel_size:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                # a few runs per worker to balance the load
+                chunk_size = len(html_payload) // (4 * self.workers)
+                nodes, top_level_count = prepare_nodes_parallel(
+                    html_payload, self._executor, chunk_size
+                )
+            else:
+                nodes, top_level_count = prepare_nodes(
+                    parse_records(html_payload, self.parser)
+                )
+            emit_nodes(
+                nodes,
+                top_level_count,
+                graph._graph,
+                defaultdict(int),
+                _global_counter,
+                hash_ids=True,
+                contract=True,
+                stable_ids=self.stable_ids,
+                integer_ids=graph.backend == "tree",
+            )
+        graph.invalidate()
+        if self.stable_ids:
+            hashes = subtree_hashes(graph._graph)
+            graph.set_node_attributes(
+                {node: {"subtree_hash": subtree_hash} for node, (subtree_hash, _) in hashes.items()}
+            )
+            if graph.previous is not None:
+                graph.changed_nodes = reuse_unchanged(graph.previous, graph)
+                graph.reports["rebuild"] = {
+                    "changed_nodes": len(graph.changed_nodes),
+                    "reused_nodes": len(graph._graph) - len(graph.changed_nodes),
+                }
+        if self.release_payload:
+            graph.html_payload = None
@@ -17,11 +17,7 @@ class GraphNearestNeighbor(Node):
         Returns:
             int: The distance between the two nodes.
         """
-        distance = 0
-        while node_down != node_up:
-            node_down = graph.get_predecessors(node_down)[0]["id"]
-            distance += 1
-        return distance
+        return graph.get_distance(node_down, node_up)
 
     def score_pairs_of_nodes(self, graph, node_ref, node):
         """
@@ -36,8 +32,11 @@ class GraphNearestNeighbor(Node):
             dict: A dictionary containing the following keys:
                 - dist (int): The maximum distance between the node and the reference node.
                 - anchor_dist (int): The distance between the reference node and the lowest common ancestor of the node and the reference node.
+            None if the nodes are in different trees (pages with several roots).
         """
         ancestor = graph.lowest_common_ancestor(node_ref, node)
+        if ancestor is None:
+            return None
         if ancestor == node:  # Note : nodes within element will return 0
             return {
                 "dist": self.get_distance(graph, node_ref, ancestor),
@@ -67,9 +66,10 @@ class GraphNearestNeighbor(Node):
             top_k_anchors = params["top_k_anchors"]
             node_type = params["node_type"]
             node_include = params["node_include"]
+            remove_nested = params.get("remove_nested", False)
             anchor_nodes = payload["str_matcher"]["anchor_nodes"][:top_k_anchors]
             graph = payload["graph_process_pipe"]["graph"]
-            cand_nodes = [node for node in graph.get_nodes_by_type(node_type)]
+            cand_nodes = graph.get_nodes_by_type(node_type, params.get("node_attributes"))
             # TODO : if type is node defined use all elements
             if len(cand_nodes) == 0:
                 return {f"{node_type}_results": []}
@@ -84,10 +84,11 @@ class GraphNearestNeighbor(Node):
                     distance_meta = self.score_pairs_of_nodes(
                         graph, anchor_node, cand_node_id
                     )
+                    if distance_meta is None:
+                        # under another root, unrelated to the anchor
+                        continue
                     # add child count to distance
-                    distance_meta["childs_count"] = len(
-                        graph.get_neighbors(cand_node_id)
-                    )
+                    distance_meta["childs_count"] = graph._graph.out_degree(cand_node_id)
                     # add type to distance as meta
                     distance_meta["type"] = cand_node["type"]
                     results[cand_node_id] = distance_meta
@@ -102,6 +103,9 @@ class GraphNearestNeighbor(Node):
                         -item[1]["childs_count"],
                     ),
                 )
+                if len(results) == 0:
+                    output[anchor_node] = []
+                    continue
                 # get min dist
                 min_dist = results[0][1]  # ["dist"]
 
@@ -118,6 +122,9 @@ class GraphNearestNeighbor(Node):
                     )
                     and distance["anchor_dist"] == min_dist["anchor_dist"]
                 ]
-                # TODO: remove sub childs duplciat
+                if remove_nested:
+                    # keep the outermost nodes, the nested ones are part of their content
+                    outermost = set(graph.remove_nested([best["node"] for best in best_nodes]))
+                    best_nodes = [best for best in best_nodes if best["node"] in outermost]
                 output[anchor_node] = best_nodes
             return {f"{node_type}_results": output}
@@ -1,4 +1,5 @@
 from cypherweb.core.node import Node
+from cypherweb.core.texts import MATCH_TYPES
 
 
 class BaseStrRetriever(Node):
@@ -36,35 +37,49 @@ class BaseStrRetriever(Node):
 
     def run(self, payload: dict, params: dict = None) -> dict:
         if "graph_process_pipe" in payload:
-            graph = payload["graph_process_pipe"]["graph"]._graph
+            graph = payload["graph_process_pipe"]["graph"]
             query = params["query"]
             str_match_type = params.get("str_match_type", "exact")
             str_lower = params.get("str_lower", False)
             node_type = params.get("node_type", [])
+            node_attributes = params.get("node_attributes", {})
 
-            def intersection(lst1, lst2):
-                return list(set(lst1) & set(lst2))
-
-            def is_leaf_valid(node):
-                if len(node_type) > 0:
-                    return (
-                        graph.nodes[node].get("payload")
-                        and len(intersection(node_type, graph.nodes[node].get("type")))
-                        > 0
-                    )
-                return graph.nodes[node].get("payload")
-
-            leafs = [node for node in graph.nodes if is_leaf_valid(node)]
-            leafs_contain_query = []
-            for node in leafs:
-                score, text = self.score_text_against_query(
-                    graph.nodes[node]["payload"]["text"],
-                    query,
-                    str_match_type,
-                    str_lower,
+            if str_match_type not in MATCH_TYPES:
+                return {"anchor_nodes": []}
+            # candidates from the node index instead of a scan of the whole graph
+            if len(node_type) > 0:
+                nodes = [node["id"] for node in graph.get_nodes_by_type(node_type, node_attributes)]
+            elif node_attributes:
+                nodes = graph.get_nodes_by_attributes(node_attributes)
+            else:
+                nodes = None
+            # one scan of the texts of the graph, see ``Graph.get_text_column``
+            column = graph.get_text_column()
+            buffer = column.get_buffer(str_lower)
+            hits = column.search(query, str_match_type, str_lower)
+            if nodes is not None:
+                # in the order of the candidates
+                rank = {node: position for position, node in enumerate(nodes)}
+                hits = sorted(
+                    (hit for hit in hits if column.nodes[hit[0]] in rank),
+                    key=lambda hit: rank[column.nodes[hit[0]]],
                 )
+            if str_lower and str_match_type != "regex":
+                query = query.lower()
+            win_size = 50
+            leafs_contain_query = []
+            for n, offset in hits:
+                text = buffer.get(n)
+                if str_match_type == "contains":
+                    score = len(query) / len(text) if query else 0
+                else:
+                    score = 1
                 if score > 0:
-                    leafs_contain_query.append([node, score, text])
+                    start = max(offset - win_size, 0)
+                    end = min(offset + win_size + len(query), len(text))
+                    if str_match_type == "regex":
+                        end = len(text)
+                    leafs_contain_query.append([column.nodes[n], score, f"...{text[start:end]}..."])
 
             return {
                 "anchor_nodes": sorted(
@@ -1,45 +1,60 @@
 from cypherweb.core import GraphProcessPipeline, NodeSearchPipeline, Graph
 
 from cypherweb.nodes.html_to_graph import HtmlToGraph
-from cypherweb.nodes.connectors import BasicCrawler
+from cypherweb.nodes.connectors import BasicCrawler, HttpCache
 from cypherweb.nodes.classifiers import GridClassifier
 from cypherweb.nodes.classifiers import LinkListClassifier
 from cypherweb.nodes.classifiers import TitleClassifier
 from cypherweb.nodes.classifiers import LinkClassifier
+from cypherweb.nodes.classifiers import FusedClassifier
+from cypherweb.nodes.classifiers import TemplateCache
 from cypherweb.nodes.str_matchers import BaseStrRetriever
 from cypherweb.nodes.search import GraphNearestNeighbor
 from cypherweb.nodes.cypher import CypherApi
+from cypherweb.nodes.enrichers import BoilerplatePruner
 
 # step 1 : create graph
 
 
 class CypherWebPipeline:
-    def __init__(self):
+    def __init__(
+        self,
+        cache_dir: str = None,
+        grid_similarity: float = None,
+        boilerplate: BoilerplatePruner = None,
+    ):
         graph_pipe = GraphProcessPipeline()
 
+        # with a cache dir, pages queried again are revalidated instead of downloaded
+        cache = HttpCache(cache_dir) if cache_dir is not None else None
         graph_pipe.add_node(
-            BasicCrawler(),
+            BasicCrawler(cache=cache),
             "crawler",
         )
         graph_pipe.add_node(
             HtmlToGraph(),
             "html_to_graph",
         )
+        # with a boilerplate pruner, the headers, footers and menus shared by
+        # the pages of a site queried so far are removed before classifying
+        if boilerplate is not None:
+            graph_pipe.add_node(boilerplate, "boilerplate")
+        # grids, link lists, titles and links in one pass, only the ones a
+        # query matches (see Graph.ensure_labels); with a grid similarity,
+        # grids of near duplicate items too, eg. cards with an extra badge;
+        # pages of a template already seen reuse what was found on it
         graph_pipe.add_node(
-            GridClassifier(),
-            "grid_classifier",
-        )
-        graph_pipe.add_node(
-            LinkListClassifier(),
-            "link_list_classifier",
-        )
-        graph_pipe.add_node(
-            TitleClassifier(),
-            "title_classifier",
-        )
-        graph_pipe.add_node(
-            LinkClassifier(),
-            "link_classifier",
+            FusedClassifier(
+                [
+                    GridClassifier(similarity=grid_similarity),
+                    LinkListClassifier(),
+                    TitleClassifier(),
+                    LinkClassifier(),
+                ],
+                lazy=True,
+                cache=TemplateCache(),
+            ),
+            "classifiers",
         )
 
         # # step 2 :  use graph for retrieval
@@ -57,13 +72,23 @@ class CypherWebPipeline:
             GraphNearestNeighbor(),
             "graph_nn",
         )
-        self.search_pipe = search_pipe
-        self.graph = None
+        # compiled once, a pipeline serves any number of queries
+        self.search_pipe = search_pipe.compile()
+
+    def run(self, cypher_query: str, graph: Graph = None) -> dict:
+        """
+        Run a cypher query.
+
+        Args:
+            cypher_query (str): The query, on the page of its USE clause.
+            graph (Graph, optional): A graph already built to query instead,
+                frozen to be shared between threads (see ``Graph.freeze``).
 
-    def run(self, cypher_query: str) -> dict:
-        self.search_pipe.run(cypher_query)
-        self.graph = self.search_pipe.graph
-        return self.search_pipe.passing_input
+        Returns:
+            dict: The output of each node by name, the graph searched is
+            ``["graph_process_pipe"]["graph"]``.
+        """
+        return self.search_pipe.run(graph, cypher_query)
 
 
 # results = cypher_search_pipe.run(
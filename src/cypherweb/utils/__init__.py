@@ -1,2 +1,7 @@
 from .html_to_graph import *
 from .visualizations import *
+from .bloom import *
+from .html_parser import *
+from .html_split import *
+from .graph_diff import *
+from .minhash import *
@@ -0,0 +1,118 @@
+import copy
+import hashlib
+
+# attributes depending on the position of a node in the whole page, never reused
+POSITIONAL_ATTRIBUTES = ("element_name", "item_index")
+
+
+def get_class_key(element_class) -> str:
+    # roots store their class joined, the other nodes as a list
+    if isinstance(element_class, str):
+        return element_class.replace("_CLASSJOIN_", " ")
+    return " ".join(element_class or [])
+
+
+def subtree_hashes(_graph, with_payload: bool = True):
+    """
+    Compute a Merkle hash of every subtree of a page graph, in linear time.
+
+    The hash of a node covers its element types, class and (with
+    ``with_payload``) payload, then the hashes of its children in document
+    order: two subtrees with the same hash are the same, whatever their
+    position in the page.
+
+    Args:
+        _graph (nx.DiGraph): A graph built by ``HtmlToGraph``.
+        with_payload (bool): Hash texts and links too, otherwise only the
+            structure of the subtrees is compared. Defaults to True.
+
+    Returns:
+        dict: (hash, number of nodes of the subtree) by node.
+    """
+    hashes = {}
+    for root in _graph.nodes:
+        if _graph.in_degree(root) != 0:
+            continue
+        # iterative post-order, a node is hashed once its children are
+        stack = [(root, False)]
+        while stack:
+            node, is_visited = stack.pop()
+            children = list(_graph.successors(node))
+            if not is_visited:
+                stack.append((node, True))
+                stack.extend((child, False) for child in reversed(children))
+                continue
+            attributes = _graph.nodes[node]
+            key = f"{attributes['element_type']}|{get_class_key(attributes['class'])}"
+            if with_payload:
+                key = f"{key}|{attributes.get('all_element_types')}|{attributes.get('payload')}"
+            digest = hashlib.sha1(key.encode("utf-8"))
+            size = 1
+            for child in children:
+                child_hash, child_size = hashes[child]
+                digest.update(child_hash.encode("ascii"))
+                size += child_size
+            hashes[node] = (digest.hexdigest()[:16], size)
+    return hashes
+
+
+def reuse_unchanged(previous, graph):
+    """
+    Copy the attributes of the unchanged subtrees of a previous build of a page.
+
+    Both graphs are built with stable IDs and store ``subtree_hash`` (see
+    ``HtmlToGraph``): a node of the same ID and hash as in ``previous`` has
+    the same subtree, so what the classifiers found on it (types, title
+    payloads...) holds as is. The classifiers of the current pipeline only
+    depend on the subtree of a node, the changed nodes are the only ones to
+    classify again. They are the nodes new or edited since ``previous`` and
+    their ancestors.
+
+    Args:
+        previous (Graph): The previous graph of the page.
+        graph (Graph): The graph just built.
+
+    Returns:
+        set: The changed nodes.
+    """
+    previous_nodes = previous._graph.nodes
+    changed = set()
+    for node, attributes in graph._graph.nodes(data=True):
+        subtree_hash = attributes.get("subtree_hash")
+        if (
+            subtree_hash is None
+            or node not in previous_nodes
+            or previous_nodes[node].get("subtree_hash") != subtree_hash
+        ):
+            changed.add(node)
+            continue
+        for key, value in previous_nodes[node].items():
+            if key not in POSITIONAL_ATTRIBUTES:
+                attributes[key] = copy.copy(value)
+    return changed
+
+
+def reuse_graph(previous, graph):
+    """
+    Copy a previous build of a page whose body did not change.
+
+    Pages with the same ``content_hash`` build the same graph: its nodes,
+    edges and what the enrichers and classifiers found are copied instead
+    of parsing and classifying the page again.
+
+    Args:
+        previous (Graph): The previous graph of the page.
+        graph (Graph): The new graph, empty, of the same backend.
+
+    Returns:
+        None
+    """
+    _graph = graph._graph
+    for node, attributes in previous._graph.nodes(data=True):
+        _graph.add_node(node, **{key: copy.copy(value) for key, value in attributes.items()})
+    _graph.add_edges_from(previous._graph.edges)
+    graph.invalidate()
+    graph.reports = copy.deepcopy(previous.reports)
+    graph.labels = set(previous.labels)
+    # the types left to classify on demand, see ``Graph.ensure_labels``
+    graph.classifier = previous.classifier
@@ -0,0 +1,285 @@
+import re
+from html.parser import HTMLParser
+
+from .html_to_graph import NOT_PERMITED_TAGS, STRING_CONTAINERS, DomRecords
+
+try:
+    from lxml import etree
+except ImportError:  # lxml is optional
+    etree = None
+
+VOID_TAGS = {
+    "area",
+    "base",
+    "br",
+    "col",
+    "embed",
+    "hr",
+    "img",
+    "input",
+    "keygen",
+    "link",
+    "meta",
+    "param",
+    "source",
+    "track",
+    "wbr",
+}
+# tags closed as soon as they are opened, same as BeautifulSoup's html builders
+EMPTY_ELEMENT_TAGS = VOID_TAGS | {
+    "basefont",
+    "bgsound",
+    "command",
+    "frame",
+    "image",
+    "isindex",
+    "menuitem",
+    "nextid",
+    "spacer",
+}
+PRESERVE_WHITESPACE_TAGS = {"pre", "textarea"}
+ASCII_SPACES = " \n\t\x0c\r"
+NON_WHITESPACE = re.compile(r"\S+")
+# strings of these kinds never count in the text of an element outside a pruned subtree
+PRUNED_KINDS = {"", "script", "style"}
+
+
+class DomRecordsBuilder:
+    """Build ``DomRecords`` from parser events, without any intermediate tree.
+
+    Tags, strings and whitespace are handled the way BeautifulSoup builds its
+    tree: adjacent data is merged into one string, whitespace only strings are
+    collapsed outside ``pre`` and ``textarea`` and an end tag closes the most
+    recent open tag of the same name (it is ignored if there is none).
+
+    Elements of ``pruned_tags`` are never turned into graph nodes, so only
+    their record is kept: their descendants are not recorded and their
+    strings are attached to them directly, which is all the text of their
+    ancestors needs.
+
+    Attributes
+    ----------
+    records: DomRecords
+        The records built so far.
+    pruned_tags: set
+        Tags whose subtree is collapsed.
+
+    """
+
+    def __init__(self, pruned_tags=NOT_PERMITED_TAGS) -> None:
+        self.records = DomRecords()
+        self.pruned_tags = set(pruned_tags)
+        self._data = []
+        # open tags, the record their children are attached to
+        self._names = []
+        self._targets = []
+        self._open_counts = {}
+        self._containers = []
+        self._preserve_whitespace = 0
+        # size of the stack when the outermost pruned tag was opened
+        self._pruned_level = None
+
+    @property
+    def open_tags(self):
+        """Names of the open tags, innermost last."""
+        return self._names
+
+    @property
+    def target(self) -> int:
+        """Index of the record new records are attached to, -1 at the top level."""
+        return self._targets[-1] if self._targets else -1
+
+    def is_open(self, name) -> bool:
+        return bool(self._open_counts.get(name))
+
+    def start(self, name, attrs) -> None:
+        self.flush()
+        parent = self.target
+        if self._pruned_level is not None:
+            target = parent
+        elif name in self.pruned_tags:
+            target = self.records.add_tag(name, {}, parent)
+            self._pruned_level = len(self._names)
+        else:
+            target = self.records.add_tag(name, attrs, parent)
+        self._names.append(name)
+        self._targets.append(target)
+        self._open_counts[name] = self._open_counts.get(name, 0) + 1
+        if name in STRING_CONTAINERS:
+            self._containers.append(name)
+        if name in PRESERVE_WHITESPACE_TAGS:
+            self._preserve_whitespace += 1
+
+    def end(self, name) -> None:
+        self.flush()
+        if not self.is_open(name):
+            return
+        while self._names:
+            if self._pop() == name:
+                break
+
+    def _pop(self):
+        name = self._names.pop()
+        self._targets.pop()
+        self._open_counts[name] -= 1
+        if name in STRING_CONTAINERS:
+            self._containers.pop()
+        if name in PRESERVE_WHITESPACE_TAGS:
+            self._preserve_whitespace -= 1
+        if self._pruned_level == len(self._names):
+            self._pruned_level = None
+        return name
+
+    def data(self, text) -> None:
+        self._data.append(text)
+
+    def flush(self, kind=None) -> None:
+        """
+        Turn the pending data into a string record.
+
+        Args:
+            kind (str): The kind of the string, defaults to the kind of the
+                innermost string container ("text" outside of them).
+        """
+        if not self._data:
+            return
+        text = "".join(self._data)
+        self._data = []
+        if not self._preserve_whitespace and not text.strip(ASCII_SPACES):
+            text = "\n" if "\n" in text else " "
+        if kind is None:
+            kind = self._containers[-1] if self._containers else "text"
+        if kind == "" or (self._pruned_level is not None and kind in PRUNED_KINDS):
+            # comments, doctype... and script content are never text
+            return
+        self.records.add_string(text, kind, self.target)
+
+    def close(self) -> DomRecords:
+        self.flush()
+        while self._names:
+            self._pop()
+        return self.records
+
+
+def get_attrs(attrs) -> dict:
+    """Get the attribute dict of a tag, ``class`` is split into a list like BeautifulSoup does."""
+    attr_dict = {}
+    for key, value in attrs:
+        attr_dict[key] = "" if value is None else value
+    if "class" in attr_dict:
+        attr_dict["class"] = NON_WHITESPACE.findall(attr_dict["class"])
+    return attr_dict
+
+
+class DomRecordsParser(HTMLParser):
+    """``html.parser`` backend producing ``DomRecords`` from the parser events.
+
+    The records are the same as the ones of a ``BeautifulSoup(html, "html.parser")``
+    tree, character references are resolved by ``html.parser`` itself.
+
+    """
+
+    def __init__(self, pruned_tags=NOT_PERMITED_TAGS, builder=None) -> None:
+        super().__init__(convert_charrefs=True)
+        self.builder = builder or DomRecordsBuilder(pruned_tags)
+        # empty elements closed at their start tag, their end tag is ignored
+        self._already_closed = []
+
+    def handle_starttag(self, tag, attrs, handle_empty_element=True):
+        self.builder.start(tag, get_attrs(attrs))
+        if handle_empty_element and tag in EMPTY_ELEMENT_TAGS:
+            self.builder.end(tag)
+            self._already_closed.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs, handle_empty_element=False)
+        self.builder.end(tag)
+
+    def handle_endtag(self, tag):
+        if tag in self._already_closed:
+            self._already_closed.remove(tag)
+        else:
+            self.builder.end(tag)
+
+    def handle_data(self, data):
+        self.builder.data(data)
+
+    def _handle_string(self, data, kind):
+        self.builder.flush()
+        self.builder.data(data)
+        self.builder.flush(kind)
+
+    def handle_comment(self, data):
+        self._handle_string(data, "")
+
+    def handle_decl(self, decl):
+        self._handle_string(decl, "")
+
+    def handle_pi(self, data):
+        self._handle_string(data, "")
+
+    def unknown_decl(self, data):
+        if data.upper().startswith("CDATA["):
+            self._handle_string(data[len("CDATA[") :], "text")
+        else:
+            self._handle_string(data, "")
+
+    def close(self) -> DomRecords:
+        super().close()
+        return self.builder.close()
+
+
+class LxmlRecordsTarget:
+    """lxml parser target producing ``DomRecords``.
+
+    libxml2 fixes the markup the way browsers do (implied ``html`` and
+    ``body``, unclosed paragraphs...), the records can differ from the
+    ``html.parser`` ones on malformed pages.
+
+    """
+
+    def __init__(self, pruned_tags=NOT_PERMITED_TAGS) -> None:
+        self.builder = DomRecordsBuilder(pruned_tags)
+
+    def start(self, tag, attrib):
+        self.builder.start(tag, get_attrs(attrib.items()))
+
+    def end(self, tag):
+        self.builder.end(tag)
+
+    def data(self, data):
+        self.builder.data(data)
+
+    def comment(self, text):
+        self.builder.flush()
+
+    def pi(self, target, data=None):
+        self.builder.flush()
+
+    def close(self) -> DomRecords:
+        return self.builder.close()
+
+
+def parse_records(html: str, parser: str = "html.parser", pruned_tags=NOT_PERMITED_TAGS) -> DomRecords:
+    """
+    Parse an HTML page straight into ``DomRecords``.
+
+    Args:
+        html (str): The page.
+        parser (str): "html.parser" (standard library) or "lxml".
+        pruned_tags (Iterable[str]): Tags whose subtree is collapsed, see ``DomRecordsBuilder``.
+
+    Returns:
+        DomRecords: The records of the page.
+    """
+    if parser == "html.parser":
+        html_parser = DomRecordsParser(pruned_tags)
+        html_parser.feed(html)
+        return html_parser.close()
+    if parser == "lxml":
+        if etree is None:
+            raise ImportError("the lxml parser backend requires lxml to be installed")
+        lxml_parser = etree.HTMLParser(target=LxmlRecordsTarget(pruned_tags))
+        lxml_parser.feed(html)
+        return lxml_parser.close()
+    raise ValueError(f"unknown parser backend: {parser}")
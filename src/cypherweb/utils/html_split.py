@@ -0,0 +1,242 @@
+import re
+
+from .html_to_graph import NOT_PERMITED_TAGS, STRING_CONTAINERS, prepare_nodes
+from .html_parser import (
+    EMPTY_ELEMENT_TAGS,
+    PRESERVE_WHITESPACE_TAGS,
+    DomRecordsBuilder,
+    DomRecordsParser,
+    parse_records,
+)
+
+# replaces the fragments in the skeleton of the document
+FRAGMENT_TAG = "cypherweb-fragment"
+# tags, comments and declarations, enough to find where elements start and end
+TOKEN = re.compile(
+    r"<(?:!--.*?-->|[!?][^>]*>|(/?)([a-zA-Z][^\t\n\r\f />\x00]*)((?:[^>\"']|\"[^\"]*\"|'[^']*')*)>)",
+    re.S,
+)
+RAW_TEXT_TAGS = ("script", "style")
+# elements deeper than this are never split out on their own
+MAX_SPLIT_DEPTH = 32
+
+
+def get_element_tree(html: str):
+    """
+    Scan the tags of a document to get the spans of its elements.
+
+    End tags close the most recent open element of the same name and are
+    ignored if there is none, like ``DomRecordsBuilder``. The scan is only a
+    guess of the structure: ``prepare_nodes_parallel`` checks it against the
+    real parser.
+
+    Returns:
+        list: The top level elements as [name, start, end, children] lists,
+        ``end`` is None for the elements closed implicitly or never closed.
+    """
+    top_level = []
+    # [name, element or None past MAX_SPLIT_DEPTH]
+    stack = []
+    open_counts = {}
+    position = 0
+    while True:
+        match = TOKEN.search(html, position)
+        if match is None:
+            break
+        position = match.end()
+        is_end_tag, name, attrs = match.groups()
+        if name is None:
+            continue
+        name = name.lower()
+        if is_end_tag:
+            if not open_counts.get(name):
+                continue
+            while stack:
+                open_name, element = stack.pop()
+                open_counts[open_name] -= 1
+                if open_name == name:
+                    if element is not None:
+                        element[2] = position
+                    break
+            continue
+        if name in EMPTY_ELEMENT_TAGS or attrs.endswith("/"):
+            continue
+        element = None
+        if len(stack) < MAX_SPLIT_DEPTH and (not stack or stack[-1][1] is not None):
+            element = [name, match.start(), None, []]
+            (stack[-1][1][3] if stack else top_level).append(element)
+        stack.append((name, element))
+        open_counts[name] = open_counts.get(name, 0) + 1
+        if name in RAW_TEXT_TAGS:
+            raw_text_end = re.compile(r"</\s*%s\s*>" % name, re.I).search(html, position)
+            position = raw_text_end.start() if raw_text_end else len(html)
+    return top_level
+
+
+def find_fragments(html: str, chunk_size: int, pruned_tags=NOT_PERMITED_TAGS):
+    """
+    Split a document into runs of sibling elements of at most ``chunk_size`` characters.
+
+    Elements larger than ``chunk_size`` are split among their children,
+    except the ones whose content depends on them (string containers,
+    ``pre``, pruned tags). Runs smaller than ``chunk_size / 4`` are left in
+    the skeleton of the document.
+
+    Returns:
+        list: The (start, end) spans of the runs, in document order.
+    """
+    no_split_tags = set(STRING_CONTAINERS) | PRESERVE_WHITESPACE_TAGS | set(pruned_tags)
+    min_size = chunk_size // 4
+    spans = []
+    pending = [get_element_tree(html)]
+    while pending:
+        run_start = run_end = None
+        for name, start, end, children in pending.pop():
+            if end is None or end - start > chunk_size:
+                if run_start is not None and run_end - run_start >= min_size:
+                    spans.append((run_start, run_end))
+                run_start = None
+                if name not in no_split_tags:
+                    pending.append(children)
+                continue
+            if run_start is not None and end - run_start > chunk_size:
+                if run_end - run_start >= min_size:
+                    spans.append((run_start, run_end))
+                run_start = None
+            if run_start is None:
+                run_start = start
+            run_end = end
+        if run_start is not None and run_end - run_start >= min_size:
+            spans.append((run_start, run_end))
+    return sorted(spans)
+
+
+class FragmentBuilder(DomRecordsBuilder):
+    """``DomRecordsBuilder`` of a slice of a document, noting how it could depend on the rest of the document."""
+
+    def __init__(self, pruned_tags=NOT_PERMITED_TAGS) -> None:
+        super().__init__(pruned_tags)
+        self.ignored_end_tags = set()
+        self.is_closed = True
+
+    def end(self, name) -> None:
+        if not self.is_open(name):
+            self.ignored_end_tags.add(name)
+        super().end(name)
+
+    def close(self):
+        # open tags or trailing data: the slice does not end at an element boundary
+        self.is_closed = not self.open_tags and not self._data
+        return super().close()
+
+
+def prepare_fragment(html: str, pruned_tags=NOT_PERMITED_TAGS):
+    """
+    Prepare the nodes of a run of whole elements, in a worker process.
+
+    Returns:
+        tuple: The (nodes, top level count) of the run (see ``prepare_nodes``),
+        its text and the end tags ignored because nothing matched them in
+        the run. None if the run does not end at an element boundary.
+    """
+    builder = FragmentBuilder(pruned_tags)
+    parser = DomRecordsParser(builder=builder)
+    parser.feed(html)
+    records = parser.close()
+    if not builder.is_closed:
+        return None
+    nodes, top_level_count = prepare_nodes(records)
+    text = "".join(
+        [text for text, kind in zip(records.texts, records.kinds) if kind == "text"]
+    )
+    return nodes, top_level_count, text, builder.ignored_end_tags
+
+
+class SkeletonParser(DomRecordsParser):
+    """Parse a document whose fragments were replaced by placeholder tags.
+
+    Each placeholder becomes a record holding the text of its fragment, the
+    nodes of the fragment are collected in ``fragments`` for ``prepare_nodes``.
+    ``is_consistent`` turns False if a fragment would not have been parsed
+    the same way within the document.
+
+    """
+
+    def __init__(self, results, pruned_tags=NOT_PERMITED_TAGS) -> None:
+        super().__init__(pruned_tags)
+        self.results = results
+        self.fragments = {}
+        self.is_consistent = True
+        self._no_split_tags = set(STRING_CONTAINERS) | PRESERVE_WHITESPACE_TAGS | set(pruned_tags)
+
+    def handle_starttag(self, tag, attrs, handle_empty_element=True):
+        if tag == FRAGMENT_TAG:
+            # a placeholder look-alike in the page itself
+            self.is_consistent = False
+        super().handle_starttag(tag, attrs, handle_empty_element)
+
+    def handle_startendtag(self, tag, attrs):
+        if tag != FRAGMENT_TAG:
+            super().handle_startendtag(tag, attrs)
+            return
+        if not self.is_consistent or dict(attrs).get("n") != str(len(self.fragments)):
+            self.is_consistent = False
+            return
+        result = self.results[len(self.fragments)].result()
+        builder = self.builder
+        if result is None or any(tag in self._no_split_tags for tag in builder.open_tags):
+            self.is_consistent = False
+            return
+        nodes, top_level_count, text, ignored_end_tags = result
+        if any(builder.is_open(tag) for tag in ignored_end_tags):
+            # within the document, these end tags would close outer elements
+            self.is_consistent = False
+            return
+        builder.flush()
+        index = builder.records.add_tag(FRAGMENT_TAG, {}, builder.target)
+        builder.records.add_string(text, "text", index)
+        self.fragments[index] = (nodes, top_level_count)
+
+
+def prepare_nodes_parallel(html: str, executor, chunk_size: int, pruned_tags=NOT_PERMITED_TAGS):
+    """
+    Prepare the nodes of a document like ``prepare_nodes``, runs of large subtrees being prepared by an executor.
+
+    The document is split by ``find_fragments``, the runs are parsed and
+    prepared by the executor while this process parses the rest of the
+    document, then the nodes of the runs are spliced in document order.
+    The result is the same as preparing the whole document at once: if the
+    split does not match the real structure of the document, the document
+    is prepared in this process.
+
+    Args:
+        html (str): The document.
+        executor (concurrent.futures.Executor): Runs ``prepare_fragment``, eg. a process pool.
+        chunk_size (int): Maximum size of a run, in characters.
+        pruned_tags (Iterable[str]): Tags whose subtree is collapsed, see ``DomRecordsBuilder``.
+
+    Returns:
+        tuple: The nodes and the number of top level nodes, see ``prepare_nodes``.
+    """
+    pruned_tags = tuple(pruned_tags)
+    spans = find_fragments(html, chunk_size, pruned_tags)
+    if not spans:
+        return prepare_nodes(parse_records(html, pruned_tags=pruned_tags))
+    results = [
+        executor.submit(prepare_fragment, html[start:end], pruned_tags) for start, end in spans
+    ]
+    parts = []
+    position = 0
+    for n, (start, end) in enumerate(spans):
+        parts.append(html[position:start])
+        parts.append(f'<{FRAGMENT_TAG} n="{n}"/>')
+        position = end
+    parts.append(html[position:])
+    parser = SkeletonParser(results, pruned_tags)
+    parser.feed("".join(parts))
+    records = parser.close()
+    if not parser.is_consistent or len(parser.fragments) != len(spans):
+        for result in results:
+            result.cancel()
+        return prepare_nodes(parse_records(html, pruned_tags=pruned_tags))
+    return prepare_nodes(records, parser.fragments)
@@ -3,6 +3,8 @@ import re
 from collections import defaultdict
 import itertools
 import hashlib
+import bs4.element
+from bs4.element import CData, NavigableString, Tag
 
 
 NOT_PERMITED_TAGS = [
@@ -38,16 +40,10 @@ def hash_element(element_id):
     # return hashlib.sha1(element_id.encode("utf-8")).hexdigest()
 
 
-def has_payload(element, except_nodes=["a"]):
-    """
-    only capture payload if element is leaf
-    """
-    if isinstance(
-        element, str
-    ):  # hot fix for ('NavigableString' object has no attribute 'contents')
-        return True
-
-    return len(element.findChildren()) == 0 or element.name in except_nodes
+def hash_path(path):
+    # 64 bits: IDs of different elements of a page must not collide, a
+    # rebuild would copy attributes across the wrong subtrees
+    return hashlib.sha1(path.encode("utf-8")).hexdigest()[:16]
 
 
 def format_text(text):
@@ -55,41 +51,439 @@ def format_text(text):
     return " ".join(re.split("\s+", text, flags=re.UNICODE)).strip()
 
 
-def get_payload(node):
-    if isinstance(node, str):
-        return {"href": None, "text": format_text(node.text), "alt": None, "src": None}
-    return {
-        "href": node.get("href"),
-        "text": format_text(node.text),
-        "alt": node.get("alt"),
-        "src": node.get("src"),
+# tags whose strings get their own type in BeautifulSoup (and only count in their own text)
+STRING_CONTAINERS = {
+    "script": "Script",
+    "style": "Stylesheet",
+    "template": "TemplateString",
+    "rt": "RubyTextString",
+    "rp": "RubyParenthesisString",
+}
+STRING_KINDS = {NavigableString: "text", CData: "text"}
+STRING_KINDS.update(
+    {
+        getattr(bs4.element, class_name): name
+        for name, class_name in STRING_CONTAINERS.items()
+        if hasattr(bs4.element, class_name)
     }
+)
+
+
+class DomRecords:
+    """Flat view of a DOM, tags and strings are stored in document (pre-)order.
+
+    Attributes
+    ----------
+    names: list
+        Tag name, None for strings.
+    parents: list
+        Index of the parent record, -1 for top level records.
+    attrs: list
+        Tag attributes (``class`` as a list), None for strings.
+    texts: list
+        String content, None for tags.
+    kinds: list
+        Strings only: "text" for regular text, the name of the string
+        container (eg. "template") for text owned by one, "" for strings that
+        never count as text (comments, doctype...).
 
+    """
 
-def normalize_element(soup_element):
-    def is_valid_text_element(soup_element):
-        return soup_element.text == soup_element and soup_element.text.strip() != ""
+    def __init__(self) -> None:
+        self.names = []
+        self.parents = []
+        self.attrs = []
+        self.texts = []
+        self.kinds = []
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def add_tag(self, name, attrs, parent=-1) -> int:
+        self.names.append(name)
+        self.parents.append(parent)
+        self.attrs.append(attrs)
+        self.texts.append(None)
+        self.kinds.append(None)
+        return len(self.names) - 1
+
+    def add_string(self, text, kind, parent=-1) -> int:
+        self.names.append(None)
+        self.parents.append(parent)
+        self.attrs.append(None)
+        self.texts.append(text)
+        self.kinds.append(kind)
+        return len(self.names) - 1
+
+
+def soup_to_records(soup) -> DomRecords:
+    """
+    Flatten the children of a BeautifulSoup element into ``DomRecords``.
 
-    def is_valid_tag(soup_element):
-        if soup_element.name is None:
-            return is_valid_text_element(soup_element)
-        return soup_element.name not in NOT_PERMITED_TAGS
+    Args:
+        soup (BeautifulSoup | Tag): The element whose contents are flattened.
 
-    def is_valid_text(soup_element):
-        return soup_element.text.strip().lower() not in NOT_PERMITED_TEXTS
+    Returns:
+        DomRecords: The records, the contents of ``soup`` are the top level ones.
+    """
+    records = DomRecords()
+    stack = [(iter(soup.contents), -1)]
+    while stack:
+        element = next(stack[-1][0], None)
+        if element is None:
+            stack.pop()
+            continue
+        parent = stack[-1][1]
+        if isinstance(element, Tag):
+            index = records.add_tag(element.name, element.attrs, parent)
+            stack.append((iter(element.contents), index))
+        else:
+            records.add_string(str(element), STRING_KINDS.get(type(element), ""), parent)
+    return records
+
+
+def summarize_text(text, limit):
+    """
+    Get a short stand-in of ``text`` keeping ``text.strip()``, None if the stripped text is longer than ``limit``.
+
+    Surrounding whitespace is capped to ``limit + 1`` characters: enough to
+    tell that the concatenation with another summary is too long.
+    """
+    core = text.strip()
+    if len(core) > limit:
+        return None
+    if not core:
+        return text[: limit + 1]
+    lead = text[: len(text) - len(text.lstrip())]
+    trail = text[len(text.rstrip()) :]
+    return lead[-(limit + 1) :] + core + trail[: limit + 1]
 
-    is_valid = is_valid_tag(soup_element) and is_valid_text(soup_element)
 
-    return {
-        "is_valid": is_valid,
-        "content": soup_element if is_valid else soup_element.text,
-        "is_raw_text": is_valid_text_element(soup_element),
-    }
+def get_summary_limit() -> int:
+    # text summaries keep enough characters to compare with NOT_PERMITED_TEXTS
+    return max([len(text) for text in NOT_PERMITED_TEXTS] + [0])
+
+
+def prepare_nodes(records: DomRecords, fragments=None):
+    """
+    Compute the nodes of the graph of DOM records, in linear time.
+
+    A first bottom-up pass computes which elements have tag children and a
+    short summary of their text (enough to check ``NOT_PERMITED_TEXTS``), a
+    second pre-order pass selects the valid elements and computes their
+    payload. Full texts are only joined for payload nodes. Node names are
+    left to ``emit_nodes``, so that parts of a document can be prepared
+    separately.
+
+    Args:
+        records (DomRecords): The DOM.
+        fragments (Dict[int, tuple]): Records standing for a part of the
+            document prepared separately, by record index: the (nodes, top
+            level count) of that part. Their nodes are spliced in place.
+
+    Returns:
+        tuple: The nodes in pre-order, as (element type, class, payload,
+        number of children) tuples, and the number of top level nodes.
+    """
+    fragments = fragments or {}
+    names, parents, attrs, texts, kinds = (
+        records.names,
+        records.parents,
+        records.attrs,
+        records.texts,
+        records.kinds,
+    )
+    size = len(records)
+    limit = get_summary_limit()
+    children = [[] for _ in range(size)]
+    top_level = []
+    for index, parent in enumerate(parents):
+        (children[parent] if parent >= 0 else top_level).append(index)
+
+    # bottom-up: children always follow their parent in document order
+    has_tag_child = [False] * size
+    summaries = [None] * size
+    subtree_end = list(range(1, size + 1))
+    for index in range(size - 1, -1, -1):
+        if names[index] is None:
+            summaries[index] = summarize_text(texts[index], limit) if kinds[index] == "text" else ""
+            continue
+        parts = []
+        for child in children[index]:
+            if names[child] is not None:
+                has_tag_child[index] = True
+            if parts is not None:
+                if summaries[child] is None:
+                    parts = None
+                else:
+                    parts.append(summaries[child])
+        summaries[index] = None if parts is None else summarize_text("".join(parts), limit)
+        if children[index]:
+            subtree_end[index] = subtree_end[children[index][-1]]
+
+    def string_kind(index):
+        # the kind of strings counted in the text of a tag
+        return names[index] if names[index] in STRING_CONTAINERS else "text"
+
+    def get_text(index):
+        """Same as ``Tag.text``."""
+        kind = string_kind(index)
+        if not has_tag_child[index]:
+            strings = children[index]
+        else:
+            strings = range(index + 1, subtree_end[index])
+        return "".join(
+            [texts[i] for i in strings if names[i] is None and kinds[i] == kind]
+        )
+
+    def is_valid_text(index):
+        if string_kind(index) != "text":
+            text = get_text(index)
+        else:
+            text = summaries[index]
+            if text is None:
+                return True
+        return text.strip().lower() not in NOT_PERMITED_TEXTS
+
+    def is_valid(index):
+        if names[index] is None:
+            text = texts[index]
+            return (
+                kinds[index] == "text"
+                and text.strip() != ""
+                and text.strip().lower() not in NOT_PERMITED_TEXTS
+            )
+        return names[index] not in NOT_PERMITED_TAGS and is_valid_text(index)
+
+    def select(indices):
+        # the valid records among indices and the number of nodes they stand for
+        selected, count = [], 0
+        for index in indices:
+            if index in fragments:
+                selected.append(index)
+                count += fragments[index][1]
+            elif is_valid(index):
+                selected.append(index)
+                count += 1
+        return selected, count
+
+    nodes = []
+    selected, top_level_count = select(top_level)
+    stack = selected[::-1]
+    while stack:
+        index = stack.pop()
+        if index in fragments:
+            nodes.extend(fragments[index][0])
+            continue
+        is_raw_text = names[index] is None
+        if is_raw_text:
+            element_name = "p"
+            element_class = []
+            payload = {"href": None, "text": format_text(texts[index]), "alt": None, "src": None}
+        else:
+            element_name = names[index]
+            element_attrs = attrs[index]
+            element_class = element_attrs.get("class", [])
+            payload = None
+            if not has_tag_child[index] or element_name == "a":
+                payload = {
+                    "href": element_attrs.get("href"),
+                    "text": format_text(get_text(index)),
+                    "alt": element_attrs.get("alt"),
+                    "src": element_attrs.get("src"),
+                }
+        selected, count = [], 0
+        if not is_raw_text and has_tag_child[index]:
+            selected, count = select(children[index])
+        nodes.append((element_name, element_class, payload, count))
+        stack.extend(reversed(selected))
+    return nodes, top_level_count
+
+
+def emit_nodes(
+    nodes,
+    top_level_count: int,
+    _graph: nx.Graph,
+    _counter,
+    global_counter=0,
+    _parent=None,
+    hash_ids=False,
+    contract=False,
+    node_type_exceptions=["a"],
+    stable_ids=False,
+    integer_ids=False,
+) -> int:
+    """
+    Name the nodes computed by ``prepare_nodes`` and add them to a graph.
+
+    With ``contract``, the empty leaves and bridge nodes ``clean_graph`` would
+    delete are never created: the graph is the one ``clean_graph`` returns,
+    node names and item indices included.
+
+    With ``stable_ids``, node IDs no longer depend on the global element
+    counters but on the path from the root: the ID of the parent, the
+    element type and class, and the rank among the siblings of the same
+    type and class. Elements inserted or removed elsewhere in the page do
+    not rename a node.
+
+    With ``integer_ids``, node IDs are the creation order of the nodes,
+    following the nodes already in the graph: they cannot collide like
+    hashed IDs, the readable name stays in ``element_name``.
+
+    Args:
+        nodes (list): The nodes in pre-order, see ``prepare_nodes``.
+        top_level_count (int): The number of top level nodes.
+        _graph (nx.Graph): The graph to populate with the element information.
+        _counter (Dict[str, int]): A dictionary to keep track of the count of each element type encountered.
+        global_counter (int): The item index of the first created node.
+        _parent (Optional[str]): The node ID top level nodes are attached to. Defaults to None.
+        hash_ids (bool): Indicates whether to hash the node IDs. Defaults to False.
+        contract (bool): Contract the graph while it is built, see ``clean_graph``. Defaults to False.
+        node_type_exceptions (List[str]): Element types never contracted.
+        stable_ids (bool): Hash node IDs from their path instead of the element counters. Defaults to False.
+        integer_ids (bool): Number the nodes instead of naming them, ignored with ``stable_ids``. Defaults to False.
+
+    Returns:
+        int: The item index following the last created node.
+    """
+    # element type and class counts among the children of each node, for stable IDs
+    sibling_counts = defaultdict(lambda: defaultdict(int))
+    # edges to children reached through contracted nodes are added after the
+    # direct ones, the order ``clean_graph`` leaves the successors in
+    direct_edges = []
+    contracted_edges = []
+    # [parent node id, children left, contracted ancestors, reached through contracted nodes]
+    frames = [[_parent, top_level_count, None, False]]
+    for element_name, element_class, payload, child_count in nodes:
+        while frames[-1][1] == 0:
+            frames.pop()
+        frame = frames[-1]
+        frame[1] -= 1
+        parent_id, _, inherited, is_contracted = frame
+
+        _name_count = _counter.get(element_name)
+        _counter[element_name] += 1
+        item_index = global_counter
+        global_counter += 1
+        _element_name = f"{element_name}_{_name_count}_{element_class}"
+
+        if contract and element_name not in node_type_exceptions:
+            # same rules as ``clean_graph``: drop empty leaves and bridges
+            in_degree = 0 if parent_id is None else 1
+            is_empty_leaf = payload is None and child_count == 0
+            if is_empty_leaf or in_degree == child_count:
+                if child_count:
+                    # a bridge, its only child inherits its class and element type
+                    frames.append([parent_id, 1, (element_class, element_name, inherited), True])
+                continue
+
+        all_element_types = [element_name]
+        if inherited is not None:
+            # contracted ancestors are linked, lists are joined once here
+            classes = [element_class]
+            while inherited is not None:
+                ancestor_class, ancestor_name, inherited = inherited
+                classes.append(ancestor_class)
+                all_element_types.append(ancestor_name)
+            element_class = list(itertools.chain.from_iterable(reversed(classes)))
+            all_element_types.reverse()
+
+        node_id = _element_name
+        if stable_ids:
+            signature = f"{element_name}/{' '.join(element_class)}"
+            rank = sibling_counts[parent_id][signature]
+            sibling_counts[parent_id][signature] += 1
+            node_id = f"{element_name}_{hash_path(f'{parent_id}/{signature}/{rank}')}"
+        elif integer_ids:
+            node_id = len(_graph)
+        elif hash_ids:
+            # hash name
+            node_id = f"{element_name}_{hash_element(_element_name)}"
+
+        if parent_id is None:
+            # entry_point (orphans are roots as well)
+            node_class, is_root = "_CLASSJOIN_".join(element_class), True
+        else:
+            node_class, is_root = element_class, False
+        _graph.add_node(
+            node_id,
+            **{
+                "element_type": element_name,
+                "all_element_types": all_element_types,
+                "element_name": _element_name,
+                "item_index": item_index,
+                "class": node_class,
+                "payload": payload,
+                "is_root": is_root,
+                "type": [],
+            },
+        )
+        if parent_id is not None:
+            (contracted_edges if is_contracted else direct_edges).append((parent_id, node_id))
+        if child_count:
+            frames.append([node_id, child_count, None, False])
+    _graph.add_edges_from(direct_edges)
+    _graph.add_edges_from(contracted_edges)
+    return global_counter
+
+
+def records_to_graph(
+    records: DomRecords,
+    _graph: nx.Graph,
+    _counter,
+    global_counter=0,
+    _parent=None,
+    hash_ids=False,
+    contract=False,
+    node_type_exceptions=["a"],
+    stable_ids=False,
+    integer_ids=False,
+) -> int:
+    """
+    Populate a graph from DOM records, in linear time.
+
+    Args:
+        records (DomRecords): The DOM.
+        _graph (nx.Graph): The graph to populate with the element information.
+        _counter (Dict[str, int]): A dictionary to keep track of the count of each element type encountered.
+        global_counter (int): The item index of the first created node.
+        _parent (Optional[str]): The node ID top level records are attached to. Defaults to None.
+        hash_ids (bool): Indicates whether to hash the node IDs. Defaults to False.
+        contract (bool): Contract the graph while it is built, see ``clean_graph``. Defaults to False.
+        node_type_exceptions (List[str]): Element types never contracted.
+        stable_ids (bool): Hash node IDs from their path, see ``emit_nodes``. Defaults to False.
+        integer_ids (bool): Number the nodes, see ``emit_nodes``. Defaults to False.
+
+    Returns:
+        int: The item index following the last created node.
+    """
+    nodes, top_level_count = prepare_nodes(records)
+    return emit_nodes(
+        nodes,
+        top_level_count,
+        _graph,
+        _counter,
+        global_counter,
+        _parent=_parent,
+        hash_ids=hash_ids,
+        contract=contract,
+        node_type_exceptions=node_type_exceptions,
+        stable_ids=stable_ids,
+        integer_ids=integer_ids,
+    )
 
 
 def traverse_html(
-    _soup, _graph: nx.Graph, _counter, global_counter, _parent=None, hash_ids=False
-) -> None:
+    _soup,
+    _graph: nx.Graph,
+    _counter,
+    global_counter,
+    _parent=None,
+    hash_ids=False,
+    contract=False,
+    stable_ids=False,
+    integer_ids=False,
+) -> int:
     """
     Traverses an HTML element using depth-first search and populates a graph with the element information.
 
@@ -100,95 +494,24 @@ def traverse_html(
         global_counter (int): The global counter to assign unique item indices to each element.
         _parent (Optional[str]): The parent node ID in the graph. Defaults to None.
         hash_ids (bool): Indicates whether to hash the node IDs. Defaults to False.
+        contract (bool): Contract the graph while it is built, see ``clean_graph``. Defaults to False.
+        stable_ids (bool): Hash node IDs from their path, see ``emit_nodes``. Defaults to False.
+        integer_ids (bool): Number the nodes, see ``emit_nodes``. Defaults to False.
 
     Returns:
-        None: This function does not return any value.
+        int: The item index following the last created node.
     """
-    for element in _soup.contents:
-        element_norm = normalize_element(element)
-
-        if element_norm["is_valid"]:
-            element_content = element_norm["content"]
-            if element_norm["is_raw_text"]:
-                element_name = "p"
-                element_class = []
-            else:
-                element_name = element_content.name
-                element_class = element_content.get("class", [])
-
-            _name_count = _counter.get(element_name)
-            _element_name = f"{element_name}_{_name_count}_{element_class}"
-            node_id = _element_name
-            if hash_ids:
-                # hash name
-                node_id = f"{element_name}_{hash_element(_element_name)}"
-
-            # entry_point
-            if (
-                _parent is None
-            ):  # and len(_graph.nodes) == 0: # disable this since some nodes may be orphan
-                # print(node_id)
-                payload = (
-                    get_payload(element_content)
-                    if has_payload(element_content)
-                    else None
-                )
-                _graph.add_nodes_from(
-                    [
-                        (
-                            node_id,
-                            {
-                                "element_type": element_name,
-                                "all_element_types": [element_name],
-                                "element_name": _element_name,
-                                "item_index": global_counter,
-                                "class": "_CLASSJOIN_".join(element_class),
-                                "payload": payload,
-                                "is_root": True,
-                                "type": [],
-                            },
-                        )
-                    ]
-                )
-                global_counter += 1
-
-            if _parent is not None:
-                payload = (
-                    get_payload(element_content)
-                    if has_payload(element_content)
-                    else None
-                )
-                _graph.add_nodes_from(
-                    [
-                        (
-                            node_id,
-                            {
-                                "element_type": element_name,
-                                "all_element_types": [element_name],
-                                "element_name": _element_name,
-                                "item_index": global_counter,
-                                "class": element_class,
-                                "payload": payload,
-                                "is_root": False,
-                                "type": [],
-                            },
-                        )
-                    ]
-                )
-
-                global_counter += 1
-                _graph.add_edge(_parent, node_id)
-
-            _counter[element_name] += 1
-            if not element_norm["is_raw_text"] and len(element.findChildren()) != 0:
-                traverse_html(
-                    element_content,
-                    _graph,
-                    _counter,
-                    global_counter,
-                    node_id,
-                    hash_ids=hash_ids,
-                )
+    return records_to_graph(
+        soup_to_records(_soup),
+        _graph,
+        _counter,
+        global_counter,
+        _parent=_parent,
+        hash_ids=hash_ids,
+        contract=contract,
+        stable_ids=stable_ids,
+        integer_ids=integer_ids,
+    )
 
 
 def get_neighbors(graph, node):
@@ -224,6 +547,10 @@ def clean_graph(graph, only_intermediate=False, node_type_exceptions=["a"]):
     Deletes nodes from a graph that satisfy certain conditions. Nodes that are empty leaves or bridge nodes are removed.
     If `only_intermediate` is True, only bridge nodes are deleted.
 
+    The successors of a deleted node inherit its class and element types.
+    They keep a link to the deleted nodes instead of a copy of their lists, the
+    lists are joined once per remaining node at the end.
+
     Args:
     - graph: a networkx graph object.
     - only_intermediate: a boolean indicating whether or not to only delete intermediate nodes (default: False).
@@ -233,63 +560,73 @@ def clean_graph(graph, only_intermediate=False, node_type_exceptions=["a"]):
     """
 
     def is_empty_leaf(node):
-        return (
-            graph.nodes[node].get("payload") is None
-            and len(get_neighbors(graph, node)) == 0
-        )
+        return graph.nodes[node].get("payload") is None and graph.out_degree(node) == 0
 
-    # def is_bridge_node(node):
-    #     return graph.nodes[node]["payload"] is None and len(
-    #         get_predecessors(graph, node)
-    #     ) == len(get_neighbors(graph, node))
     def is_bridge_node(node):
-        return len(get_predecessors(graph, node)) == len(get_neighbors(graph, node))
+        return graph.in_degree(node) == graph.out_degree(node)
 
     if only_intermediate:
-        nodes_to_delete = [
-            node for node in graph.nodes if is_bridge_node(node)]
+        nodes_to_delete = [node for node in graph.nodes if is_bridge_node(node)]
     else:
         nodes_to_delete = [
             node for node in graph.nodes if is_empty_leaf(node) or is_bridge_node(node)
         ]
-    # print(nodes_to_delete)
-    node_type_exceptions
     nodes_to_delete = [
         node
         for node in nodes_to_delete
         if graph.nodes[node]["element_type"] not in node_type_exceptions
     ]
+    # attributes of the deleted nodes, and for each node the deleted nodes it
+    # inherits from along with what they inherited themselves at that time
+    deleted = {}
+    inherited_from = defaultdict(list)
     for node in nodes_to_delete:
-        # print(node)
         try:
-            graph.add_edges_from(
-                itertools.product(graph.predecessors(node),
-                                  graph.successors(node))
-            )
-            # update successors class
-            for successor in graph.successors(node):
-                graph.nodes[successor]["class"] = (
-                    graph.nodes[node]["class"] +
-                    graph.nodes[successor]["class"]
-                )
-                # inherit list of element types
-                graph.nodes[successor]["all_element_types"] = (
-                    graph.nodes[node]["all_element_types"] +
-                    graph.nodes[successor]["all_element_types"]
-                )
+            attributes = dict(graph.nodes[node])
+            predecessors = list(graph.predecessors(node))
+            successors = list(graph.successors(node))
+            for successor in successors:
+                inherited_from[successor].append((node, tuple(inherited_from.get(node, ()))))
                 # inherit root_status
                 graph.nodes[successor]["is_root"] = (
-                    graph.nodes[node]["is_root"] or graph.nodes[successor]["is_root"]
+                    attributes["is_root"] or graph.nodes[successor]["is_root"]
                 )
+            deleted[node] = attributes
+            # removed first: on the tree backend, a node has a single parent
             graph.remove_node(node)
+            graph.add_edges_from(itertools.product(predecessors, successors))
         except KeyError as e:
             print('failed to update nodes meta', e)
             pass
 
+    def inherit(node, key):
+        # the value of the last deleted predecessor comes first
+        parts = []
+        stack = [(node, inherited_from[node], False)]
+        while stack:
+            current, links, is_own = stack.pop()
+            if is_own:
+                attributes = deleted[current] if current in deleted else graph.nodes[current]
+                parts.append(attributes[key])
+                continue
+            stack.append((current, None, True))
+            stack.extend((predecessor, predecessor_links, False) for predecessor, predecessor_links in links)
+        if all(isinstance(part, list) for part in parts):
+            return list(itertools.chain.from_iterable(parts))
+        value = parts[0]
+        for part in parts[1:]:
+            value = value + part
+        return value
+
+    for node in inherited_from:
+        if node in graph:
+            # update successors class and inherit list of element types
+            graph.nodes[node]["class"] = inherit(node, "class")
+            graph.nodes[node]["all_element_types"] = inherit(node, "all_element_types")
+
     # post root re-election
     for node in graph.nodes:
-        if len(get_predecessors(graph, node)) == 0:
-            # print(node, graph.nodes[node])
+        if graph.in_degree(node) == 0:
             graph.nodes[node]["is_root"] = True
 
     return graph
@@ -0,0 +1,153 @@
+import hashlib
+import random
+
+# Mersenne prime, the hash functions are (a * x + b) mod MERSENNE_PRIME
+MERSENNE_PRIME = (1 << 61) - 1
+
+
+class MinHash:
+    """MinHash sketches of sets of strings, to estimate their Jaccard similarity.
+
+    The share of equal values between the sketches of two sets estimates
+    how similar the sets are, whatever their sizes. Sketches of the same
+    set of strings are computed once, and so are the hashes of a string.
+
+    Attributes
+    ----------
+    num_perm: int
+        Number of hash functions, the length of a sketch.
+    seed: int
+        Seed of the hash functions, sketches are only comparable with the same one.
+
+    """
+
+    def __init__(self, num_perm: int = 32, seed: int = 1) -> None:
+        self.num_perm = num_perm
+        self.seed = seed
+        generator = random.Random(seed)
+        self._params = [
+            (generator.randrange(1, MERSENNE_PRIME), generator.randrange(MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+        self._hashes = {}
+        self._sketches = {}
+
+    def _hash(self, shingle: str) -> tuple:
+        values = self._hashes.get(shingle)
+        if values is None:
+            digest = hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest()
+            x = int.from_bytes(digest, "little")
+            values = self._hashes[shingle] = tuple(
+                (a * x + b) % MERSENNE_PRIME for a, b in self._params
+            )
+        return values
+
+    def sketch(self, shingles: frozenset) -> tuple:
+        """
+        Get the sketch of a set of strings.
+
+        Args:
+            shingles (frozenset): The strings.
+
+        Returns:
+            tuple: ``num_perm`` values, the smallest hash of the set by hash function.
+        """
+        sketch = self._sketches.get(shingles)
+        if sketch is None:
+            if not shingles:
+                sketch = (MERSENNE_PRIME,) * self.num_perm
+            elif len(shingles) == 1:
+                sketch = self._hash(next(iter(shingles)))
+            else:
+                sketch = tuple(map(min, *(self._hash(shingle) for shingle in shingles)))
+            self._sketches[shingles] = sketch
+        return sketch
+
+
+def estimate_similarity(sketch, other) -> float:
+    """Estimate the Jaccard similarity of two sets from their sketches, see ``MinHash``."""
+    return sum(a == b for a, b in zip(sketch, other)) / len(sketch)
+
+
+def get_band_rows(similarity: float, num_perm: int, recall: float = 0.95) -> int:
+    """
+    Choose the number of sketch values per LSH band.
+
+    Sets at least ``similarity`` similar land in a common bucket with a
+    probability ``1 - (1 - s ** rows) ** bands``: the longest bands keeping
+    it above ``recall`` give the fewest false candidates.
+
+    Args:
+        similarity (float): The Jaccard similarity to find.
+        num_perm (int): The length of the sketches.
+        recall (float): The probability to find two sets of ``similarity``. Defaults to 0.95.
+
+    Returns:
+        int: The number of rows of a band, at least 1.
+    """
+    rows = 1
+    for candidate in range(2, num_perm + 1):
+        bands = num_perm // candidate
+        if 1 - (1 - similarity ** candidate) ** bands < recall:
+            break
+        rows = candidate
+    return rows
+
+
+def group_near_duplicates(sketches, similarity: float, rows: int = None) -> list:
+    """
+    Group sets at least ``similarity`` similar to each other, in about linear time.
+
+    Locality sensitive hashing: the sketches are cut into bands of ``rows``
+    values, and sketches sharing a band land in the same bucket. Each
+    sketch is only compared to the first one of its buckets, the groups
+    are the ones of the pairs found similar enough (transitively). Equal
+    sketches, frequent among repeated items, are grouped beforehand, and
+    a few distinct ones are compared pairwise, which costs less than the
+    bands.
+
+    Args:
+        sketches (list): The sketches of the sets, see ``MinHash.sketch``.
+        similarity (float): The smallest Jaccard similarity of near duplicates.
+        rows (int, optional): The values per band. Defaults to ``get_band_rows``.
+
+    Returns:
+        list: The group of each set, the index of one of its members.
+    """
+    if not sketches:
+        return []
+    # first item of each distinct sketch
+    firsts = {}
+    for item, sketch in enumerate(sketches):
+        firsts.setdefault(sketch, item)
+    if len(firsts) == 1:
+        return [0] * len(sketches)
+    num_perm = len(sketches[0])
+    if rows is None:
+        rows = get_band_rows(similarity, num_perm)
+    groups = list(range(len(sketches)))
+
+    def find(item):
+        while groups[item] != item:
+            groups[item] = groups[groups[item]]
+            item = groups[item]
+        return item
+
+    distinct = list(firsts.values())
+    if len(distinct) * (len(distinct) - 1) // 2 <= num_perm // rows:
+        for n, item in enumerate(distinct):
+            for other in distinct[:n]:
+                root, other_root = find(item), find(other)
+                if root != other_root and estimate_similarity(sketches[item], sketches[other]) >= similarity:
+                    groups[root] = other_root
+        return [find(firsts[sketch]) for sketch in sketches]
+    for start in range(0, num_perm - rows + 1, rows):
+        buckets = {}
+        for sketch, item in firsts.items():
+            first = buckets.setdefault(sketch[start : start + rows], item)
+            if first == item:
+                continue
+            root, first_root = find(item), find(first)
+            if root != first_root and estimate_similarity(sketch, sketches[first]) >= similarity:
+                groups[root] = first_root
+    return [find(firsts[sketch]) for sketch in sketches]
@@ -1,10 +1,10 @@
-from .html_to_graph import get_neighbors
-
-
 def render_element_from_root(graph, element, str_agg, depth=0):
     """
     Render an element and its children as string.
 
+    The subtree is walked in pre-order with an explicit stack, large grids
+    do not hit the recursion limit.
+
     Args:
         graph (networkx.Graph): The graph containing the elements.
         element (str): The ID of the element to render.
@@ -16,29 +16,29 @@ def render_element_from_root(graph, element, str_agg, depth=0):
         None
 
     """
-    indent = "    " * depth
-    element_name = graph.nodes[element]["element_type"]
-    indent = "    " * depth
-    rectangle = "*" * (len(indent) + len(element_name) + 2)
-    print(rectangle)
-    str_agg += "\n" + rectangle
-    try:
-        payload = graph.nodes[element]["payload"]["text"]
-        if element_name == "a":
-            payload = graph.nodes[element]["payload"]["href"]
-        if element_name == "img":
-            payload = graph.nodes[element]["payload"]["alt"]
-    except:
-        payload = ""
-    print(indent + f"* {element_name} / {payload} *")
-    print(rectangle)
-    str_agg += "\n" + indent + f"{element_name} / {payload}"
-    str_agg += "\n" + rectangle
-    for child in get_neighbors(graph, element):
-        child = child["id"]
-        keep_traversing = graph.nodes[child]["element_type"]
-        if keep_traversing:
-            str_agg = render_element_from_root(
-                graph=graph, element=child, depth=depth + 1, str_agg=str_agg
-            )
+    stack = [(element, depth)]
+    while stack:
+        element, depth = stack.pop()
+        indent = "    " * depth
+        element_name = graph.nodes[element]["element_type"]
+        rectangle = "*" * (len(indent) + len(element_name) + 2)
+        print(rectangle)
+        str_agg += "\n" + rectangle
+        try:
+            payload = graph.nodes[element]["payload"]["text"]
+            if element_name == "a":
+                payload = graph.nodes[element]["payload"]["href"]
+            if element_name == "img":
+                payload = graph.nodes[element]["payload"]["alt"]
+        except:
+            payload = ""
+        print(indent + f"* {element_name} / {payload} *")
+        print(rectangle)
+        str_agg += "\n" + indent + f"{element_name} / {payload}"
+        str_agg += "\n" + rectangle
+        # reversed, so that the first child is rendered first
+        for child in reversed(list(graph.successors(element))):
+            keep_traversing = graph.nodes[child]["element_type"]
+            if keep_traversing:
+                stack.append((child, depth + 1))
     return str_agg
@@ -0,0 +1,128 @@
+"""Generated pages shared by the tests."""
+import random
+
+WORDS = "alpha beta gamma delta team members product price feature risks view apply skip filter our company about join careers".split()
+TAGS = ["div", "span", "a", "p", "template", "rt", "ruby", "svg", "script", "style", "b", "li", "ul", "noscript", "img", "br", "input", "h1", "pre", "textarea", "rp", "picture"]
+TEXTS = ["view", " View ", "sort by", "sort  by", "  x ", "hello", "\n\n", " ", "\t\n ", "skip to content", "&amp;", "a&lt;b", "&#65;", "&nbsp;x", "×", "filter", "cancel ", "İ", "a < b"]
+
+
+def words(rng, count):
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def card(rng, number, extra=False):
+    badge = '<span class="badge">new</span>' if extra else ""
+    return f"""<div class="card card--{rng.choice(["a", "b"])}">
+  <div class="card-inner"><div class="wrap">
+    <img src="/img/{number}.png" alt="photo {number}"/>
+    <h3 class="name">{words(rng, 2)} {number}</h3>{badge}
+    <p class="desc">{words(rng, rng.randint(1, 12))}</p>
+    <a href="https://example.com/p/{number}?ref=x#frag">more <b>info</b></a>
+  </div></div>
+</div>"""
+
+
+def site_page(seed, card_count=20, depth=10):
+    """A page of a site: navigation, a grid of cards, headings, a table and the usual oddities."""
+    rng = random.Random(seed)
+    nav = "".join(f'<li><a href="/{word}">{word}</a></li>' for word in WORDS[:8])
+    cards = "\n".join(card(rng, number, extra=(number % 7 == 3)) for number in range(card_count))
+    chain = "".join('<div class="w%d">' % k for k in range(depth)) + "<span>deep text</span>" + "</div>" * depth
+    table = "<table>" + "".join(f"<tr><td>{words(rng, 1)}</td><td>{i}</td></tr>" for i in range(10)) + "</table>"
+    return f"""<!DOCTYPE html>
+<html><head><title>Page {seed}</title><style>.a{{color:red}}</style>
+<script>var x = "<div>not a div</div>"; </script></head>
+<body>
+<!-- header comment -->
+<header class="site-header"><nav><ul class="menu">{nav}</ul></nav>
+<svg><title>logo</title><path d="M0"/></svg>
+<input type="text"/>
+<button>View</button> <span> skip </span>
+</header>
+<main>
+<section><h2>Meet the team &amp; friends</h2>
+<div class="grid">{cards}</div></section>
+<section><h1>Our <em>Risks</em></h1><p>Text with &lt;entities&gt; and <![CDATA[cdata]]> stuff</p>
+{chain}
+{table}
+<template>tpl <p>inside</p></template>
+<ruby>kanji<rt>reading</rt></ruby>
+<ul class="links"><li><a href="https://other.org/a">A</a></li><li><a href="https://other.org/b">B</a></li></ul>
+<div><a href="/x">x</a><a href="/y">y</a><a href="http://Example.COM:80/z/../q">z</a></div>
+<p>unclosed <b>bold <i>italic</b> after</p>
+<br><hr/>
+<div>   sort by   </div>
+<noscript><p>nojs</p></noscript>
+<picture><source srcset="a.webp"/></picture>
+</section>
+</main>
+<footer class="site-footer"><p>&copy; 2024 company</p><ul><li><a href="/privacy">privacy</a></li></ul></footer>
+</body></html>"""
+
+
+def random_html(rng, depth=0):
+    """Random, often broken, markup."""
+    out = []
+    for _ in range(rng.randint(0, 4)):
+        choice = rng.random()
+        if choice < 0.35 or depth > 5:
+            out.append(rng.choice(TEXTS))
+        elif choice < 0.38:
+            out.append(rng.choice(["<!-- c -->", "<!---->", "<!DOCTYPE html>", "<?pi x?>"]))
+        elif choice < 0.41:
+            out.append(rng.choice(["<![CDATA[view]]>", "<![CDATA[]]>", "<![CDATA[ ]]>"]))
+        elif choice < 0.45:
+            out.append(rng.choice(["</div>", "</span>", "</br>", "</img>", "<div>", "<a href='/z'>", "</p>"]))
+        else:
+            tag = rng.choice(TAGS)
+            element_class = rng.choice(["", ' class="x"', ' class="x  y"', ' class=""', " class"])
+            href = ' href="/h?a=1&amp;b=2"' if tag == "a" else ""
+            if tag in ("img", "br", "input"):
+                out.append(rng.choice([f"<{tag}{element_class} alt='al'/>", f"<{tag}{element_class} src=s>", f"<{tag}></{tag}>"]))
+            else:
+                close = "" if rng.random() < 0.05 else f"</{tag}>"
+                out.append(rng.choice([f"<{tag}{element_class}{href}>{random_html(rng, depth + 1)}{close}", f"<{tag}{element_class}/>"]))
+    return "".join(out)
+
+
+def random_block(rng):
+    """A list of cards, a navigation bar or random markup."""
+    choice = rng.random()
+    if choice < 0.4:
+        items = []
+        for _ in range(rng.randint(1, 4)):
+            tag = rng.choice(["li", "div"])
+            link = rng.choice(["", "<a href=/x>go</a>"])
+            items.append(
+                f'<{tag} class="card {rng.choice(["a", "b"])}"><h3>{rng.choice(["T1", "T2", "view"])}</h3>'
+                f"<p>d{rng.randint(0, 3)}</p>{link}</{tag}>"
+            )
+        return "<ul>" + "".join(items) + "</ul>"
+    if choice < 0.6:
+        return "<nav>" + "".join(f"<a href='/{i}'>l{i}</a>" for i in range(rng.randint(1, 3))) + "</nav>"
+    return random_html(rng, 1)
+
+
+def random_page(seed):
+    rng = random.Random(seed)
+    return "<html><body>" + "".join(random_block(rng) for _ in range(rng.randint(1, 6))) + "</body></html>"
+
+
+def all_pages(count=40):
+    pages = [site_page(seed, card_count=5 + 7 * seed, depth=3 + 9 * seed) for seed in range(4)]
+    pages += ["<div><p>hello</p></div>", "just text", "<p>a</p><p>b <b>c</b></p><div><span>x</span><span>y</span></div>"]
+    pages += [random_html(random.Random(seed)) for seed in range(count)]
+    pages += [random_page(seed) for seed in range(count)]
+    return pages
+
+
+def dump(graph, item_index=True):
+    """Nodes with their attributes and children, in graph order."""
+    _graph = graph._graph if hasattr(graph, "_graph") else graph
+    return (
+        [
+            (node, sorted((key, repr(value)) for key, value in _graph.nodes[node].items() if item_index or key != "item_index"))
+            for node in _graph.nodes
+        ],
+        [list(_graph.successors(node)) for node in _graph.nodes],
+    )
@@ -0,0 +1,102 @@
+import random
+import unittest
+
+import networkx as nx
+
+from cypherweb.core import Graph
+from cypherweb.core.ancestors import AncestorIndex
+from cypherweb.nodes.html_to_graph import HtmlToGraph
+
+from pages import all_pages, site_page
+
+BACKENDS = ("networkx", "tree")
+
+
+def build(html, backend):
+    graph = Graph("http://example.com/", backend)
+    graph.html_payload = html
+    HtmlToGraph()(graph)
+    return graph
+
+
+def sample(rng, nodes, count=60):
+    return [(rng.choice(nodes), rng.choice(nodes)) for _ in range(count)]
+
+
+class TestAncestorIndex(unittest.TestCase):
+    def test_same_as_networkx(self):
+        rng = random.Random(0)
+        for backend in BACKENDS:
+            for number, html in enumerate(all_pages(15)):
+                graph = build(html, backend)
+                index = graph.get_ancestor_index()
+                reference = nx.DiGraph(list(graph._graph.edges))
+                reference.add_nodes_from(graph._graph.nodes)
+                nodes = list(graph._graph.nodes)
+                if not nodes:
+                    continue
+                with self.subTest(backend=backend, page=number):
+                    self.assertIsNotNone(index)
+                    for node_ref, node in sample(rng, nodes):
+                        ancestors = nx.ancestors(reference, node) | {node}
+                        self.assertEqual(index.is_ancestor(node_ref, node), node_ref in ancestors)
+                        expected = nx.lowest_common_ancestor(reference, node_ref, node)
+                        self.assertEqual(graph.lowest_common_ancestor(node_ref, node), expected)
+                        if node_ref in ancestors:
+                            self.assertEqual(
+                                graph.get_distance(node, node_ref),
+                                nx.shortest_path_length(reference, node_ref, node),
+                            )
+                        else:
+                            with self.assertRaises(ValueError):
+                                index.distance(node, node_ref)
+
+    def test_subtree(self):
+        for backend in BACKENDS:
+            graph = build(site_page(0), backend)
+            reference = nx.DiGraph(list(graph._graph.edges))
+            reference.add_nodes_from(graph._graph.nodes)
+            with self.subTest(backend=backend):
+                for node in graph._graph.nodes:
+                    # pre-order, children in successor order
+                    self.assertEqual(graph.get_subtree(node), list(nx.dfs_preorder_nodes(reference, node)))
+
+    def test_remove_nested(self):
+        rng = random.Random(1)
+        for backend in BACKENDS:
+            graph = build(site_page(1), backend)
+            nodes = list(graph._graph.nodes)
+            with self.subTest(backend=backend):
+                for _ in range(50):
+                    chosen = rng.sample(nodes, rng.randint(1, 30))
+                    expected = [
+                        node
+                        for node in chosen
+                        if not any(other != node and graph.parent_has_child(node, other) for other in chosen)
+                    ]
+                    self.assertEqual(graph.remove_nested(chosen), expected)
+
+    def test_not_a_forest(self):
+        graph = Graph("http://example.com/")
+        graph._graph.add_edges_from([("a", "b"), ("a", "c"), ("b", "d"), ("c", "d"), ("d", "e")])
+        graph.invalidate()
+        self.assertIsNone(graph.get_ancestor_index())
+        self.assertIsNone(AncestorIndex.build(nx.DiGraph([("a", "b"), ("b", "a")])))
+        # the backend answers instead
+        self.assertEqual(graph.get_subtree("b"), ["b", "d", "e"])
+        self.assertEqual(graph.remove_nested(["e", "b", "c"]), ["b", "c"])
+        self.assertEqual(graph.lowest_common_ancestor("b", "c"), "a")
+        self.assertEqual(graph.get_distance("e", "b"), 2)
+
+    def test_invalidated_by_edits(self):
+        graph = build(site_page(2), "tree")
+        index = graph.get_ancestor_index()
+        self.assertIs(graph.get_ancestor_index(), index)
+        leaf = next(node for node in graph._graph.nodes if graph._graph.out_degree(node) == 0)
+        graph._graph.remove_node(leaf)
+        self.assertIsNot(graph.get_ancestor_index(), index)
+        self.assertNotIn(leaf, graph.get_ancestor_index())
+
+
+if __name__ == "__main__":
+    unittest.main()
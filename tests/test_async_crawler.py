@@ -0,0 +1,107 @@
+import contextlib
+import io
+import threading
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+from cypherweb.core import Graph
+from cypherweb.nodes.connectors import AsyncCrawler
+
+
+def make_response(url, body, status_code=200):
+    response = requests.Response()
+    response.url = url
+    response.status_code = status_code
+    response._content = body.encode("utf-8")
+    response.headers["Content-Type"] = "text/html; charset=utf-8"
+    return response
+
+
+class FakeSession:
+    """Answer requests after ``delays[url]`` seconds, counting the requests in flight."""
+
+    def __init__(self, delays=None, errors=()) -> None:
+        self.delays = delays or {}
+        self.errors = errors
+        self.lock = threading.Lock()
+        self.in_flight = {}
+        self.max_in_flight = 0
+        self.max_in_flight_per_host = {}
+
+    def get(self, url, headers=None, timeout=None):
+        host = url.split("/")[2]
+        with self.lock:
+            self.in_flight[host] = self.in_flight.get(host, 0) + 1
+            self.max_in_flight = max(self.max_in_flight, sum(self.in_flight.values()))
+            self.max_in_flight_per_host[host] = max(self.max_in_flight_per_host.get(host, 0), self.in_flight[host])
+        try:
+            time.sleep(self.delays.get(url, 0.02))
+            if url in self.errors:
+                raise requests.exceptions.ConnectionError(f"can't reach {url}")
+            if url.endswith("/missing"):
+                return make_response(url, "not found", 404)
+            return make_response(url, f"<p>{url}</p>")
+        finally:
+            with self.lock:
+                self.in_flight[host] -= 1
+
+    def close(self) -> None:
+        pass
+
+
+class TestAsyncCrawler(unittest.TestCase):
+    def crawler(self, session, **kwargs):
+        crawler = AsyncCrawler(**kwargs)
+        self.addCleanup(crawler.close)
+        patcher = mock.patch.object(crawler, "session", session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return crawler
+
+    def test_process(self):
+        crawler = self.crawler(FakeSession())
+        graph = Graph("http://a.com/1")
+        crawler(graph)
+        self.assertEqual(graph.html_payload, "<p>http://a.com/1</p>")
+
+    def test_concurrency_bounds(self):
+        session = FakeSession()
+        crawler = self.crawler(session, max_connections=6, max_connections_per_host=2)
+        urls = [f"http://{host}.com/{n}" for host in "abcd" for n in range(6)]
+        graphs = list(crawler.stream(urls))
+        self.assertEqual(sorted(graph.page_url for graph in graphs), sorted(urls))
+        for graph in graphs:
+            self.assertEqual(graph.html_payload, f"<p>{graph.page_url}</p>")
+        self.assertLessEqual(session.max_in_flight, 6)
+        # the requests did run concurrently, up to the bounds
+        self.assertGreater(session.max_in_flight, 2)
+        self.assertEqual(set(session.max_in_flight_per_host.values()), {2})
+
+    def test_completion_order(self):
+        delays = {"http://a.com/slow": 0.3, "http://b.com/fast": 0.01, "http://c.com/medium": 0.1}
+        crawler = self.crawler(FakeSession(delays))
+        graphs = crawler.stream(["http://a.com/slow", "http://c.com/medium", "http://b.com/fast"])
+        self.assertEqual(
+            [graph.page_url for graph in graphs],
+            ["http://b.com/fast", "http://c.com/medium", "http://a.com/slow"],
+        )
+
+    def test_errors(self):
+        session = FakeSession(errors={"http://a.com/down"})
+        crawler = self.crawler(session)
+        urls = ["http://a.com/down", "http://a.com/missing", "http://a.com/ok"]
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            graphs = {graph.page_url: graph for graph in crawler.stream(urls)}
+        # failed pages have no payload, the others are not affected
+        self.assertIsNone(graphs["http://a.com/down"].html_payload)
+        self.assertIsNone(graphs["http://a.com/missing"].html_payload)
+        self.assertEqual(graphs["http://a.com/ok"].html_payload, "<p>http://a.com/ok</p>")
+        self.assertIn("can't reach http://a.com/down", output.getvalue())
+        self.assertIn("404", output.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+import os
+import tempfile
+import unittest
+
+from cypherweb.core import Graph, GraphProcessPipeline
+from cypherweb.nodes.enrichers import BoilerplateIndex, BoilerplatePruner
+from cypherweb.nodes.html_to_graph import HtmlToGraph
+
+HEADER = """<header class="site-header"><nav><ul class="menu">
+<li><a href="/">Home</a></li><li><a href="/shop">Shop</a></li><li><a href="/about">About</a></li>
+</ul></nav></header>"""
+FOOTER = """<footer class="site-footer"><p>&copy; 2024 <b>company</b></p>
+<ul><li><a href="/privacy">privacy</a></li><li><a href="/terms">terms</a></li></ul></footer>"""
+
+
+def page(number, with_header=True):
+    # the articles differ from page to page, their paragraphs repeat within the page
+    paragraphs = "".join(f"<p>paragraph <em>{k}</em></p>" for k in range(number + 2))
+    article = f'<article class="post-{number}"><h1>Post {number}</h1>{paragraphs}</article>'
+    header = HEADER if with_header else ""
+    return f"<html><body>{header}<main>{article}</main>{FOOTER}</body></html>"
+
+
+def build(html, page_url):
+    graph = Graph(page_url)
+    graph.html_payload = html
+    HtmlToGraph()(graph)
+    return graph
+
+
+def element_types(graph):
+    return [attributes["element_type"] for _, attributes in graph._graph.nodes(data=True)]
+
+
+def texts(graph):
+    return {
+        attributes["payload"]["text"]
+        for _, attributes in graph._graph.nodes(data=True)
+        if attributes["payload"] is not None
+    }
+
+
+class TestBoilerplatePruner(unittest.TestCase):
+    def prune(self, pruner, number, domain="site.com", **kwargs):
+        graph = build(page(number, **kwargs), f"http://{domain}/{number}")
+        pruner(graph)
+        return graph
+
+    def test_repeated_subtrees_are_pruned(self):
+        pruner = BoilerplatePruner(min_pages=3)
+        for number in range(2):
+            graph = self.prune(pruner, number)
+            # not enough pages yet
+            self.assertEqual(graph.reports["boilerplate"]["pruned_subtrees"], 0)
+            self.assertIn("Home", texts(graph))
+        for number in range(2, 6):
+            with self.subTest(page=number):
+                graph = self.prune(pruner, number)
+                self.assertEqual(graph.reports["boilerplate"]["pruned_subtrees"], 2)
+                types = element_types(graph)
+                self.assertNotIn("footer", types)
+                # the article, unique to the page, is kept whole
+                self.assertIn("article", types)
+                self.assertEqual(types.count("em"), number + 2)
+                self.assertIn(f"Post {number}", texts(graph))
+                self.assertNotIn("Home", texts(graph))
+                self.assertNotIn("privacy", texts(graph))
+
+    def test_frequency_and_domains(self):
+        pruner = BoilerplatePruner(min_pages=4, min_frequency=0.8)
+        # the header is on half of the pages only
+        for number in range(6):
+            graph = self.prune(pruner, number, with_header=number % 2 == 1)
+        self.assertIn("Home", texts(graph))
+        self.assertNotIn("footer", element_types(graph))
+        # www. is the same domain, other domains have their own count
+        self.assertNotIn("footer", element_types(self.prune(pruner, 6, domain="www.site.com")))
+        self.assertIn("footer", element_types(self.prune(pruner, 6, domain="other.com")))
+
+    def test_repeated_within_a_page_is_kept(self):
+        pruner = BoilerplatePruner(min_pages=2, min_frequency=0.5)
+        for number in range(4):
+            graph = self.prune(pruner, number)
+        # the paragraphs are on every page, but several times
+        self.assertEqual(element_types(graph).count("em"), 5)
+
+    def test_collapse(self):
+        pruner = BoilerplatePruner(min_pages=2, collapse=True)
+        for number in range(3):
+            graph = self.prune(pruner, number)
+        collapsed = [
+            attributes["element_type"]
+            for node, attributes in graph._graph.nodes(data=True)
+            if "boilerplate" in attributes["type"]
+        ]
+        # the header is contracted into its menu
+        self.assertEqual(sorted(collapsed), ["footer", "ul"])
+        for node, attributes in graph._graph.nodes(data=True):
+            if "boilerplate" in attributes["type"]:
+                self.assertEqual(graph._graph.out_degree(node), 0)
+
+    def test_saved_index(self):
+        index = BoilerplateIndex()
+        pruner = BoilerplatePruner(index, min_pages=3)
+        for number in range(3):
+            self.prune(pruner, number)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "index.json")
+            index.save(path)
+            loaded = BoilerplateIndex.load(path)
+        self.assertEqual(loaded.domains, index.domains)
+        pruner = BoilerplatePruner(loaded, min_pages=3, learn=False)
+        graph = self.prune(pruner, 7)
+        self.assertNotIn("Home", texts(graph))
+        self.assertEqual(loaded.pages("site.com"), 3)
+
+    def test_in_a_pipeline(self):
+        pipeline = GraphProcessPipeline()
+        pipeline.add_node(HtmlToGraph(), "html_to_graph")
+        pipeline.add_node(BoilerplatePruner(min_pages=2), "boilerplate")
+        for number in range(3):
+            graph = Graph(f"http://site.com/{number}")
+            graph.html_payload = page(number)
+            pipeline.process(graph)
+        self.assertNotIn("Home", texts(graph))
+        self.assertIn("article", element_types(graph))
+
+
+if __name__ == "__main__":
+    unittest.main()
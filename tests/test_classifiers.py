@@ -0,0 +1,175 @@
+import random
+import re
+import unittest
+
+from cypherweb.core import Graph
+from cypherweb.nodes.classifiers import (
+    FusedClassifier,
+    GridClassifier,
+    LinkClassifier,
+    LinkListClassifier,
+    TemplateCache,
+    TitleClassifier,
+)
+from cypherweb.nodes.html_to_graph import HtmlToGraph
+
+from pages import all_pages, dump, site_page
+
+BACKENDS = ("networkx", "tree")
+LABELS = ["grid", "linklist", "title", "link"]
+
+
+def build(html, backend):
+    graph = Graph("http://example.com/", backend)
+    graph.html_payload = html
+    HtmlToGraph()(graph)
+    return graph
+
+
+def get_classifiers():
+    return [GridClassifier(), LinkListClassifier(), TitleClassifier(), LinkClassifier()]
+
+
+def classify(graph, classifier):
+    """Classify, the name of the error raised if any."""
+    try:
+        classifier(graph)
+    except Exception as e:
+        return type(e).__name__
+    return None
+
+
+def classify_one_by_one(graph):
+    for classifier in get_classifiers():
+        error = classify(graph, classifier)
+        if error is not None:
+            return error
+    return None
+
+
+def retext(html, rng):
+    # another page of the same template
+    return re.sub(
+        r">([^<]+)<",
+        lambda match: ">" + " ".join(rng.choice(["alpha", "beta", "x", "gamma delta"]) for _ in range(rng.randint(1, 3))) + "<",
+        html,
+    )
+
+
+def card(number, element_class):
+    return (
+        f'<div class="{element_class}"><img src="/{number}.png" alt="p{number}"/>'
+        f'<h3 class="name">Item {number}</h3><p class="desc">desc {number}</p><a href="/p/{number}">more</a></div>'
+    )
+
+
+class TestClassifiers(unittest.TestCase):
+    def test_page(self):
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                graph = build(site_page(0, card_count=6), backend)
+                FusedClassifier()(graph)
+                nodes = graph._graph.nodes
+                grids = [node["id"] for node in graph.get_nodes_by_type("grid")]
+                self.assertIn(["grid"], [nodes[node]["class"] for node in grids])
+                titles = [nodes[node["id"]]["payload"]["text"] for node in graph.get_nodes_by_type("title")]
+                self.assertIn("Our Risks", titles)
+                self.assertIn("Meet the team & friends", titles)
+                links = graph.get_nodes_by_type("link")
+                self.assertTrue(all(nodes[node["id"]]["element_type"] == "a" for node in links))
+                self.assertEqual(graph.labels, set(LABELS))
+
+    def test_fused_same_as_one_by_one(self):
+        for backend in BACKENDS:
+            for number, html in enumerate(all_pages()):
+                with self.subTest(backend=backend, page=number):
+                    expected = build(html, backend)
+                    error = classify_one_by_one(expected)
+                    graph = build(html, backend)
+                    self.assertEqual(classify(graph, FusedClassifier()), error)
+                    if error is None:
+                        self.assertEqual(dump(graph), dump(expected))
+
+    def test_backends(self):
+        for number, html in enumerate(all_pages(10)):
+            with self.subTest(page=number):
+                graph = build(html, "networkx")
+                tree = build(html, "tree")
+                if classify(graph, FusedClassifier()) is not None:
+                    continue
+                FusedClassifier()(tree)
+                self.assertEqual(
+                    [attributes for _, attributes in dump(tree)[0]],
+                    [attributes for _, attributes in dump(graph)[0]],
+                )
+
+    def test_lazy_same_as_eager(self):
+        rng = random.Random(0)
+        for backend in BACKENDS:
+            for number, html in enumerate(all_pages()):
+                with self.subTest(backend=backend, page=number):
+                    expected = build(html, backend)
+                    if classify(expected, FusedClassifier()) is not None:
+                        continue
+                    graph = build(html, backend)
+                    FusedClassifier(lazy=True)(graph)
+                    self.assertEqual(graph.labels, set())
+                    # each lookup classifies what it needs
+                    for label in rng.sample(LABELS, rng.randint(1, len(LABELS))):
+                        self.assertEqual(graph.get_nodes_by_type([label]), expected.get_nodes_by_type([label]))
+                    graph.ensure_labels()
+                    self.assertEqual(dump(graph), dump(expected))
+                    self.assertIsNone(graph.classifier)
+
+    def test_template_cache(self):
+        rng = random.Random(0)
+        for backend in BACKENDS:
+            cache = TemplateCache(max_size=50)
+            for number, html in enumerate(all_pages(20)):
+                for version in range(3):
+                    page = retext(html, rng) if version else html
+                    with self.subTest(backend=backend, page=number, version=version):
+                        expected = build(page, backend)
+                        if classify(expected, FusedClassifier()) is not None:
+                            continue
+                        graph = build(page, backend)
+                        FusedClassifier(cache=cache)(graph)
+                        self.assertEqual(dump(graph), dump(expected))
+                        lazy = build(page, backend)
+                        FusedClassifier(lazy=True, cache=cache)(lazy)
+                        lazy.ensure_labels([rng.choice(LABELS)])
+                        lazy.ensure_labels()
+                        self.assertEqual(dump(lazy), dump(expected))
+            self.assertGreater(cache.hits, 0)
+
+    def test_near_duplicate_grids(self):
+        # one card out of three has another first class
+        cards = "".join(card(number, "card" if number % 3 else "featured card") for number in range(9))
+        html = (
+            f"<html><body><div class='list'>{cards}</div>"
+            "<div class='mixed'><p>a</p><div><span>b</span></div><span>c</span></div></body></html>"
+        )
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                graph = build(html, backend)
+                GridClassifier()(graph)
+                self.assertEqual(graph.get_nodes_by_type("grid"), [])
+                graph = build(html, backend)
+                GridClassifier(similarity=0.7)(graph)
+                grids = [graph._graph.nodes[node["id"]]["class"] for node in graph.get_nodes_by_type("grid")]
+                self.assertEqual(grids, [["list"]])
+
+    def test_near_duplicates_keep_exact_grids(self):
+        for number, html in enumerate(all_pages(10)):
+            with self.subTest(page=number):
+                graph = build(html, "networkx")
+                if classify(graph, GridClassifier()) is not None:
+                    continue
+                exact = {node["id"] for node in graph.get_nodes_by_type("grid")}
+                graph = build(html, "networkx")
+                GridClassifier(similarity=0.7)(graph)
+                self.assertLessEqual(exact, {node["id"] for node in graph.get_nodes_by_type("grid")})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+
+from cypherweb.core import Graph
+from cypherweb.core.columns import MIN_RELEASED
+
+
+def payload(text):
+    return {"href": None, "text": text, "alt": None, "src": "a.png"}
+
+
+class TestAttributeColumns(unittest.TestCase):
+    def build(self, size=10):
+        graph = Graph("http://example.com/", "tree")
+        for node in range(size):
+            graph._graph.add_node(node, element_name=f"p_{node}", payload=payload(f"text {node}"))
+        graph.invalidate()
+        return graph
+
+    def test_unchanged_texts_keep_their_span(self):
+        graph = self.build()
+        columns = graph._graph.attributes
+        size = len(columns.arena)
+        for _ in range(5):
+            graph.set_node_attributes(
+                {node: {"payload": payload(f"text {node}"), "element_name": f"p_{node}"} for node in range(10)}
+            )
+        self.assertEqual(len(columns.arena), size)
+        self.assertEqual(graph._graph.nodes[3]["payload"], payload("text 3"))
+
+    def test_replaced_texts_are_compacted(self):
+        graph = self.build()
+        columns = graph._graph.attributes
+        text = "x" * 1000
+        for n in range(4 * MIN_RELEASED // len(text)):
+            graph.set_node_attributes({node: {"payload": payload(f"{text} {n}")} for node in range(10)})
+        live = sum(len(f"{text} {n}") + len("a.png") + len(f"p_{node}") for node in range(10))
+        self.assertEqual(len(columns.arena) - columns._released, live)
+        # the texts replaced never outweigh the live ones for long
+        self.assertLessEqual(columns._released, max(MIN_RELEASED, live))
+        for node in range(10):
+            self.assertEqual(graph._graph.nodes[node]["payload"]["text"], f"{text} {n}")
+            self.assertEqual(graph._graph.nodes[node]["element_name"], f"p_{node}")
+
+    def test_freeze_compacts(self):
+        graph = self.build()
+        columns = graph._graph.attributes
+        graph.set_node_attributes({node: {"payload": None} for node in range(5)})
+        graph.set_node_attributes({5: {"payload": payload("changed")}})
+        del graph._graph.nodes[6]["element_name"]
+        graph._graph.remove_node(7)
+        graph.invalidate()
+        expected = {node: dict(graph._graph.nodes[node]) for node in graph._graph.nodes}
+        graph.freeze()
+        self.assertEqual(columns._released, 0)
+        live = "".join(
+            text
+            for attributes in expected.values()
+            for text in [attributes.get("element_name")] + list((attributes["payload"] or {}).values())
+            if text is not None
+        )
+        self.assertEqual(len(columns.arena), len(live))
+        self.assertEqual({node: dict(graph._graph.nodes[node]) for node in graph._graph.nodes}, expected)
+
+    def test_payload_with_other_keys(self):
+        graph = self.build()
+        columns = graph._graph.attributes
+        graph.set_node_attributes({0: {"payload": {"text": "kept as is"}}})
+        self.assertEqual(graph._graph.nodes[0]["payload"], {"text": "kept as is"})
+        self.assertEqual(columns._released, len("text 0") + len("a.png"))
+        graph.set_node_attributes({0: {"payload": payload("text 0")}})
+        self.assertEqual(graph._graph.nodes[0]["payload"], payload("text 0"))
+
+
+if __name__ == "__main__":
+    unittest.main()
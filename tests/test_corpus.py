@@ -0,0 +1,160 @@
+import gzip
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from cypherweb.nodes.connectors import CorpusConnector
+from cypherweb.nodes.connectors.corpus import INDEX_SUFFIX, index_warc, iter_warc_records
+
+
+def warc_record(warc_type, url, block, content_type=None):
+    headers = [
+        "WARC/1.0",
+        f"WARC-Type: {warc_type}",
+        f"WARC-Target-URI: {url}",
+        f"Content-Length: {len(block)}",
+    ]
+    if content_type:
+        headers.append(f"Content-Type: {content_type}")
+    return ("\r\n".join(headers) + "\r\n\r\n").encode("utf-8") + block + b"\r\n\r\n"
+
+
+def http_response(body, headers=("Content-Type: text/html; charset=utf-8",)):
+    return ("HTTP/1.1 200 OK\r\n" + "".join(f"{header}\r\n" for header in headers) + "\r\n").encode("utf-8") + body
+
+
+def chunked(body, size=5):
+    parts = [b"%x\r\n%s\r\n" % (len(body[n : n + size]), body[n : n + size]) for n in range(0, len(body), size)]
+    return b"".join(parts) + b"0\r\n\r\n"
+
+
+PAGES = {
+    "http://a.com/": "<p>plain</p>",
+    "http://a.com/chunked": "<p>chunked – utf-8</p>",
+    "http://a.com/gzip": "<p>gzip</p>",
+    "http://a.com/resource": "<p>resource</p>",
+}
+
+
+def records():
+    return [
+        warc_record("warcinfo", "", b"software: test"),
+        warc_record("request", "http://a.com/", b"GET / HTTP/1.1\r\n\r\n"),
+        warc_record("response", "http://a.com/", http_response(PAGES["http://a.com/"].encode("utf-8"))),
+        warc_record("response", "http://a.com/style.css", http_response(b"p {}", ["Content-Type: text/css"])),
+        warc_record(
+            "response",
+            "http://a.com/chunked",
+            http_response(
+                chunked(PAGES["http://a.com/chunked"].encode("utf-8")),
+                ["Content-Type: text/html; charset=utf-8", "Transfer-Encoding: chunked"],
+            ),
+        ),
+        warc_record(
+            "response",
+            "http://a.com/gzip",
+            http_response(gzip.compress(PAGES["http://a.com/gzip"].encode("utf-8")), ["Content-Encoding: gzip"]),
+        ),
+        warc_record("resource", "http://a.com/resource", PAGES["http://a.com/resource"].encode("utf-8"), "text/html"),
+    ]
+
+
+class TestCorpusConnector(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+        self.path = Path(self._dir.name)
+
+    def connector(self, path, **kwargs):
+        connector = CorpusConnector(str(path), **kwargs)
+        self.addCleanup(connector.close)
+        return connector
+
+    def read_all(self, connector):
+        return {connector.records[n][1]: connector.read(n) for n in range(len(connector))}
+
+    def test_warc_offsets(self):
+        data = b"".join(records())
+        entries = index_warc(data)
+        self.assertEqual([entry[0] for entry in entries], list(PAGES))
+        for url, offset, length, kind in entries:
+            with self.subTest(url=url):
+                # the offsets point at the record content, right after its WARC headers
+                self.assertEqual(data[offset - 4 : offset], b"\r\n\r\n")
+                self.assertEqual(data[offset + length : offset + length + 4], b"\r\n\r\n")
+                self.assertTrue(data[offset:].startswith(b"HTTP/1.1" if kind == "warc" else b"<p>"))
+        self.assertEqual([offset for _, offset, _ in iter_warc_records(data)][:2], [data.index(b"software"), data.index(b"GET")])
+
+    def test_read_warc(self):
+        (self.path / "a.warc").write_bytes(b"".join(records()))
+        self.assertEqual(self.read_all(self.connector(self.path / "a.warc")), PAGES)
+
+    def test_read_warc_gz(self):
+        # one gzip member per record
+        (self.path / "a.warc.gz").write_bytes(b"".join(gzip.compress(record) for record in records()))
+        connector = self.connector(self.path / "a.warc.gz")
+        self.assertEqual(self.read_all(connector), PAGES)
+        self.assertEqual({record[4] for record in connector.records}, {"warc.gz", "resource.gz"})
+
+    def test_directory(self):
+        (self.path / "a.warc").write_bytes(b"".join(records()))
+        (self.path / "sub").mkdir()
+        (self.path / "sub" / "b.html").write_text("<p>b</p>", encoding="utf-8")
+        (self.path / "sub" / "c.html.gz").write_bytes(gzip.compress("<p>c</p>".encode("utf-8")))
+        (self.path / "sub" / "notes.txt").write_text("not a page", encoding="utf-8")
+        pages = self.read_all(self.connector(self.path))
+        self.assertEqual(len(pages), len(PAGES) + 2)
+        self.assertEqual(pages[(self.path / "sub" / "b.html").resolve().as_uri()], "<p>b</p>")
+        self.assertEqual(pages[(self.path / "sub" / "c.html.gz").resolve().as_uri()], "<p>c</p>")
+
+    def test_index(self):
+        archive = self.path / "a.warc"
+        archive.write_bytes(b"".join(records()))
+        index_path = Path(str(archive) + INDEX_SUFFIX)
+        expected = self.connector(archive).records
+        self.assertTrue(index_path.exists())
+        self.assertEqual([name for name in os.listdir(self.path) if name.endswith(".tmp")], [])
+        # read from the index
+        with open(index_path) as f:
+            index = json.load(f)
+        index["entries"] = index["entries"][:1]
+        with open(index_path, "w") as f:
+            json.dump(index, f)
+        self.assertEqual(len(self.connector(archive)), 1)
+        # a half written index is ignored and written again
+        index_path.write_text('{"signature": [1, ', encoding="utf-8")
+        self.assertEqual(self.connector(archive).records, expected)
+        with open(index_path) as f:
+            self.assertEqual(len(json.load(f)["entries"]), len(PAGES))
+        # so is the index of an archive that changed
+        archive.write_bytes(b"".join(records()[:3]))
+        self.assertEqual(len(self.connector(archive)), 1)
+
+    def test_shards(self):
+        for number in range(7):
+            (self.path / f"{number}.html").write_text(f"<p>{number}</p>", encoding="utf-8")
+        (self.path / "a.warc").write_bytes(b"".join(records()))
+        connector = self.connector(self.path)
+        for num_shards in (1, 2, 3, 11, 12):
+            with self.subTest(num_shards=num_shards):
+                shards = [
+                    [graph.page_url for graph in self.connector(self.path, shard=shard, num_shards=num_shards).iter_graphs()]
+                    for shard in range(num_shards)
+                ]
+                # each record in exactly one shard, in order, shard sizes differ by one at most
+                self.assertEqual(sum(shards, []), [record[1] for record in connector.records])
+                self.assertLessEqual(max(map(len, shards)) - min(map(len, shards)), 1)
+        with self.assertRaises(ValueError):
+            CorpusConnector(str(self.path), shard=2, num_shards=2)
+
+    def test_process(self):
+        (self.path / "a.warc").write_bytes(b"".join(records()))
+        connector = self.connector(self.path)
+        graphs = list(connector.stream(["http://a.com/gzip", "http://a.com/"]))
+        self.assertEqual([graph.html_payload for graph in graphs], [PAGES["http://a.com/gzip"], PAGES["http://a.com/"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import random
+import unittest
+
+import pytest
+
+from cypherweb.core import Graph
+from cypherweb.nodes.html_to_graph import HtmlToGraph
+from cypherweb.utils.html_parser import parse_records
+
+from pages import card, dump
+
+# well-formed: libxml2 repairs broken markup differently than html.parser
+PAGES = [
+    """<html><head><title>Shop</title><script>var x = "<div>";</script><style>p {}</style></head>
+<body><!-- comment --><nav><ul><li><a href="/">Home</a></li><li><a href="/shop">Shop</a></li></ul></nav>
+<div class="main  wrapper"><h1>Products &amp; more</h1><img src="a.png" alt="A"><br>
+<pre>  keep
+  spaces </pre><textarea>  x </textarea><svg><title>logo</title><path d="M0"/></svg>
+<p>raw <span>text</span> &lt;entities&gt; caf&eacute;</p><noscript><p>nojs</p></noscript></div>
+</body></html>""",
+    "<html><body><div class=\"grid\">%s</div></body></html>"
+    % "\n".join(card(random.Random(0), number, extra=number % 3 == 0) for number in range(10)),
+]
+
+
+def records(html, parser):
+    records = parse_records(html, parser)
+    return list(zip(records.names, records.parents, records.attrs, records.texts, records.kinds))
+
+
+def build(html, parser, backend):
+    graph = Graph("http://example.com/", backend)
+    graph.html_payload = html
+    HtmlToGraph(parser=parser)(graph)
+    return graph
+
+
+class TestLxmlRecords(unittest.TestCase):
+    def test_same_records_as_html_parser(self):
+        pytest.importorskip("lxml")
+        for number, html in enumerate(PAGES):
+            with self.subTest(page=number):
+                self.assertEqual(records(html, "lxml"), records(html, "html.parser"))
+                for backend in ("networkx", "tree"):
+                    self.assertEqual(dump(build(html, "lxml", backend)), dump(build(html, "html.parser", backend)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import random
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from cypherweb.core import Graph
+from cypherweb.nodes.html_to_graph import HtmlToGraph
+from cypherweb.utils import html_split
+from cypherweb.utils.html_parser import parse_records
+from cypherweb.utils.html_split import find_fragments, prepare_nodes_parallel
+from cypherweb.utils.html_to_graph import prepare_nodes
+
+from pages import all_pages, card, dump, random_html, site_page
+
+
+def top_level_page(count=40):
+    """Top level cards, no html or body: the runs are made of top level elements."""
+    rng = random.Random(0)
+    return "\n".join(card(rng, number, extra=number % 5 == 0) for number in range(count))
+
+
+def build(html, backend, **kwargs):
+    graph = Graph("http://example.com/", backend)
+    graph.html_payload = html
+    html_to_graph = HtmlToGraph(**kwargs)
+    try:
+        html_to_graph(graph)
+    finally:
+        html_to_graph.close()
+    return graph
+
+
+class TestParallelBuild(unittest.TestCase):
+    def test_same_graph_as_sequential_build(self):
+        pages = [top_level_page(), site_page(0, card_count=60)] + all_pages(6)
+        for backend in ("networkx", "tree"):
+            for number, html in enumerate(pages):
+                with self.subTest(backend=backend, page=number):
+                    self.assertEqual(
+                        dump(build(html, backend, workers=2, min_parallel_size=1)),
+                        dump(build(html, backend)),
+                    )
+
+    def test_runs_cross_the_split_threshold(self):
+        html = top_level_page()
+        chunk_size = len(html) // 8
+        spans = find_fragments(html, chunk_size)
+        # several runs of top level elements, each under the threshold
+        self.assertGreater(len(spans), 4)
+        self.assertTrue(all(end - start <= chunk_size for start, end in spans))
+        self.assertTrue(all(html[start:end].startswith('<div class="card') for start, end in spans))
+        expected = prepare_nodes(parse_records(html))
+        with mock.patch.object(html_split, "prepare_nodes", wraps=prepare_nodes) as spy:
+            with ThreadPoolExecutor(2) as executor:
+                result = prepare_nodes_parallel(html, executor, chunk_size)
+        self.assertEqual(result, expected)
+        # the runs were spliced in, not parsed again in this process
+        self.assertEqual(len(spy.call_args.args[1]), len(spans))
+
+    def test_split_chunk_sizes(self):
+        for number, html in enumerate([site_page(1)] + all_pages(6)):
+            expected = prepare_nodes(parse_records(html))
+            for chunk_size in (50, 200, 1000, len(html) // 3):
+                with self.subTest(page=number, chunk_size=chunk_size):
+                    with ThreadPoolExecutor(2) as executor:
+                        self.assertEqual(prepare_nodes_parallel(html, executor, chunk_size), expected)
+
+    def test_random_markup(self):
+        # broken markup falls back to the sequential build
+        with ThreadPoolExecutor(2) as executor:
+            for seed in range(200):
+                html = random_html(random.Random(seed)) * 3
+                with self.subTest(seed=seed):
+                    self.assertEqual(
+                        prepare_nodes_parallel(html, executor, 40),
+                        prepare_nodes(parse_records(html)),
+                    )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,212 @@
+import hashlib
+import random
+import re
+import unittest
+from bs4 import BeautifulSoup
+from collections import defaultdict
+import networkx as nx
+from cypherweb.core import Graph
+from cypherweb.nodes.html_to_graph import HtmlToGraph
+from cypherweb.utils.html_parser import parse_records
+from cypherweb.utils.html_to_graph import (
+    NOT_PERMITED_TAGS,
+    NOT_PERMITED_TEXTS,
+    clean_graph,
+    records_to_graph,
+    traverse_html,
+)
+
+from pages import all_pages, dump, random_html
+
+PAGE = """
+<html><head><title>Shop</title><script>var x = 1;</script></head>
+<body>
+<nav><ul><li><a href="/">Home</a></li><li><a href="/shop">Shop</a></li></ul></nav>
+<div class="main"><div class="wrapper"><h1>Products</h1>
+<ul class="grid">
+<li class="card"><a href="/a"><img src="a.png" alt="A"/>Product A</a><p>10 <b>EUR</b></p></li>
+<li class="card"><a href="/b"><img src="b.png" alt="B"/>Product B</a><p>12 <b>EUR</b></p></li>
+</ul></div></div>
+<p>raw <span>text</span> &amp; more</p>
+</body></html>
+"""
+
+
+def build(parser, backend, html=PAGE, **kwargs):
+    graph = Graph("http://example.com/", backend)
+    graph.html_payload = html
+    HtmlToGraph(parser=parser, **kwargs)(graph)
+    return graph
+
+
+# the recursive traversal the record builder replaced, as a reference
+
+
+def reference_format_text(text):
+    text = text.replace("\n", " ").strip()
+    return " ".join(re.split(r"\s+", text, flags=re.UNICODE)).strip()
+
+
+def reference_payload(element):
+    if element.name is None:
+        return {"href": None, "text": reference_format_text(element.text), "alt": None, "src": None}
+    if len(element.find_all()) != 0 and element.name != "a":
+        return None
+    return {
+        "href": element.get("href"),
+        "text": reference_format_text(element.text),
+        "alt": element.get("alt"),
+        "src": element.get("src"),
+    }
+
+
+def reference_traverse_html(soup, graph, counter, parent=None):
+    for element in soup.contents:
+        is_raw_text = element.text == element and element.text.strip() != ""
+        if element.name is None:
+            is_valid = is_raw_text
+        else:
+            is_valid = element.name not in NOT_PERMITED_TAGS
+        if not is_valid or element.text.strip().lower() in NOT_PERMITED_TEXTS:
+            continue
+        element_name = "p" if is_raw_text else element.name
+        element_class = [] if is_raw_text else element.get("class", [])
+        name = f"{element_name}_{counter.get(element_name)}_{element_class}"
+        node_id = f"{element_name}_{int(hashlib.sha1(name.encode('utf-8')).hexdigest(), 16) % (10**8)}"
+        graph.add_node(
+            node_id,
+            element_type=element_name,
+            all_element_types=[element_name],
+            element_name=name,
+            item_index=0,
+            # roots store their class joined
+            **{"class": "_CLASSJOIN_".join(element_class) if parent is None else element_class},
+            payload=reference_payload(element),
+            is_root=parent is None,
+            type=[],
+        )
+        if parent is not None:
+            graph.add_edge(parent, node_id)
+        counter[element_name] += 1
+        if not is_raw_text and len(element.find_all()) != 0:
+            reference_traverse_html(element, graph, counter, node_id)
+
+
+def reference_graph(html):
+    graph = nx.DiGraph()
+    reference_traverse_html(BeautifulSoup(html, "html.parser"), graph, defaultdict(int))
+    return clean_graph(graph)
+
+
+class TestHtmlToGraph(unittest.TestCase):
+    def test_html_to_graph(self):
+        graph_nodes_expected = [
+            "a_None_[]",
+            "body_None_[]",
+            "p_None_[]",
+            "span_None_[]",
+            "div_None_[]",
+            "p_1_[]",
+            "p_2_['classy']",
+            "img_None_[]",
+        ]
+        graph_edges_expected = [
+            ("a_None_[]", "p_None_[]"),
+            ("a_None_[]", "span_None_[]"),
+            ("body_None_[]", "a_None_[]"),
+            ("body_None_[]", "div_None_[]"),
+            ("div_None_[]", "p_1_[]"),
+            ("div_None_[]", "p_2_['classy']"),
+            ("div_None_[]", "img_None_[]"),
+        ]
+        page = """
+        <body>
+        <a href="newcomments" id="tag-12">comments <span>tsty_sân</span></a>
+        <div>
+        raw text
+        <p class="classy">text wrapped</p>
+        <img src ='test.img'/>
+        </div>
+        </body>
+        """
+
+        soup = BeautifulSoup(page, "html.parser")
+        raw_graph = nx.DiGraph()
+        _global_counter = 0
+        traverse_html(soup, raw_graph, defaultdict(int), _global_counter)
+
+        # Assertions on raw_graph.nodes and raw_graph.edges
+        self.assertListEqual(sorted(raw_graph.nodes), sorted(graph_nodes_expected))
+        self.assertListEqual(sorted(raw_graph.edges), sorted(graph_edges_expected))
+
+
+class TestHtmlToGraphNode(unittest.TestCase):
+    def test_bs4_parser(self):
+        for backend in ("networkx", "tree"):
+            for stable_ids in (False, True):
+                with self.subTest(backend=backend, stable_ids=stable_ids):
+                    graph = build("bs4", backend, stable_ids=stable_ids)
+                    self.assertGreater(len(graph._graph), 0)
+                    # same graph as the parser events give
+                    expected = build("html.parser", backend, stable_ids=stable_ids)
+                    self.assertEqual(dump(graph), dump(expected))
+
+    def test_tree_backend_integer_ids(self):
+        graph = build("bs4", "tree")
+        self.assertEqual(list(graph._graph.nodes), list(range(len(graph._graph))))
+
+
+class TestRecordBuilder(unittest.TestCase):
+    def test_same_graph_as_reference_traversal(self):
+        # item indexes left aside: the reference numbers the children from
+        # the counter of their parent, they are now unique
+        for number, html in enumerate(all_pages()):
+            expected = dump(reference_graph(html), item_index=False)
+            for parser in ("html.parser", "bs4"):
+                with self.subTest(page=number, parser=parser):
+                    self.assertEqual(dump(build(parser, "networkx", html), item_index=False), expected)
+
+    def test_item_indexes_in_document_order(self):
+        for html in all_pages(10):
+            graph = nx.DiGraph()
+            next_index = traverse_html(BeautifulSoup(html, "html.parser"), graph, defaultdict(int), 0)
+            indexes = [graph.nodes[node]["item_index"] for node in graph.nodes]
+            self.assertEqual(indexes, list(range(len(graph))))
+            self.assertEqual(next_index, len(graph))
+
+    def test_contraction(self):
+        # contracting while building gives what clean_graph leaves
+        for number, html in enumerate(all_pages()):
+            with self.subTest(page=number):
+                records = parse_records(html)
+                expected = nx.DiGraph()
+                records_to_graph(records, expected, defaultdict(int), 0, hash_ids=True)
+                clean_graph(expected)
+                contracted = nx.DiGraph()
+                records_to_graph(records, contracted, defaultdict(int), 0, hash_ids=True, contract=True)
+                self.assertEqual(dump(contracted), dump(expected))
+
+    def test_backends(self):
+        for number, html in enumerate(all_pages(10)):
+            with self.subTest(page=number):
+                graph = build("html.parser", "networkx", html)
+                tree = build("html.parser", "tree", html)
+                # same nodes in the same order, numbered on the tree backend
+                self.assertEqual(
+                    [attributes for _, attributes in dump(tree)[0]],
+                    [attributes for _, attributes in dump(graph)[0]],
+                )
+                self.assertEqual(list(tree._graph.nodes), list(range(len(tree._graph))))
+
+    def test_random_markup(self):
+        for seed in range(300):
+            html = random_html(random.Random(seed))
+            with self.subTest(seed=seed):
+                self.assertEqual(
+                    dump(build("html.parser", "networkx", html), item_index=False),
+                    dump(reference_graph(html), item_index=False),
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
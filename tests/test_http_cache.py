@@ -0,0 +1,120 @@
+import os
+import tempfile
+import time
+import unittest
+from email.utils import formatdate
+
+from cypherweb.nodes.connectors import HttpCache
+from cypherweb.nodes.connectors.http_cache import get_max_age
+
+HEADERS = {"Cache-Control": "max-age=60", "Content-Type": "text/html"}
+
+
+def list_bodies(cache):
+    bodies = []
+    for _, _, files in os.walk(os.path.join(cache.path, "bodies")):
+        bodies.extend(files)
+    return sorted(bodies)
+
+
+class TestHttpCache(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+
+    def test_store_and_read(self):
+        cache = HttpCache(self._dir.name)
+        body_hash = cache.store("http://a", b"<p>a</p>", HEADERS)
+        entry = cache.lookup("http://a")
+        self.assertEqual(entry["body_hash"], body_hash)
+        self.assertTrue(cache.is_fresh(entry))
+        self.assertEqual(cache.read("http://a", entry), b"<p>a</p>")
+        self.assertIsNone(cache.lookup("http://b"))
+
+    def test_no_store(self):
+        cache = HttpCache(self._dir.name)
+        cache.store("http://a", b"<p>a</p>", {"Cache-Control": "no-store"})
+        self.assertIsNone(cache.lookup("http://a"))
+
+    def test_no_store_drops_the_entry(self):
+        cache = HttpCache(self._dir.name)
+        cache.store("http://a", b"<p>old</p>", HEADERS)
+        cache.store("http://b", b"<p>old</p>", HEADERS)
+        cache.store("http://a", b"<p>new</p>", {"Cache-Control": "no-store"})
+        # the old version is not served anymore
+        self.assertIsNone(cache.lookup("http://a"))
+        self.assertIsNotNone(cache.lookup("http://b"))
+        cache.store("http://b", b"<p>new</p>", {"Cache-Control": "no-store"})
+        self.assertIsNone(cache.lookup("http://b"))
+        self.assertEqual(list_bodies(cache), [])
+
+    def test_expires(self):
+        now = time.time()
+        headers = {"Date": formatdate(now, usegmt=True), "Expires": formatdate(now + 120, usegmt=True)}
+        self.assertEqual(get_max_age(headers), 120)
+        # relative to the date of the response, not the clock of the crawler
+        headers = {"Date": formatdate(now - 3600, usegmt=True), "Expires": formatdate(now - 3540, usegmt=True)}
+        self.assertEqual(get_max_age(headers), 60)
+        self.assertGreaterEqual(get_max_age({"Expires": formatdate(now + 60, usegmt=True)}), 58)
+        # max-age wins over Expires
+        self.assertEqual(get_max_age(dict(headers, **{"Cache-Control": "max-age=5"})), 5)
+        # invalid and past dates are already expired
+        self.assertEqual(get_max_age({"Expires": "0"}, default_max_age=60), 0)
+        self.assertEqual(get_max_age({"Expires": formatdate(now - 60, usegmt=True)}, default_max_age=60), 0)
+        self.assertEqual(get_max_age({}, default_max_age=60), 60)
+        cache = HttpCache(self._dir.name)
+        cache.store("http://a", b"<p>a</p>", {"Expires": formatdate(now + 60, usegmt=True)})
+        self.assertTrue(cache.is_fresh(cache.lookup("http://a")))
+        cache.store("http://b", b"<p>b</p>", {"Expires": formatdate(now - 60, usegmt=True)})
+        self.assertFalse(cache.is_fresh(cache.lookup("http://b")))
+
+    def test_shared_body(self):
+        cache = HttpCache(self._dir.name)
+        cache.store("http://a", b"<p>same</p>", HEADERS)
+        cache.store("http://b", b"<p>same</p>", HEADERS)
+        self.assertEqual(len(list_bodies(cache)), 1)
+        # still served to the other url
+        cache.store("http://a", b"<p>new</p>", HEADERS)
+        entry = cache.lookup("http://b")
+        self.assertEqual(cache.read("http://b", entry), b"<p>same</p>")
+        self.assertEqual(len(list_bodies(cache)), 2)
+
+    def test_changed_content(self):
+        cache = HttpCache(self._dir.name, max_size=100)
+        cache.store("http://other", b"x" * 40, HEADERS)
+        old_hash = cache.store("http://a", b"a" * 40, HEADERS)
+        new_hash = cache.store("http://a", b"b" * 40, HEADERS)
+        self.assertNotEqual(old_hash, new_hash)
+        # the old body is gone, from the index and the disk
+        self.assertEqual(list_bodies(cache), sorted([new_hash, cache.lookup("http://other")["body_hash"]]))
+        (total,) = cache._db.execute("SELECT SUM(size) FROM bodies").fetchone()
+        self.assertEqual(total, 80)
+        # storing it again and again does not evict the live urls
+        for n in range(10):
+            cache.store("http://a", bytes([n]) * 40, HEADERS)
+        self.assertIsNotNone(cache.lookup("http://other"))
+        self.assertEqual(len(list_bodies(cache)), 2)
+
+    def test_evict_orphans_first(self):
+        cache = HttpCache(self._dir.name, max_size=100)
+        cache.store("http://a", b"a" * 40, HEADERS)
+        # a body no url points to, as left by earlier versions of the cache
+        with cache._db:
+            cache._db.execute("INSERT INTO bodies VALUES (?, ?)", ("0" * 64, 50))
+        cache.store("http://b", b"b" * 40, HEADERS)
+        self.assertIsNotNone(cache.lookup("http://a"))
+        self.assertIsNotNone(cache.lookup("http://b"))
+
+    def test_evict_least_recently_used(self):
+        cache = HttpCache(self._dir.name, max_size=100)
+        cache.store("http://a", b"a" * 40, HEADERS)
+        cache.store("http://b", b"b" * 40, HEADERS)
+        cache.store("http://c", b"c" * 40, HEADERS)
+        self.assertIsNone(cache.lookup("http://a"))
+        self.assertIsNotNone(cache.lookup("http://b"))
+        self.assertIsNotNone(cache.lookup("http://c"))
+        self.assertEqual(len(list_bodies(cache)), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
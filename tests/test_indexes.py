@@ -0,0 +1,165 @@
+import contextlib
+import io
+import unittest
+from urllib.parse import urljoin, urlsplit
+
+from cypherweb.core import Graph
+from cypherweb.nodes.classifiers import FusedClassifier
+from cypherweb.nodes.cypher import CypherApi
+from cypherweb.nodes.html_to_graph import HtmlToGraph
+from cypherweb.pipelines import CypherWebPipeline
+
+from pages import all_pages, site_page
+
+BACKENDS = ("networkx", "tree")
+CONSTRAINTS = [
+    {"type": "grid"},
+    {"type": "link"},
+    {"tag": "a"},
+    {"element_type": "li"},
+    {"class": "card"},
+    {"class": "card card--a"},
+    {"class": "menu"},
+    {"class": "missing"},
+    {"host": "example.com"},
+    {"host": "WWW.Example.com"},
+    {"host": "other.org"},
+    {"text": "privacy"},
+    {"is_root": True},
+    {"tag": "a", "host": "other.org"},
+    {"type": "link", "class": "name"},
+    {"tag": "div", "class": "wrap", "text": "x"},
+]
+
+
+def build(html, backend):
+    graph = Graph("http://example.com/", backend)
+    graph.html_payload = html
+    HtmlToGraph()(graph)
+    FusedClassifier()(graph)
+    return graph
+
+
+def get_host(href, page_url):
+    host = (urlsplit(urljoin(page_url, href)).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def scan(graph, constraints):
+    """The nodes matching constraints, without the index."""
+
+    def matches(attributes, key, value):
+        payload = attributes["payload"] or {}
+        if key == "type":
+            return value in attributes["type"]
+        if key in ("tag", "element_type"):
+            return attributes["element_type"] == value
+        if key == "class":
+            classes = attributes["class"]
+            if isinstance(classes, str):
+                classes = classes.split("_CLASSJOIN_")
+            return all(name in classes for name in value.split())
+        if key == "host":
+            value = value.lower()
+            value = value[4:] if value.startswith("www.") else value
+            return bool(payload.get("href")) and get_host(payload["href"], graph.page_url) == value
+        if key in attributes:
+            return attributes[key] == value
+        return payload.get(key) == value
+
+    return [
+        node
+        for node, attributes in graph._graph.nodes(data=True)
+        if all(matches(attributes, key, value) for key, value in constraints.items())
+    ]
+
+
+class TestNodeIndex(unittest.TestCase):
+    def test_same_as_scan(self):
+        pages = [site_page(0), site_page(1)] + all_pages(10)
+        for backend in BACKENDS:
+            for number, html in enumerate(pages):
+                graph = build(html, backend)
+                for constraints in CONSTRAINTS:
+                    with self.subTest(backend=backend, page=number, constraints=constraints):
+                        self.assertEqual(graph.get_nodes_by_attributes(constraints), scan(graph, constraints))
+
+    def test_restricted_to_nodes(self):
+        graph = build(site_page(2), "tree")
+        nodes = list(graph._graph.nodes)[::3]
+        for constraints in CONSTRAINTS:
+            with self.subTest(constraints=constraints):
+                expected = [node for node in scan(graph, constraints) if node in set(nodes)]
+                self.assertEqual(graph.get_nodes_by_attributes(constraints, nodes), expected)
+
+    def test_nodes_by_type(self):
+        for backend in BACKENDS:
+            graph = build(site_page(3), backend)
+            for types in (["grid"], ["link", "title"], ["title", "link"], []):
+                with self.subTest(backend=backend, types=types):
+                    expected = [
+                        {"id": node, "type": next(t for t in types or attributes["type"] if t in attributes["type"])}
+                        for node, attributes in graph._graph.nodes(data=True)
+                        if attributes["type"] and (not types or set(types) & set(attributes["type"]))
+                    ]
+                    self.assertEqual(graph.get_nodes_by_type(types), expected)
+
+    def test_kept_up_to_date(self):
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                graph = build(site_page(4), backend)
+                graph.get_nodes_by_attributes({"type": "grid"})
+                nodes = scan(graph, {"tag": "a"})[:5]
+                graph.set_node_attributes({node: {"type": ["grid"], "class": ["card", "extra"]} for node in nodes})
+                for constraints in ({"type": "grid"}, {"class": "card extra"}, {"type": "link"}):
+                    self.assertEqual(graph.get_nodes_by_attributes(constraints), scan(graph, constraints))
+                graph._graph.remove_nodes_from(nodes[:2])
+                graph.invalidate()
+                self.assertEqual(graph.get_nodes_by_attributes({"type": "grid"}), scan(graph, {"type": "grid"}))
+
+
+class TestPropertyMaps(unittest.TestCase):
+    QUERY = 'USE "http://example.com/" MATCH (a:{label} {{{properties}}})-[e*1..2]->(t:Title) WHERE t.text contains "team" RETURN a, t'
+
+    def params(self, label, properties):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return CypherApi().run(self.QUERY.format(label=label, properties=properties), {})["params"]
+
+    def test_parsed_constraints(self):
+        params = self.params("Grid", 'class: "grid", tag: "div", n: 3, flag: TRUE')
+        self.assertEqual(params["graph_nn"]["node_attributes"], {"class": "grid", "tag": "div", "n": 3, "flag": True})
+        self.assertEqual(params["graph_nn"]["node_type"], ["grid"])
+
+    def test_same_candidates_as_scan(self):
+        graph = build(site_page(0), "tree")
+        for label, properties in [
+            ("Link", 'host: "other.org"'),
+            ("Link", 'tag: "a", text: "privacy"'),
+            ("Linklist", 'class: "menu"'),
+            ("Grid", 'class: "grid"'),
+            ("Title", 'tag: "h3"'),
+        ]:
+            with self.subTest(properties=properties):
+                graph_nn = self.params(label, properties)["graph_nn"]
+                constraints = {"type": graph_nn["node_type"][0], **graph_nn["node_attributes"]}
+                expected = scan(graph, constraints)
+                self.assertTrue(expected)
+                candidates = graph.get_nodes_by_type(graph_nn["node_type"], graph_nn["node_attributes"])
+                self.assertEqual([node["id"] for node in candidates], expected)
+
+    def test_search(self):
+        graph = build(site_page(0), "tree")
+        pipeline = CypherWebPipeline()
+        for properties, expected in [('class: "menu"', True), ('class: "missing"', False)]:
+            with self.subTest(properties=properties):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    results = pipeline.run(self.QUERY.format(label="Linklist", properties=properties), graph=graph)
+                results = results["graph_nn"]["['linklist']_results"]
+                # an empty list when there is no candidate
+                found = {best["node"] for bests in (results or {}).values() for best in bests}
+                self.assertEqual(bool(found), expected)
+                self.assertTrue(found <= set(scan(graph, {"type": "linklist", "class": "menu"})))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+import hashlib
+import unittest
+from collections import defaultdict
+
+import networkx as nx
+
+from cypherweb.core import Graph, GraphProcessPipeline, Node
+from cypherweb.nodes.classifiers import FusedClassifier
+from cypherweb.nodes.html_to_graph import HtmlToGraph
+from cypherweb.utils.html_parser import parse_records
+from cypherweb.utils.html_to_graph import emit_nodes, prepare_nodes
+
+from pages import site_page
+
+PAGE = """
+<body>
+<h1>Products</h1>
+<ul>
+<li class="card"><a href="/a">Product A</a><p>10 EUR</p></li>
+<li class="card"><a href="/b">Product B</a><p>12 EUR</p></li>
+<li class="card"><a href="/c">Product C</a><p>15 EUR</p></li>
+</ul>
+</body>
+"""
+
+
+class PageServer(Node):
+    """Serve pages from a dict, like a crawler."""
+
+    def __init__(self, pages) -> None:
+        self.pages = pages
+
+    def process(self, graph: Graph) -> None:
+        graph.html_payload = self.pages[graph.page_url]
+        graph.content_hash = hashlib.sha256(graph.html_payload.encode("utf-8")).hexdigest()
+
+
+class CountingHtmlToGraph(HtmlToGraph):
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.calls = 0
+
+    def process(self, graph: Graph) -> None:
+        self.calls += 1
+        super().process(graph)
+
+
+def dump(graph):
+    _graph = graph._graph
+    return (
+        [(node, dict(attributes)) for node, attributes in _graph.nodes(data=True)],
+        [list(_graph.successors(node)) for node in _graph.nodes],
+    )
+
+
+class TestRebuild(unittest.TestCase):
+    def build_pipeline(self, pages):
+        pipeline = GraphProcessPipeline()
+        pipeline.add_node(PageServer(pages), "crawler")
+        self.html_to_graph = CountingHtmlToGraph(stable_ids=True)
+        pipeline.add_node(self.html_to_graph, "html_to_graph")
+        pipeline.add_node(FusedClassifier(), "classifiers")
+        return pipeline
+
+    def test_unchanged_page_is_copied(self):
+        for backend in ("networkx", "tree"):
+            with self.subTest(backend=backend):
+                pages = {"http://example.com/": PAGE}
+                pipeline = self.build_pipeline(pages)
+                previous = Graph("http://example.com/", backend)
+                pipeline.process(previous)
+                graph = pipeline.rebuild(previous)
+                self.assertEqual(self.html_to_graph.calls, 1)
+                self.assertEqual(dump(graph), dump(previous))
+                self.assertEqual(graph.labels, previous.labels)
+                self.assertEqual(graph.reports["rebuild"]["changed_nodes"], 0)
+                self.assertIsNone(graph.previous)
+                # the copy is independent of the previous graph
+                node = next(iter(graph._graph.nodes))
+                graph.set_node_attributes({node: {"type": ["changed"]}})
+                self.assertNotEqual(previous._graph.nodes[node]["type"], ["changed"])
+
+    def test_changed_page_is_built(self):
+        for backend in ("networkx", "tree"):
+            with self.subTest(backend=backend):
+                pages = {"http://example.com/": PAGE}
+                pipeline = self.build_pipeline(pages)
+                previous = Graph("http://example.com/", backend)
+                pipeline.process(previous)
+                pages["http://example.com/"] = PAGE.replace("15 EUR", "14 EUR")
+                graph = pipeline.rebuild(previous)
+                self.assertEqual(self.html_to_graph.calls, 2)
+                expected = Graph("http://example.com/", backend)
+                pipeline.process(expected)
+                self.assertEqual(dump(graph)[1], dump(expected)[1])
+                self.assertGreater(graph.reports["rebuild"]["changed_nodes"], 0)
+
+    def test_rebuild_is_a_build_of_the_new_page(self):
+        html = site_page(0)
+        edits = [
+            html.replace("Meet the team", "Meet our team"),
+            html.replace('<div class="grid">', '<div class="grid"><div class="card"><p>first</p></div>'),
+            html.replace("<h1>Our <em>Risks</em></h1>", ""),
+            html.replace('class="links"', 'class="links more"'),
+            html.replace("</main>", "<div><h2>Related</h2><ul><li><a href='/r'>r</a></li></ul></div></main>"),
+            site_page(1),
+        ]
+        for backend in ("networkx", "tree"):
+            for number, new_html in enumerate(edits):
+                with self.subTest(backend=backend, edit=number):
+                    pages = {"http://example.com/": html}
+                    pipeline = self.build_pipeline(pages)
+                    previous = Graph("http://example.com/", backend)
+                    pipeline.process(previous)
+                    pages["http://example.com/"] = new_html
+                    graph = pipeline.rebuild(previous)
+                    self.assertLess(graph.reports["rebuild"]["changed_nodes"], len(graph._graph))
+                    expected = Graph("http://example.com/", backend)
+                    self.build_pipeline({"http://example.com/": new_html}).process(expected)
+                    # same nodes, edges, types and payloads
+                    self.assertEqual(dump(graph), dump(expected))
+                    self.assertEqual(graph.labels, expected.labels)
+
+    def test_stable_ids_do_not_collide(self):
+        # siblings of the same type only differ by their rank
+        count = 30000
+        html = "<body>" + "<p>item</p>" * count + "</body>"
+        graph = nx.DiGraph()
+        emit_nodes(*prepare_nodes(parse_records(html)), graph, defaultdict(int), stable_ids=True)
+        self.assertEqual(len(graph), count + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
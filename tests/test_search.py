@@ -0,0 +1,85 @@
+import contextlib
+import io
+import unittest
+
+from cypherweb.core import Graph
+from cypherweb.nodes.classifiers import FusedClassifier
+from cypherweb.nodes.html_to_graph import HtmlToGraph
+from cypherweb.nodes.search import GraphNearestNeighbor
+from cypherweb.pipelines import CypherWebPipeline
+
+PAGE = """<div class="outer"><ul class="inner"><li>one</li><li>two</li></ul>
+<section><p>anchor text</p><p>more</p></section></div>"""
+# two top level roots, no html or body element
+MULTI_ROOT_PAGE = """<div class="first"><h2>Meet the team</h2>
+<ul class="menu"><li><a href="/a">a</a></li><li><a href="/b">b</a></li><li><a href="/c">c</a></li></ul></div>
+<div class="second"><h2>Our team in numbers</h2>
+<ul class="links"><li><a href="/x">x</a></li><li><a href="/y">y</a></li><li><a href="/z">z</a></li></ul></div>"""
+
+
+def build(html, backend):
+    graph = Graph("http://example.com/", backend)
+    graph.html_payload = html
+    HtmlToGraph()(graph)
+    return graph
+
+
+def node_by(graph, key, value):
+    for node, attributes in graph._graph.nodes(data=True):
+        if key == "text" and attributes["payload"] is not None and attributes["payload"]["text"] == value:
+            return node
+        if key != "text" and attributes[key] == value:
+            return node
+    raise KeyError(value)
+
+
+def search(graph, anchor, node_type="box", **params):
+    payload = {
+        "str_matcher": {"anchor_nodes": [(anchor, 1.0, "")]},
+        "graph_process_pipe": {"graph": graph},
+    }
+    params = {"top_k_anchors": 10, "node_type": node_type, "node_include": False, **params}
+    results = GraphNearestNeighbor().run(payload, params)[f"{node_type}_results"]
+    return [best["node"] for best in results[anchor]]
+
+
+class TestGraphNearestNeighbor(unittest.TestCase):
+    def test_remove_nested(self):
+        for backend in ("networkx", "tree"):
+            with self.subTest(backend=backend):
+                graph = build(PAGE, backend)
+                outer = node_by(graph, "element_type", "div")
+                inner = node_by(graph, "element_type", "ul")
+                item = node_by(graph, "text", "one")
+                graph.set_node_attributes({node: {"type": ["box"]} for node in (outer, inner, item)})
+                anchor = node_by(graph, "text", "anchor text")
+                # all three are as close to the anchor
+                self.assertEqual(search(graph, anchor), [outer, inner, item])
+                self.assertEqual(search(graph, anchor, remove_nested=False), [outer, inner, item])
+                # opt-in: the nested ones are part of the content of the outer one
+                self.assertEqual(search(graph, anchor, remove_nested=True), [outer])
+
+    def test_multi_root_page(self):
+        for backend in ("networkx", "tree"):
+            with self.subTest(backend=backend):
+                graph = build(MULTI_ROOT_PAGE, backend)
+                roots = [node for node in graph._graph.nodes if graph._graph.in_degree(node) == 0]
+                self.assertEqual(len(roots), 2)
+                FusedClassifier(lazy=True)(graph)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    results = CypherWebPipeline().run(
+                        'USE "http://example.com/" MATCH (a:Linklist)-[e*1..2]->(t:Title) '
+                        'WHERE t.text contains "team" RETURN a, t',
+                        graph=graph,
+                    )
+                results = results["graph_nn"]["['linklist']_results"]
+                # each title finds the link list of its own tree only
+                self.assertEqual(len(results), 2)
+                for anchor, bests in results.items():
+                    self.assertEqual(len(bests), 1)
+                    self.assertIsNotNone(graph.lowest_common_ancestor(anchor, bests[0]["node"]))
+                self.assertEqual(len({bests[0]["node"] for bests in results.values()}), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,174 @@
+import tempfile
+import unittest
+from unittest import mock
+
+import requests
+
+from cypherweb.core import GraphProcessPipeline, Url
+from cypherweb.nodes.classifiers import LinkClassifier, LinkListClassifier
+from cypherweb.nodes.connectors import AsyncCrawler, HttpCache, SiteCrawler
+from cypherweb.nodes.connectors.site_crawler import Frontier, canonicalize_url
+from cypherweb.nodes.html_to_graph import HtmlToGraph
+from cypherweb.utils.bloom import BloomFilter
+
+
+def links(*hrefs):
+    return "<html><body><p>page</p>" + "".join(f'<div><a href="{href}">{href}</a></div>' for href in hrefs) + "</body></html>"
+
+
+SITE = {
+    "http://site.com/": links("/a", "b/", "http://other.com/x", "mailto:me@site.com"),
+    "http://site.com/a": links("/", "/a#top", "/c"),
+    # relative links of the page /b/ redirects to
+    "http://site.com/docs/": links("intro", "../a"),
+    "http://site.com/docs/intro": links("/deep"),
+    "http://site.com/c": links("/d"),
+    "http://site.com/d": links(),
+    "http://site.com/deep": links(),
+}
+REDIRECTS = {"http://site.com/b/": "http://site.com/docs/"}
+
+
+class FakeSession:
+    def __init__(self) -> None:
+        self.requested = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requested.append(url)
+        response = requests.Response()
+        response.url = REDIRECTS.get(url, url)
+        response.headers["Content-Type"] = "text/html; charset=utf-8"
+        response.headers["Cache-Control"] = "max-age=60"
+        if response.url in SITE:
+            response.status_code = 200
+            response._content = SITE[response.url].encode("utf-8")
+        else:
+            response.status_code = 404
+            response._content = b""
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+class TestSiteCrawler(unittest.TestCase):
+    def crawl(self, depth, cache=None, **kwargs):
+        fetcher = AsyncCrawler(cache=cache)
+        self.addCleanup(fetcher.close)
+        session = FakeSession()
+        patcher = mock.patch.object(fetcher, "session", session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        pipeline = GraphProcessPipeline()
+        pipeline.add_node(SiteCrawler(fetcher, politeness_delay=0, **kwargs), "crawler")
+        pipeline.add_node(HtmlToGraph(), "html_to_graph")
+        pipeline.add_node(LinkListClassifier(), "linklist")
+        pipeline.add_node(LinkClassifier(), "link")
+        graphs = list(pipeline.crawl(Url("http://site.com/", depth, enrich_inner_urls=True)))
+        return graphs, session
+
+    def test_depth(self):
+        graphs, session = self.crawl(1)
+        self.assertEqual(
+            sorted(graph.page_url for graph in graphs),
+            ["http://site.com/", "http://site.com/a", "http://site.com/b/"],
+        )
+        graphs, session = self.crawl(2)
+        self.assertEqual(
+            sorted(graph.page_url for graph in graphs),
+            [
+                "http://site.com/",
+                "http://site.com/a",
+                "http://site.com/b/",
+                "http://site.com/c",
+                "http://site.com/docs/intro",
+            ],
+        )
+        # each page is requested once
+        self.assertEqual(len(session.requested), len(set(session.requested)))
+
+    def test_links_relative_to_redirected_url(self):
+        graphs, session = self.crawl(3)
+        self.assertIn("http://site.com/docs/intro", session.requested)
+        self.assertIn("http://site.com/deep", session.requested)
+        self.assertNotIn("http://site.com/b/intro", session.requested)
+        # the page redirected to is not crawled again
+        self.assertNotIn("http://site.com/docs/", session.requested)
+
+    def test_links_relative_to_cached_redirected_url(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        cache = HttpCache(directory.name)
+        expected, _ = self.crawl(3, cache=cache)
+        graphs, session = self.crawl(3, cache=cache)
+        # served from the cache, with the same links
+        self.assertEqual(session.requested, [])
+        self.assertEqual(sorted(graph.page_url for graph in graphs), sorted(graph.page_url for graph in expected))
+        self.assertEqual(cache.lookup("http://site.com/b/")["response_url"], "http://site.com/docs/")
+        self.assertIsNone(cache.lookup("http://site.com/a")["response_url"])
+
+    def test_max_pages(self):
+        graphs, _ = self.crawl(3, max_pages=2)
+        self.assertEqual(len(graphs), 2)
+
+    def test_backend(self):
+        graphs, _ = self.crawl(1, backend="tree")
+        self.assertEqual({graph.backend for graph in graphs}, {"tree"})
+
+    def test_canonicalize_url(self):
+        cases = [
+            ("HTTP://Example.COM:80/a/./b/../c", None, "http://example.com/a/c"),
+            ("https://example.com:443", None, "https://example.com/"),
+            ("http://example.com:8080/x/", None, "http://example.com:8080/x/"),
+            ("../d?q=1#frag", "http://example.com/a/b/c", "http://example.com/a/d?q=1"),
+            ("mailto:me@example.com", None, None),
+            ("javascript:void(0)", "http://example.com/", None),
+            ("http://[::1", None, None),
+        ]
+        for href, base_url, expected in cases:
+            with self.subTest(href=href):
+                self.assertEqual(canonicalize_url(href, base_url), expected)
+
+
+class TestFrontier(unittest.TestCase):
+    def test_spill_to_disk(self):
+        frontier = Frontier(max_in_memory=3)
+        self.addCleanup(frontier.close)
+        expected = []
+        for n in range(10):
+            frontier.push(f"http://site.com/{n}", n % 4)
+            expected.append((f"http://site.com/{n}", n % 4))
+        self.assertEqual(len(frontier), 10)
+        self.assertIsNotNone(frontier._spill)
+        popped = [frontier.pop() for _ in range(5)]
+        # pushed while entries are spilled: after them
+        for n in range(10, 13):
+            frontier.push(f"http://site.com/{n}", 0)
+            expected.append((f"http://site.com/{n}", 0))
+        while len(frontier) > 0:
+            popped.append(frontier.pop())
+        self.assertEqual(popped, expected)
+        self.assertLessEqual(len(frontier._memory), 3)
+        self.assertIsNone(frontier._spill)
+
+
+class TestBloomFilter(unittest.TestCase):
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        items = [f"http://site.com/{n}" for n in range(1000)]
+        self.assertTrue(all(bloom.add(item) for item in items[:10]))
+        for item in items:
+            bloom.add(item)
+        self.assertTrue(all(item in bloom for item in items))
+        self.assertFalse(any(bloom.add(item) for item in items))
+
+    def test_error_rate(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        for n in range(1000):
+            bloom.add(f"http://site.com/{n}")
+        false_positives = sum(f"http://other.com/{n}" in bloom for n in range(10000))
+        self.assertLess(false_positives, 2 * 0.01 * 10000)
+
+
+if __name__ == "__main__":
+    unittest.main()
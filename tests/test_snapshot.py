@@ -0,0 +1,148 @@
+import os
+import pickle
+import tempfile
+import unittest
+
+import networkx as nx
+
+from cypherweb.core import Graph
+from cypherweb.nodes.classifiers import FusedClassifier
+from cypherweb.nodes.html_to_graph import HtmlToGraph
+
+from pages import all_pages, dump, site_page
+
+BACKENDS = ("networkx", "tree")
+
+
+def build(html, backend, lazy=False):
+    graph = Graph("http://example.com/", backend)
+    graph.html_payload = html
+    HtmlToGraph()(graph)
+    graph.content_hash = "0" * 64
+    FusedClassifier(lazy=lazy)(graph)
+    return graph
+
+
+def queries(graph):
+    """Results of the queries a snapshot serves."""
+    nodes = list(graph._graph.nodes)
+    results = [graph.get_nodes_by_type(label) for label in sorted(graph.labels)]
+    results += [graph.lowest_common_ancestor(nodes[0], node) for node in nodes[:: max(1, len(nodes) // 20)]]
+    return results
+
+
+class GraphTestCase(unittest.TestCase):
+    def assertSameGraph(self, graph, expected):
+        self.assertEqual(dump(graph), dump(expected))
+        self.assertEqual(graph.labels, expected.labels)
+        self.assertEqual(graph.reports, expected.reports)
+        self.assertEqual(graph.page_url, expected.page_url)
+        self.assertEqual(graph.content_hash, expected.content_hash)
+        self.assertEqual(queries(graph), queries(expected))
+
+
+class TestSnapshot(GraphTestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+        self.path = os.path.join(self._dir.name, "page.graph")
+
+    def test_round_trip(self):
+        for backend in BACKENDS:
+            for number, html in enumerate(all_pages(10)):
+                expected = build(html, backend)
+                expected.save(self.path)
+                for use_mmap in (True, False):
+                    with self.subTest(backend=backend, page=number, use_mmap=use_mmap):
+                        graph = Graph.load(self.path, use_mmap=use_mmap)
+                        self.assertEqual(graph.backend, "tree")
+                        self.assertSameGraph(graph, expected)
+
+    def test_lazy_labels_are_saved(self):
+        graph = build(site_page(0), "tree", lazy=True)
+        graph.save(self.path)
+        loaded = Graph.load(self.path)
+        self.assertIsNone(graph.classifier)
+        self.assertEqual(loaded.labels, {"grid", "linklist", "title", "link"})
+        self.assertSameGraph(loaded, graph)
+
+    def test_mmap_is_read_only(self):
+        build(site_page(0), "tree").save(self.path)
+        graph = Graph.load(self.path)
+        node = next(iter(graph._graph.nodes))
+        with self.assertRaises(TypeError):
+            graph.set_node_attributes({node: {"type": ["changed"]}})
+        with self.assertRaises(TypeError):
+            graph._graph.remove_node(node)
+        copy = Graph.load(self.path, use_mmap=False)
+        copy.set_node_attributes({node: {"type": ["changed"]}})
+        self.assertEqual(copy._graph.nodes[node]["type"], ["changed"])
+
+    def test_pickle_loaded(self):
+        expected = build(site_page(1), "tree")
+        expected.save(self.path)
+        graph = pickle.loads(pickle.dumps(Graph.load(self.path)))
+        self.assertSameGraph(graph, expected)
+
+    def test_not_a_snapshot(self):
+        with open(self.path, "wb") as f:
+            f.write(b"<html></html>")
+        for use_mmap in (True, False):
+            with self.subTest(use_mmap=use_mmap):
+                with self.assertRaises(ValueError):
+                    Graph.load(self.path, use_mmap=use_mmap)
+        # truncated
+        build(site_page(0), "tree").save(self.path)
+        with open(self.path, "rb") as f:
+            data = f.read()
+        with open(self.path, "wb") as f:
+            f.write(data[: len(data) // 2])
+        with self.assertRaises(ValueError):
+            Graph.load(self.path)
+
+
+class TestSharedMemory(GraphTestCase):
+    def publish(self, graph):
+        segment = graph.publish()
+        self.addCleanup(segment.unlink)
+        self.addCleanup(segment.close)
+        return segment
+
+    def test_publish_and_attach(self):
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                expected = build(site_page(2), backend)
+                segment = self.publish(expected)
+                graph = Graph.attach(segment.name)
+                self.assertSameGraph(graph, expected)
+                with self.assertRaises(TypeError):
+                    graph.set_node_attributes({next(iter(graph._graph.nodes)): {"type": ["changed"]}})
+
+    def test_pickle_attached(self):
+        expected = build(site_page(3), "tree")
+        segment = self.publish(expected)
+        data = pickle.dumps(Graph.attach(segment.name))
+        # only the name of the segment
+        self.assertLess(len(data), 200)
+        self.assertSameGraph(pickle.loads(data), expected)
+
+
+class TestFreeze(unittest.TestCase):
+    def test_frozen_graph_is_read_only(self):
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                graph = build(site_page(0), backend, lazy=True)
+                expected = queries(build(site_page(0), backend))
+                graph.freeze()
+                self.assertIsNone(graph.classifier)
+                node = next(iter(graph._graph.nodes))
+                with self.assertRaises(TypeError):
+                    graph.set_node_attributes({node: {"type": ["changed"]}})
+                # nx.freeze raises a NetworkXError
+                with self.assertRaises(TypeError if backend == "tree" else nx.NetworkXError):
+                    graph._graph.remove_node(node)
+                self.assertEqual(queries(graph), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,179 @@
+import contextlib
+import hashlib
+import io
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+from cypherweb.core import Graph, GraphProcessPipeline
+from cypherweb.nodes.connectors import StreamingCrawler
+from cypherweb.nodes.connectors.streaming_crawler import SNIFF_SIZE
+from cypherweb.nodes.html_to_graph import HtmlToGraph
+from cypherweb.utils.html_parser import DomRecordsParser
+
+from pages import all_pages, dump
+
+PAGE = """<html><head><meta charset="latin-1"><script>var s = "<div>" + '</p>';</script>
+<style>p { color: red }</style></head><body>
+<nav><a href="/"><svg><title>logo</title><path d="M0"/></svg> Home</a>
+<a href="/cafe"><picture><source srcset="a.webp"/>caf\xe9</picture></a></nav>
+<div><p>price <b>10 EUR</b></p><noscript><p>enable js</p></noscript></div>
+</body></html>"""
+
+
+class EventRaw(io.BytesIO):
+    """Body of a response, logging the reads in ``events``."""
+
+    def __init__(self, body, events, delay=0) -> None:
+        super().__init__(body)
+        self.events = events
+        self.delay = delay
+
+    def read(self, size=-1):
+        time.sleep(self.delay)
+        chunk = super().read(size)
+        if chunk:
+            self.events.append("read")
+        return chunk
+
+
+class FakeSession:
+    def __init__(self, pages, content_type="text/html", delay=0) -> None:
+        self.pages = pages
+        self.content_type = content_type
+        self.delay = delay
+        self.events = []
+
+    def get(self, url, headers=None, timeout=None, stream=False):
+        response = requests.Response()
+        response.url = url
+        if url in self.pages:
+            response.status_code = 200
+            response.raw = EventRaw(self.pages[url], self.events, self.delay)
+        else:
+            response.status_code = 404
+            response.raw = io.BytesIO(b"")
+        response.headers["Content-Type"] = self.content_type
+        return response
+
+
+def build(crawler, page_url="http://example.com/", backend="networkx"):
+    graph = Graph(page_url, backend)
+    crawler(graph)
+    HtmlToGraph()(graph)
+    return graph
+
+
+def build_from_html(html, backend="networkx"):
+    graph = Graph("http://example.com/", backend)
+    graph.html_payload = html
+    HtmlToGraph()(graph)
+    return graph
+
+
+class TestStreamingCrawler(unittest.TestCase):
+    def crawler(self, pages, content_type="text/html", delay=0, **kwargs):
+        crawler = StreamingCrawler(**kwargs)
+        crawler.session = FakeSession(pages, content_type, delay)
+        return crawler
+
+    def test_same_graph_as_whole_page(self):
+        pages = all_pages(20) + [PAGE.replace("latin-1", "utf-8")]
+        for backend in ("networkx", "tree"):
+            for number, html in enumerate(pages):
+                for chunk_size in (7, 4096, 2**16):
+                    with self.subTest(backend=backend, page=number, chunk_size=chunk_size):
+                        body = html.encode("utf-8")
+                        crawler = self.crawler({"http://example.com/": body}, chunk_size=chunk_size)
+                        graph = build(crawler, backend=backend)
+                        self.assertEqual(dump(graph), dump(build_from_html(html, backend)))
+                        self.assertEqual(graph.content_hash, hashlib.sha256(body).hexdigest())
+                        self.assertIsNone(graph.dom_records)
+
+    def test_charset(self):
+        for content_type, body in [
+            ("text/html", PAGE.encode("latin-1")),
+            ("text/html; charset=utf-8", PAGE.replace("latin-1", "utf-8").encode("utf-8")),
+            ("text/html; charset=ISO-8859-1", PAGE.encode("latin-1")),
+        ]:
+            with self.subTest(content_type=content_type):
+                graph = build(self.crawler({"http://example.com/": body}, content_type))
+                self.assertEqual(dump(graph), dump(build_from_html(PAGE)))
+
+    def test_text_of_pruned_tags(self):
+        graph = build(self.crawler({"http://example.com/": PAGE.encode("latin-1")}))
+        texts = {
+            attributes["payload"]["text"]
+            for _, attributes in graph._graph.nodes(data=True)
+            if attributes["payload"] is not None
+        }
+        # pruned tags are not nodes, their text still counts in their ancestors
+        self.assertIn("logo Home", texts)
+        self.assertIn("café", texts)
+        self.assertNotIn("svg", {attributes["element_type"] for _, attributes in graph._graph.nodes(data=True)})
+        self.assertFalse(any("color" in text or "var s" in text for text in texts))
+
+    def test_parsed_while_downloading(self):
+        crawler = self.crawler({"http://example.com/": "".join(all_pages(4)).encode("utf-8")}, chunk_size=1024)
+        events = crawler.session.events
+        feed = DomRecordsParser.feed
+
+        def logged_feed(parser, data):
+            events.append("feed")
+            return feed(parser, data)
+
+        with mock.patch.object(DomRecordsParser, "feed", logged_feed):
+            build(crawler)
+        self.assertGreater(events.count("read"), 1)
+        # chunks are parsed as they arrive (past the head sniffed for a
+        # charset), not once the body is read
+        first_feed = events.index("feed")
+        self.assertEqual(first_feed, SNIFF_SIZE // 1024)
+        self.assertEqual(events[first_feed:first_feed + 5], ["feed", "read", "feed", "read", "feed"])
+        self.assertEqual(events.count("feed"), events.count("read") - first_feed + 2)
+
+    def test_max_bytes(self):
+        html = all_pages(1)[3]
+        crawler = self.crawler({"http://example.com/": html.encode("utf-8")}, max_bytes=5000, chunk_size=1024)
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            graph = build(crawler)
+        self.assertIn("Page truncated", output.getvalue())
+        self.assertEqual(dump(graph), dump(build_from_html(html[:5000])))
+
+    def test_max_parse_time(self):
+        body = "".join(all_pages(4)).encode("utf-8")
+        crawler = self.crawler({"http://example.com/": body}, delay=0.02, max_parse_time=0.1, chunk_size=1024)
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            started = time.perf_counter()
+            graph = build(crawler)
+        self.assertLess(time.perf_counter() - started, 1)
+        self.assertIn("Page truncated", output.getvalue())
+        # the download stopped at the deadline
+        self.assertLess(crawler.session.events.count("read"), len(body) // 1024 // 2)
+        self.assertGreater(len(graph._graph), 0)
+
+    def test_failed_request(self):
+        crawler = self.crawler({})
+        graph = Graph("http://example.com/missing")
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            crawler(graph)
+        self.assertIn("404", output.getvalue())
+        self.assertIsNone(graph.dom_records)
+        self.assertIsNone(graph.content_hash)
+
+    def test_unchanged_page_is_reused(self):
+        pages = {"http://example.com/": PAGE.encode("latin-1")}
+        pipeline = GraphProcessPipeline()
+        pipeline.add_node(self.crawler(pages), "crawler")
+        pipeline.add_node(HtmlToGraph(stable_ids=True), "html_to_graph")
+        previous = Graph("http://example.com/")
+        pipeline.process(previous)
+        graph = pipeline.rebuild(previous)
+        self.assertEqual(graph.reports["rebuild"], {"changed_nodes": 0, "reused_nodes": len(previous._graph)})
+        self.assertEqual(dump(graph), dump(previous))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import random
+import re
+import unittest
+
+from cypherweb.core import Graph
+from cypherweb.core.texts import TextColumn
+from cypherweb.nodes.str_matchers import BaseStrRetriever
+
+WORDS = ["Price", "price", "PRICE", "a", "ab", "b\nc", "", "İx", "foo bar", "\n", "x" * 80]
+QUERIES = ["price", "Price", "a", "", "b", "c", "x", "foo bar", "İx", "b\nc", "a a"]
+PATTERNS = ["pri.*", ".*", "a", "a*", "", "(?i)price", "x+", ".*\n.*", "[^x]*", "b\nc"]
+
+
+def random_graph(rng, backend):
+    graph = Graph("http://example.com/", backend)
+    for node in range(rng.randrange(0, 12)):
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randrange(0, 4)))
+        payload = {"text": text} if rng.random() < 0.85 else None
+        graph._graph.add_node(node, type=["text"], payload=payload)
+    graph.invalidate()
+    return graph
+
+
+def naive_search(texts, query, match_type, lower):
+    hits = []
+    for n, text in enumerate(texts):
+        if lower:
+            text = text.lower()
+        if match_type == "regex":
+            if re.fullmatch(query, text, re.IGNORECASE if lower else 0):
+                hits.append((n, 0))
+            continue
+        if lower:
+            query = query.lower()
+        if match_type == "exact" and text == query:
+            hits.append((n, 0))
+        elif match_type == "contains" and query in text:
+            hits.append((n, text.index(query)))
+    return hits
+
+
+def naive_run(retriever, graph, query, match_type, lower):
+    """The scan of every node of the graph."""
+    hits = []
+    for node in graph._graph.nodes:
+        payload = graph._graph.nodes[node].get("payload")
+        if payload:
+            score, text = retriever.score_text_against_query(payload["text"], query, match_type, lower)
+            if score > 0:
+                hits.append([node, score, text])
+    return sorted(hits, key=lambda x: x[1], reverse=True)
+
+
+class TestTextColumn(unittest.TestCase):
+    def test_search(self):
+        rng = random.Random(0)
+        for trial in range(100):
+            for backend in ("networkx", "tree"):
+                graph = random_graph(rng, backend)
+                column = TextColumn.build(graph)
+                for lower in (False, True):
+                    for query in QUERIES:
+                        for match_type in ("exact", "contains"):
+                            with self.subTest(trial=trial, backend=backend, query=query, match_type=match_type, lower=lower):
+                                self.assertEqual(
+                                    column.search(query, match_type, lower),
+                                    naive_search(column._texts, query, match_type, lower),
+                                )
+                    for pattern in PATTERNS:
+                        with self.subTest(trial=trial, backend=backend, pattern=pattern, lower=lower):
+                            self.assertEqual(
+                                column.search(pattern, "regex", lower),
+                                naive_search(column._texts, pattern, "regex", lower),
+                            )
+
+    def test_unknown_match_type(self):
+        column = TextColumn([0], ["a"])
+        with self.assertRaises(ValueError):
+            column.search("a", "fuzzy")
+
+    def test_invalidated_on_new_payload(self):
+        for backend in ("networkx", "tree"):
+            with self.subTest(backend=backend):
+                graph = Graph("http://example.com/", backend)
+                graph._graph.add_node(0, payload={"text": "old"})
+                graph._graph.add_node(1, payload={"text": "other"})
+                graph.invalidate()
+                self.assertEqual(graph.get_text_column()._texts, ["old", "other"])
+                graph.set_node_attributes({0: {"payload": {"text": "new"}}})
+                self.assertEqual(graph.get_text_column()._texts, ["new", "other"])
+                # other attributes keep the column
+                column = graph.get_text_column()
+                graph.set_node_attributes({0: {"type": ["text"]}})
+                self.assertIs(graph.get_text_column(), column)
+
+
+class TestBaseStrRetriever(unittest.TestCase):
+    def test_same_as_scan(self):
+        rng = random.Random(5)
+        retriever = BaseStrRetriever()
+        for trial in range(100):
+            for backend in ("networkx", "tree"):
+                graph = random_graph(rng, backend)
+                payload = {"graph_process_pipe": {"graph": graph}}
+                for query in QUERIES:
+                    for match_type in ("exact", "contains", "unknown"):
+                        if match_type == "contains" and not query:
+                            continue
+                        for lower in (False, True):
+                            with self.subTest(trial=trial, backend=backend, query=query, match_type=match_type, lower=lower):
+                                params = {"query": query, "str_match_type": match_type, "str_lower": lower}
+                                self.assertEqual(
+                                    retriever.run(payload, params)["anchor_nodes"],
+                                    naive_run(retriever, graph, query, match_type, lower),
+                                )
+
+
+if __name__ == "__main__":
+    unittest.main()
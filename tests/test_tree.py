@@ -0,0 +1,85 @@
+import random
+import unittest
+from collections import defaultdict
+from unittest import mock
+
+import networkx as nx
+
+from cypherweb.core.tree import TreeGraph
+from cypherweb.utils.html_parser import parse_records
+from cypherweb.utils.html_to_graph import clean_graph, records_to_graph
+
+from pages import all_pages, site_page
+
+
+def structure(graph):
+    return (
+        [(node, dict(attributes)) for node, attributes in graph.nodes(data=True)],
+        [(list(graph.successors(node)), list(graph.predecessors(node))) for node in graph.nodes],
+        sorted(graph.edges),
+    )
+
+
+def records_graph(html, backend):
+    graph = backend()
+    records_to_graph(parse_records(html), graph, defaultdict(int), 0, hash_ids=True)
+    return graph
+
+
+class TestTreeGraph(unittest.TestCase):
+    def test_edits_like_networkx(self):
+        for seed in range(50):
+            rng = random.Random(seed)
+            graph, tree = nx.DiGraph(), TreeGraph()
+            next_node = 0
+            with self.subTest(seed=seed):
+                for step in range(200):
+                    nodes = list(graph.nodes)
+                    choice = rng.random()
+                    if choice < 0.4 or not nodes:
+                        # a new node, under an existing one or as a root
+                        parent = rng.choice(nodes) if nodes and rng.random() < 0.8 else None
+                        for _graph in (graph, tree):
+                            _graph.add_node(f"n{next_node}", step=step)
+                            if parent is not None:
+                                _graph.add_edge(parent, f"n{next_node}")
+                        next_node += 1
+                    elif choice < 0.6:
+                        # attach an orphan, eg. a child of a removed node
+                        roots = [node for node in nodes if graph.in_degree(node) == 0]
+                        child = rng.choice(roots)
+                        parent = rng.choice(nodes)
+                        if parent == child or child in nx.ancestors(graph, parent):
+                            continue
+                        graph.add_edge(parent, child)
+                        tree.add_edge(parent, child)
+                    elif choice < 0.8:
+                        removed = rng.sample(nodes, min(len(nodes), rng.randint(1, 3)))
+                        graph.remove_nodes_from(removed)
+                        tree.remove_nodes_from(removed)
+                    else:
+                        # reads between the edits
+                        node = rng.choice(nodes)
+                        self.assertEqual(list(tree.successors(node)), list(graph.successors(node)))
+                        self.assertEqual(tree.out_degree(node), graph.out_degree(node))
+                self.assertEqual(len(tree), len(graph))
+                self.assertEqual(structure(tree), structure(graph))
+
+    def test_clean_graph(self):
+        for number, html in enumerate(all_pages(20)):
+            with self.subTest(page=number):
+                tree = clean_graph(records_graph(html, TreeGraph))
+                self.assertEqual(structure(tree), structure(clean_graph(records_graph(html, nx.DiGraph))))
+
+    def test_clean_graph_is_linear(self):
+        tree = records_graph(site_page(0, card_count=500), TreeGraph)
+        size = len(tree)
+        with mock.patch.object(TreeGraph, "_build_children", autospec=True, side_effect=TreeGraph._build_children) as build:
+            clean_graph(tree)
+        self.assertLess(len(tree), size)
+        # the children arrays are not rebuilt on each removal
+        self.assertLessEqual(build.call_count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()